@@ -4,7 +4,8 @@ from dotenv import load_dotenv
 from fastapi import APIRouter, Request
 from fastapi.responses import RedirectResponse, HTMLResponse
 
-import httpx
+from library.http_client import getClient
+from library.sessions import rotateSession
 
 from exceptions import *
 
@@ -52,11 +53,13 @@ async def oauth2callback(request: Request, state: str = None, code: str = None):
             "grant_type": "authorization_code"
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post("https://oauth2.googleapis.com/token", data = data)
+        response = await getClient().post("https://oauth2.googleapis.com/token", data = data)
         
         request.session["credentials"] = response.json()
         
+        # session id known before login is never authenticated
+        rotateSession(request)
+        
         return RedirectResponse(request.url_for("home"))
     
 
@@ -78,8 +81,7 @@ async def refresh_access_token(request: Request):
         "grant_type": "refresh_token"
     }
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post("https://oauth2.googleapis.com/token", data = data)
+    response = await getClient().post("https://oauth2.googleapis.com/token", data = data)
     
     if response.status_code == 400: # apps access to yt account has been revoked
         return HTMLResponse(f"Web-app's access to your youtube account has been revoked. Please <a href={request.url_for('oauth2callback')}>authorize</a> to continue using the service.")
@@ -112,11 +114,10 @@ async def revoke(request: Request):
     credentials = request.session["credentials"]
     
     # revoke accesss
-    async with httpx.AsyncClient() as client:
-        response = await client.post("https://oauth2.googleapis.com/revoke",
-            params = {"token": credentials["access_token"]},
-            headers = {"content-type": "application/x-www-form-urlencoded"}
-        )
+    response = await getClient().post("https://oauth2.googleapis.com/revoke",
+        params = {"token": credentials["access_token"]},
+        headers = {"content-type": "application/x-www-form-urlencoded"}
+    )
     
     # fails when quota exceeds or access token expires
     if response.status_code == 403:
@@ -0,0 +1 @@
+"""Benchmarks for measuring performance of the web-app. Run from the app directory, e.g. `python -m benchmarks.padding`."""
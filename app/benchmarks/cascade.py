@@ -0,0 +1,65 @@
+"""Measures skip rate, speed and label agreement of the cascade classifier against BERT alone, for a range of first stage thresholds, and time taken by the first stage per comment. Uses the distilled scorer if it has been exported, otherwise distills one from the first half of the comments and evaluates on the second half."""
+
+import argparse
+import json
+import os
+import time
+
+from machine_learning import load_tokeninzer, load_model, make_predictions, cascade_path
+from machine_learning.cascade import load_scorer, distill, cascade_predict, threshold_report
+
+from .corpus import synthetic_comments
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--comments", type = int, default = 1000, help = "No. of synthetic comments to classify.")
+    parser.add_argument("--csv", help = "Optional csv file with id and comment_text columns to use instead of synthetic comments.")
+    parser.add_argument("--thresholds", type = float, nargs = "+", default = [0.005, 0.01, 0.02, 0.05, 0.1], help = "First stage thresholds.")
+    args = parser.parse_args()
+
+    load_tokeninzer()
+    load_model(cascade_threshold = 0)
+
+    if args.csv:
+        import pandas as pd
+        data = pd.read_csv(args.csv, usecols = ["id", "comment_text"])
+    else:
+        data = synthetic_comments(args.comments)
+
+    if os.path.exists(cascade_path):
+        scorer = load_scorer(cascade_path)
+    else:
+        train, data = data.iloc[:len(data) // 2], data.iloc[len(data) // 2:]
+        teacher = make_predictions.predict(train, cascade = False)
+        scorer = distill(train.comment_text.tolist(), teacher.probabilities)
+
+    start = time.perf_counter()
+    reference = make_predictions.predict(data, cascade = False)
+    bert_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    first_stage = scorer.predict_proba(data.comment_text.tolist())
+    first_stage_seconds = time.perf_counter() - start
+
+    report = {
+        "comments": len(data),
+        "bert_seconds": bert_seconds,
+        "first_stage_seconds": first_stage_seconds,
+        "first_stage_us_per_comment": 1e6 * first_stage_seconds / len(data),
+        "thresholds": threshold_report(first_stage, reference, args.thresholds)
+    }
+
+    # skip rate and agreement come from the report, only speed needs the cascade to run
+    for row in report["thresholds"]:
+        start = time.perf_counter()
+        cascade_predict(data, scorer, row["threshold"], make_predictions.predict_bert)
+        seconds = time.perf_counter() - start
+
+        row.update({"seconds": seconds, "speedup": bert_seconds / seconds})
+
+    print(json.dumps(report, indent = 4))
+
+
+if __name__ == "__main__":
+    main()
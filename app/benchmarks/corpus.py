@@ -0,0 +1,39 @@
+import random
+
+import pandas as pd
+
+# vocabulary used to build synthetic youtube like comments
+WORDS = [
+    "great", "video", "love", "this", "thanks", "for", "sharing", "awesome", "content", "the",
+    "best", "tutorial", "ever", "watched", "it", "twice", "please", "make", "more", "like",
+    "subscribed", "amazing", "work", "keep", "going", "first", "lol", "nice", "music", "editing",
+    "you", "are", "stupid", "idiot", "hate", "worst", "trash", "garbage", "boring", "clickbait"
+]
+
+
+def synthetic_comments(n: int, seed: int = 0) -> pd.DataFrame:
+    """Creates a synthetic comments DataFrame whose length distribution resembles youtube comments, i.e. mostly short with a long tail.
+
+    Args:
+        n (int): No. of comments to generate.
+        seed (int): Seed for reproducible corpora.
+
+    Returns:
+        pandas DataFrame: DataFrame with id and comment_text columns.
+    """
+
+    rng = random.Random(seed)
+
+    ids = []
+    texts = []
+    for i in range(n):
+        # ~80% of comments are under 30 words, rest go up to a few hundred
+        if rng.random() < 0.8:
+            n_words = rng.randint(1, 30)
+        else:
+            n_words = rng.randint(30, 300)
+
+        ids.append(f"comment_{seed}_{i}")
+        texts.append(" ".join(rng.choice(WORDS) for _ in range(n_words)))
+
+    return pd.DataFrame({"id": ids, "comment_text": texts})
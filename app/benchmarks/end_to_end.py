@@ -0,0 +1,190 @@
+"""End-to-end timings of the web-app against the simulated youtube api: login, /home, cold and incremental /video-analysis/{video_id} (from submitting the job to its rendered result) and /reject-comments. Prints JSON.
+
+Import this module before any web-app module, it points databases of the web-app at a temporary directory.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+# state of benchmark runs is kept apart from the real one, predictions aren't cached so that every analysis classifies
+BENCHMARK_DIR = tempfile.mkdtemp(prefix = "detox-benchmark-")
+os.environ.setdefault("ANALYSIS_STATE_PATH", os.path.join(BENCHMARK_DIR, "analysis_state.sqlite3"))
+os.environ.setdefault("YOUTUBE_QUOTA_PATH", os.path.join(BENCHMARK_DIR, "youtube_quota.sqlite3"))
+os.environ.setdefault("ANALYSIS_JOBS_PATH", os.path.join(BENCHMARK_DIR, "analysis_jobs.sqlite3"))
+os.environ.setdefault("ARTIFACT_PATH", os.path.join(BENCHMARK_DIR, "artifacts.sqlite3"))
+os.environ.setdefault("PREDICTION_CACHE", "0")
+os.environ.setdefault("SESSION_BACKEND", "memory")
+os.environ.setdefault("STATE", "benchmark")
+
+import httpx
+
+from .fake_youtube import create_fake_youtube, use_fake_youtube
+
+# seconds between polls of analysis status
+POLL_INTERVAL = 0.05
+
+
+@asynccontextmanager
+async def running_app(latency: float = 0.0, comment_counts: dict = None, default_comments: int = 1000, videos_per_channel: int = 3):
+    """Starts the web-app in-process with its google requests sent to the simulated api.
+
+    Args:
+        latency (float): Seconds every simulated api request takes.
+        comment_counts (dict): No. of comments per video id.
+        default_comments (int): No. of comments of other videos.
+        videos_per_channel (int): No. of videos of every creator.
+
+    Yields:
+        tuple: ASGI app of the web-app and the simulated api.
+    """
+
+    from main import app
+    from library.api_gateway import gateway
+
+    api = create_fake_youtube(latency, comment_counts, default_comments, videos_per_channel)
+    use_fake_youtube(api)
+
+    # synthetic creators aren't limited by the quota of a real project
+    gateway.daily_quota = 10 ** 12
+
+    await app.router.startup()
+    try:
+        yield app, api
+    finally:
+        await app.router.shutdown()
+
+
+def app_client(app) -> httpx.AsyncClient:
+    """Creates a client of the web-app with a cookie jar of its own, i.e. one creator's browser."""
+
+    return httpx.AsyncClient(transport = httpx.ASGITransport(app = app), base_url = "http://detox.local", timeout = None)
+
+
+async def login(client: httpx.AsyncClient, creator: str) -> None:
+    """Completes the oauth callback for a creator, storing credentials in its session."""
+
+    from auth.google_oauth2 import STATE
+
+    # redirects to home page on success
+    response = await client.get("/auth/oauth2callback", params = {"code": creator, "state": STATE})
+    if response.status_code >= 400:
+        response.raise_for_status()
+
+
+async def home(client: httpx.AsyncClient) -> httpx.Response:
+    """Loads home page, which fetches channel and video data into the session."""
+
+    response = await client.get("/home")
+    response.raise_for_status()
+    return response
+
+
+async def analyze(client: httpx.AsyncClient, video_id: str, full: bool = False) -> dict:
+    """Submits analysis of a video, polls its status until it finishes and loads the result page.
+
+    Args:
+        client (httpx AsyncClient): Client of a logged in creator.
+        video_id (str): Video to be analyzed.
+        full (bool): Discard previous analysis.
+
+    Raises:
+        RuntimeError: If the analysis job failed.
+
+    Returns:
+        dict: Final job status.
+    """
+
+    response = await client.get(f"/video-analysis/{video_id}", params = {"full": "true"} if full else {})
+    response.raise_for_status()
+
+    while True:
+        status = (await client.get(f"/video-analysis/{video_id}/status")).json()
+        if status["status"] in ("done", "failed"):
+            break
+        await asyncio.sleep(POLL_INTERVAL)
+
+    if status["error"]:
+        raise RuntimeError(f"Analysis of {video_id} failed: {status['error']}")
+
+    response = await client.get(f"/video-analysis/{video_id}/result")
+    response.raise_for_status()
+
+    return status
+
+
+async def reject(client: httpx.AsyncClient, video_id: str) -> None:
+    """Rejects toxic comments found by the last analysis of a video."""
+
+    # redirects to analysis page on success
+    response = await client.get(f"/video-analysis/reject-comments/{video_id}")
+    if response.status_code >= 400:
+        response.raise_for_status()
+
+
+async def timed(coroutine) -> float:
+    """Awaits coroutine and returns seconds taken."""
+
+    start = time.perf_counter()
+    await coroutine
+    return time.perf_counter() - start
+
+
+def summary(runs: list) -> dict:
+    """Median and min of run times in seconds."""
+
+    return {"median_s": round(statistics.median(runs), 4), "min_s": round(min(runs), 4), "runs": [round(run, 4) for run in runs]}
+
+
+async def run_end_to_end(comments: int = 1000, latency: float = 0.02, repeats: int = 3) -> dict:
+    """Times every route of the web-app, a fresh creator per repeat.
+
+    Args:
+        comments (int): No. of comments per video.
+        latency (float): Seconds every simulated api request takes.
+        repeats (int): No. of runs per route.
+
+    Returns:
+        dict: Results per route, and no. of simulated api requests per endpoint.
+    """
+
+    timings = {"login": [], "home": [], "video_analysis_cold": [], "video_analysis_incremental": [], "reject_comments": []}
+
+    async with running_app(latency, default_comments = comments) as (app, api):
+        for run in range(repeats):
+            creator = f"e2e{run}"
+            video_id = f"{creator}-v0"
+
+            async with app_client(app) as client:
+                timings["login"].append(await timed(login(client, creator)))
+                timings["home"].append(await timed(home(client)))
+                timings["video_analysis_cold"].append(await timed(analyze(client, video_id, full = True)))
+                timings["video_analysis_incremental"].append(await timed(analyze(client, video_id)))
+                timings["reject_comments"].append(await timed(reject(client, video_id)))
+
+        requests = dict(api.state.requests)
+
+    results = {route: summary(runs) for route, runs in timings.items()}
+    results["video_analysis_cold"]["comments"] = comments
+    results["api_requests"] = requests
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--comments", type = int, default = 1000, help = "No. of comments per video.")
+    parser.add_argument("--latency", type = float, default = 0.02, help = "Seconds every simulated api request takes.")
+    parser.add_argument("--repeats", type = int, default = 3, help = "No. of runs per route.")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run_end_to_end(args.comments, args.latency, args.repeats)), indent = 2))
+
+
+if __name__ == "__main__":
+    main()
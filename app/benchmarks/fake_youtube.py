@@ -0,0 +1,153 @@
+"""Local stand-in for the google endpoints used by the web-app: oauth token, channels, search, videos, commentThreads and comments/setModerationStatus. Serves synthetic comment corpora paginated like youtube, newest first, 100 per page, with configurable latency. Channels, search and videos responses carry ETags and are answered with 304 when revalidated with a current one, like youtube does.
+
+The web-app is pointed at it by replacing the shared http client, see `use_fake_youtube`.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import json
+from urllib.parse import parse_qs
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+from library import http_client
+
+from .corpus import synthetic_comments
+
+# comments per page, as limited by youtube
+PAGE_SIZE = 100
+
+# publish time of the newest comment of every video, older comments are a minute apart
+NEWEST_COMMENT = datetime.datetime(2022, 9, 1, tzinfo = datetime.timezone.utc)
+
+
+def create_fake_youtube(latency: float = 0.0, comment_counts: dict = None, default_comments: int = 1000, videos_per_channel: int = 3) -> FastAPI:
+    """Creates the simulated api.
+
+    Channels are derived from access tokens: authorization code '<creator>' is exchanged for access token 'token-<creator>', whose channel has videos '<creator>-v0', '<creator>-v1', ...
+
+    Args:
+        latency (float): Seconds every request takes before responding.
+        comment_counts (dict): No. of comments per video id, may be changed while the api is running.
+        default_comments (int): No. of comments of videos missing from comment_counts.
+        videos_per_channel (int): No. of videos returned by search.
+
+    Returns:
+        FastAPI: ASGI app of the api. Its state holds comment_counts, requests (no. of requests per endpoint), not_modified (no. of 304 responses per endpoint) and rejected (ids of rejected comments).
+    """
+
+    api = FastAPI()
+    api.state.comment_counts = comment_counts if comment_counts is not None else {}
+    api.state.requests = {}
+    api.state.not_modified = {}
+    api.state.rejected = set()
+
+    # generated corpora and their rendered comment threads, newest first
+    threads = {}
+
+    def creator(request: Request) -> str:
+        return request.headers.get("Authorization", "Bearer token-anonymous").split("token-", 1)[-1]
+
+    def comment_threads(video_id: str) -> list:
+        count = api.state.comment_counts.get(video_id, default_comments)
+        if (video_id, count) not in threads:
+            seed = int(hashlib.md5(video_id.encode()).hexdigest()[:8], 16)
+            corpus = synthetic_comments(count, seed)
+            threads[(video_id, count)] = [
+                {"snippet": {"topLevelComment": {"id": f"{video_id}-{i}", "snippet": {
+                    "textDisplay": text,
+                    "publishedAt": (NEWEST_COMMENT - datetime.timedelta(minutes = i)).strftime("%Y-%m-%dT%H:%M:%SZ")
+                }}}}
+                for i, text in enumerate(corpus.comment_text)
+                if f"{video_id}-{i}" not in api.state.rejected
+            ]
+
+        return threads[(video_id, count)]
+
+    def with_etag(request: Request, endpoint: str, body: dict) -> Response:
+        etag = '"' + hashlib.md5(json.dumps(body, sort_keys = True).encode()).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            api.state.not_modified[endpoint] = api.state.not_modified.get(endpoint, 0) + 1
+            return Response(status_code = 304, headers = {"ETag": etag})
+
+        return JSONResponse({"etag": etag, **body}, headers = {"ETag": etag})
+
+    @api.middleware("http")
+    async def simulate_latency(request: Request, call_next):
+        endpoint = request.url.path.rsplit("/v3/", 1)[-1]
+        api.state.requests[endpoint] = api.state.requests.get(endpoint, 0) + 1
+
+        if latency:
+            await asyncio.sleep(latency)
+
+        return await call_next(request)
+
+    @api.post("/token")
+    async def token(request: Request):
+        # urlencoded body parsed by hand, form parsing of starlette needs python-multipart
+        form = {key: values[0] for key, values in parse_qs((await request.body()).decode()).items()}
+        creator_id = form.get("code") or form.get("refresh_token", "refresh-anonymous").split("refresh-", 1)[-1]
+
+        return {"access_token": f"token-{creator_id}", "refresh_token": f"refresh-{creator_id}", "expires_in": 3599, "token_type": "Bearer"}
+
+    @api.post("/revoke")
+    async def revoke():
+        return Response(status_code = 200)
+
+    @api.get("/youtube/v3/channels")
+    async def channels(request: Request):
+        name = creator(request)
+        return with_etag(request, "channels", {"items": [{"snippet": {"title": f"Channel {name}", "thumbnails": {"medium": {"url": f"https://yt3.example/{name}.jpg"}}},
+                                                          "statistics": {"viewCount": "1000", "subscriberCount": "100", "videoCount": str(videos_per_channel)}}]})
+
+    @api.get("/youtube/v3/search")
+    async def search(request: Request):
+        name = creator(request)
+        return with_etag(request, "search", {"items": [{"id": {"videoId": f"{name}-v{k}"}} for k in range(videos_per_channel)]})
+
+    @api.get("/youtube/v3/videos")
+    async def videos(request: Request, id: str):
+        return with_etag(request, "videos", {"items": [
+            {"id": video_id,
+             "snippet": {"title": f"Video {video_id}", "description": "Synthetic video.", "thumbnails": {"medium": {"url": f"https://i.ytimg.example/{video_id}.jpg"}}},
+             "statistics": {"viewCount": "1000", "likeCount": "100", "commentCount": str(len(comment_threads(video_id)))}}
+            for video_id in id.split(",")
+        ]})
+
+    @api.get("/youtube/v3/commentThreads")
+    async def comment_thread_pages(videoId: str = "", pageToken: str = "", maxResults: int = PAGE_SIZE):
+        # youtube rejects requests naming no video, e.g. parameters spelled differently
+        if not videoId:
+            return JSONResponse({"error": {"code": 400, "message": "No filter selected. Expected one of: videoId, allThreadsRelatedToChannelId, id, channelId", "errors": [{"reason": "missingRequiredParameter"}]}}, status_code = 400)
+
+        items = comment_threads(videoId)
+
+        start = int(pageToken or 0)
+        page = {"items": items[start:start + maxResults]}
+        if start + maxResults < len(items):
+            page["nextPageToken"] = str(start + maxResults)
+
+        return JSONResponse(page)
+
+    @api.post("/youtube/v3/comments/setModerationStatus")
+    async def set_moderation_status(id: str, moderationStatus: str):
+        if moderationStatus == "rejected":
+            ids = set(id.split(","))
+            api.state.rejected.update(ids)
+
+            # rejected comments disappear from the comment threads of their video
+            for key in [key for key in threads if any(comment_id.rsplit("-", 1)[0] == key[0] for comment_id in ids)]:
+                threads[key] = [item for item in threads[key] if item["snippet"]["topLevelComment"]["id"] not in ids]
+
+        return Response(status_code = 204)
+
+    return api
+
+
+def use_fake_youtube(api: FastAPI) -> None:
+    """Makes the web-app's shared http client send every google request to the simulated api, in-process."""
+
+    http_client.client = httpx.AsyncClient(transport = httpx.ASGITransport(app = api), timeout = http_client.TIMEOUT)
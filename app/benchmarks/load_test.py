@@ -0,0 +1,282 @@
+"""Load test of the web-app with concurrent creators against the simulated youtube api. Every creator repeatedly runs a session: oauth login in a fresh browser, /home, analysis of one of its videos (sized by the video mix) and /reject-comments.
+
+Runs a step per concurrency level and reports throughput, latency percentiles per route, event loop lag, CPU and memory of the web-app process, and the level at which each of them saturates. Prints JSON.
+
+The load generator and the simulated api run in the web-app's process and on its event loop, since the simulated api is plugged into the shared http client. Their work counts towards CPU, memory and event loop lag of the web-app and competes with it, so saturation points are lower bounds for a web-app served on its own. The report repeats this under 'limitations'.
+
+    python -m benchmarks.load_test --creators 1 2 4 8 --duration 60 --mix small:200:0.6 medium:2000:0.3 large:10000:0.1
+"""
+
+from .end_to_end import running_app, app_client, login, home, analyze, reject
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+from library import http_client
+from library.process_memory import processMemory
+
+# seconds between samples of event loop lag, CPU and memory
+SAMPLE_INTERVAL = 0.05
+
+# a step saturates throughput if it's less than this factor above the previous step's
+THROUGHPUT_GAIN = 1.1
+
+# a step saturates latency if p99 of a route is more than this factor above the first step's
+LATENCY_FACTOR = 2.0
+
+# a step saturates the event loop if p99 of its lag exceeds this many milliseconds
+EVENT_LOOP_LAG_MS = 100
+
+# a step saturates CPU if the web-app process uses more than this share of the CPUs available to it
+CPU_SHARE = 0.9
+
+# caveats of the measurements, reported with the results
+LIMITATIONS = [
+    "Load generator, simulated youtube api and web-app share one process and event loop: cpu_percent, rss/pss and event_loop_lag_ms include the generator and the simulated api.",
+    "Saturation points are lower bounds for the web-app served on its own, e.g. by uvicorn in a separate process."
+]
+
+ROUTES = ("login", "home", "video_analysis", "reject_comments")
+
+
+def parse_mix(specs: list) -> list:
+    """Parses video size mix.
+
+    Args:
+        specs (list): Video sizes as 'name:comments:weight' strings.
+
+    Returns:
+        list: (name, comments, weight) tuples.
+    """
+
+    mix = []
+    for spec in specs:
+        name, comments, weight = spec.split(":")
+        mix.append((name, int(comments), float(weight)))
+
+    return mix
+
+
+def percentiles(values: list, scale: float = 1.0) -> dict:
+    """p50, p90, p99 and max of values, None if there are none."""
+
+    if not values:
+        return None
+
+    p50, p90, p99 = np.percentile(values, [50, 90, 99]) * scale
+    return {"count": len(values), "p50": round(p50, 4), "p90": round(p90, 4), "p99": round(p99, 4), "max": round(max(values) * scale, 4)}
+
+
+async def sample_resources(samples: dict, stop: asyncio.Event) -> None:
+    """Samples event loop lag (how late a sleep wakes up), CPU time and memory of this process until stop is set.
+
+    Args:
+        samples (dict): Dictionary of lists 'lag', 'rss_mb' and 'pss_mb' to append to.
+        stop (asyncio Event): Event set at the end of the step.
+    """
+
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(SAMPLE_INTERVAL)
+        samples["lag"].append(max(time.perf_counter() - start - SAMPLE_INTERVAL, 0.0))
+
+        memory = processMemory()
+        if "rss_mb" in memory:
+            samples["rss_mb"].append(memory["rss_mb"])
+            samples["pss_mb"].append(memory["pss_mb"])
+
+
+async def run_creator(app, creator: str, mix: list, deadline: float, think_time: float, latencies: dict, outcome: dict, rng: random.Random) -> None:
+    """Runs sessions of a creator until deadline.
+
+    Args:
+        app (ASGI app): The web-app.
+        creator (str): Creator name, its videos are '<creator>-v<k>' for the k-th video size of the mix.
+        mix (list): (name, comments, weight) of video sizes.
+        deadline (float): perf_counter time after which no session is started.
+        think_time (float): Mean seconds a creator waits between requests.
+        latencies (dict): Lists of seconds per route to append to.
+        outcome (dict): Counters of sessions, comments and errors to update.
+        rng (random Random): Random generator of the creator.
+    """
+
+    weights = [weight for _, _, weight in mix]
+
+    while time.perf_counter() < deadline:
+        k = rng.choices(range(len(mix)), weights = weights)[0]
+        video_id = f"{creator}-v{k}"
+
+        # every session is a new browser, i.e. a new cookie jar and oauth flow
+        async with app_client(app) as client:
+            steps = (
+                ("login", lambda: login(client, creator)),
+                ("home", lambda: home(client)),
+                ("video_analysis", lambda: analyze(client, video_id, full = True)),
+                ("reject_comments", lambda: reject(client, video_id))
+            )
+
+            try:
+                for route, step in steps:
+                    start = time.perf_counter()
+                    await step()
+                    latencies[route].append(time.perf_counter() - start)
+
+                    if think_time:
+                        await asyncio.sleep(rng.expovariate(1 / think_time))
+
+            except Exception as error:
+                outcome["errors"][type(error).__name__] = outcome["errors"].get(type(error).__name__, 0) + 1
+                continue
+
+        outcome["sessions"] += 1
+        outcome["comments"] += mix[k][1]
+
+
+async def run_step(app, api, creators: int, mix: list, duration: float, think_time: float, seed: int) -> dict:
+    """Runs concurrent creators for a duration.
+
+    Args:
+        app (ASGI app): The web-app.
+        api (FastAPI): The simulated api.
+        creators (int): No. of concurrent creators.
+        mix (list): (name, comments, weight) of video sizes.
+        duration (float): Seconds during which sessions are started, running ones are completed.
+        think_time (float): Mean seconds a creator waits between requests.
+        seed (int): Seed of the creators' random generators.
+
+    Returns:
+        dict: Throughput, latency percentiles per route, event loop lag, CPU and memory of the step.
+    """
+
+    names = [f"load{creators}c{index}" for index in range(creators)]
+    for name in names:
+        for k, (_, comments, _) in enumerate(mix):
+            api.state.comment_counts[f"{name}-v{k}"] = comments
+
+    # corpora are generated by the simulated api before timing
+    await asyncio.gather(*[
+        http_client.client.get("https://www.googleapis.com/youtube/v3/videos", params = {"id": ",".join(f"{name}-v{k}" for k in range(len(mix)))})
+        for name in names
+    ])
+
+    latencies = {route: [] for route in ROUTES}
+    outcome = {"sessions": 0, "comments": 0, "errors": {}}
+    samples = {"lag": [], "rss_mb": [], "pss_mb": []}
+
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_resources(samples, stop))
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    await asyncio.gather(*[
+        run_creator(app, name, mix, start + duration, think_time, latencies, outcome, random.Random(seed + index))
+        for index, name in enumerate(names)
+    ])
+
+    elapsed = time.perf_counter() - start
+    cpu_seconds = time.process_time() - cpu_start
+
+    stop.set()
+    await sampler
+
+    return {
+        "creators": creators,
+        "elapsed_s": round(elapsed, 2),
+        "sessions": outcome["sessions"],
+        "errors": outcome["errors"],
+        "sessions_per_s": round(outcome["sessions"] / elapsed, 3),
+        "comments_per_s": round(outcome["comments"] / elapsed, 1),
+        "latency_s": {route: percentiles(values) for route, values in latencies.items()},
+        "event_loop_lag_ms": percentiles(samples["lag"], 1000),
+        "cpu_percent": round(100 * cpu_seconds / elapsed, 1),
+        "rss_mb_max": max(samples["rss_mb"], default = None),
+        "pss_mb_max": max(samples["pss_mb"], default = None)
+    }
+
+
+def saturation(steps: list) -> dict:
+    """Finds the first concurrency level at which throughput stops growing, latency degrades, the event loop lags or CPU is exhausted.
+
+    Args:
+        steps (list): Results of run_step in increasing no. of creators.
+
+    Returns:
+        dict: No. of creators per criterion, None if it isn't reached.
+    """
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    points = {"throughput": None, "latency": None, "event_loop": None, "cpu": None}
+
+    for previous, step in zip(steps, steps[1:]):
+        if points["throughput"] is None and step["sessions_per_s"] < previous["sessions_per_s"] * THROUGHPUT_GAIN:
+            points["throughput"] = step["creators"]
+
+    for step in steps[1:]:
+        degraded = [
+            route for route in ROUTES
+            if step["latency_s"][route] and steps[0]["latency_s"][route]
+            and step["latency_s"][route]["p99"] > steps[0]["latency_s"][route]["p99"] * LATENCY_FACTOR
+        ]
+        if points["latency"] is None and degraded:
+            points["latency"] = step["creators"]
+
+    for step in steps:
+        if points["event_loop"] is None and step["event_loop_lag_ms"] and step["event_loop_lag_ms"]["p99"] > EVENT_LOOP_LAG_MS:
+            points["event_loop"] = step["creators"]
+
+        if points["cpu"] is None and step["cpu_percent"] > 100 * cpus * CPU_SHARE:
+            points["cpu"] = step["creators"]
+
+    points["cpus"] = cpus
+    return points
+
+
+async def run_load_test(creator_levels: list, mix: list, duration: float = 30.0, latency: float = 0.02, think_time: float = 0.0, seed: int = 0) -> dict:
+    """Runs a load test step per concurrency level against one instance of the web-app.
+
+    Args:
+        creator_levels (list): No. of concurrent creators of every step.
+        mix (list): (name, comments, weight) of video sizes.
+        duration (float): Seconds during which sessions are started per step.
+        latency (float): Seconds every simulated api request takes.
+        think_time (float): Mean seconds a creator waits between requests.
+        seed (int): Seed of the video size choices.
+
+    Returns:
+        dict: Parameters, results per step, saturation points and limitations of the measurements.
+    """
+
+    async with running_app(latency, videos_per_channel = len(mix)) as (app, api):
+        steps = [await run_step(app, api, creators, mix, duration, think_time, seed) for creators in sorted(creator_levels)]
+
+    return {
+        "parameters": {"duration": duration, "latency": latency, "think_time": think_time, "mix": [{"name": name, "comments": comments, "weight": weight} for name, comments, weight in mix]},
+        "steps": steps,
+        "saturation": saturation(steps),
+        "limitations": LIMITATIONS
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--creators", type = int, nargs = "+", default = [1, 2, 4, 8], help = "No. of concurrent creators per step.")
+    parser.add_argument("--duration", type = float, default = 30.0, help = "Seconds during which sessions are started per step.")
+    parser.add_argument("--mix", nargs = "+", default = ["small:200:0.6", "medium:2000:0.3", "large:10000:0.1"], help = "Video sizes as name:comments:weight.")
+    parser.add_argument("--latency", type = float, default = 0.02, help = "Seconds every simulated api request takes.")
+    parser.add_argument("--think-time", type = float, default = 0.0, help = "Mean seconds a creator waits between requests.")
+    parser.add_argument("--seed", type = int, default = 0, help = "Seed of the video size choices.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_load_test(args.creators, parse_mix(args.mix), args.duration, args.latency, args.think_time, args.seed))
+    print(json.dumps(results, indent = 2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Microbenchmarks of the analysis steps: tokenization into DetoxDataset, predict, accumulating pages and merging them into analysis state in VideoAnalysis, and rendering of the word cloud and classification graph. Prints JSON."""
+
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+from machine_learning import load_tokeninzer, load_model, predict, PredictionResult, LABELS
+from machine_learning import data_loader
+from machine_learning.data_class import DetoxDataset
+from library.video_analysis import VideoAnalysis
+from library.word_cloud import countTerms, mergeTerms, renderWordCloud, WORD_CLOUD_WIDTH, WORD_CLOUD_HEIGHT
+
+from .corpus import synthetic_comments
+from .video_analysis import pages
+
+
+def measure(function, repeats: int, items: int) -> dict:
+    """Runs function repeatedly.
+
+    Args:
+        function (callable): Function without arguments.
+        repeats (int): No. of runs.
+        items (int): No. of items (e.g. comments) processed by a run, for throughput.
+
+    Returns:
+        dict: Median and min seconds, items per second at the median and seconds of every run.
+    """
+
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - start)
+
+    median = statistics.median(runs)
+    return {"items": items, "median_s": round(median, 5), "min_s": round(min(runs), 5), "items_per_s": round(items / median, 1), "runs": [round(run, 5) for run in runs]}
+
+
+def run_micro(comments: int = 1000, repeats: int = 3) -> dict:
+    """Runs every microbenchmark. Tokenizer and model must be loaded.
+
+    Args:
+        comments (int): No. of synthetic comments per benchmark.
+        repeats (int): No. of runs per benchmark.
+
+    Returns:
+        dict: Results per benchmark.
+    """
+
+    data = synthetic_comments(comments)
+    comment_pages = pages(comments)
+    predictions = PredictionResult(data.id.values, np.zeros((comments, len(LABELS))), np.zeros((comments, len(LABELS))))
+
+    def accumulate_pages():
+        analysis_obj = VideoAnalysis()
+        for comment_dict in comment_pages:
+            analysis_obj.appendComments(comment_dict)
+        return analysis_obj.comments_df
+
+    def update_state():
+        VideoAnalysis().updateState(data.assign(published_at = "2022-01-01T00:00:00Z"), predictions)
+
+    frequencies = mergeTerms({}, countTerms(data.comment_text.tolist()))
+
+    analysis_obj = VideoAnalysis()
+    analysis_obj.state["toxic"] = {comment_id: 1 for comment_id in data.id[:comments // 10]}
+
+    return {
+        "tokenize": measure(lambda: DetoxDataset(data, data_loader.tokenizer, data_loader.MAX_LEN), repeats, comments),
+        "predict": measure(lambda: predict(data), repeats, comments),
+        "video_analysis_append_pages": measure(accumulate_pages, repeats, comments),
+        "video_analysis_update_state": measure(update_state, repeats, comments),
+        "word_cloud_render": measure(lambda: renderWordCloud(frequencies, WORD_CLOUD_WIDTH, WORD_CLOUD_HEIGHT), repeats, len(frequencies)),
+        "classification_graph": measure(lambda: analysis_obj.createClassificationGraph("benchmark"), repeats, len(analysis_obj.state["toxic"]))
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--comments", type = int, default = 1000, help = "No. of synthetic comments per benchmark.")
+    parser.add_argument("--repeats", type = int, default = 3, help = "No. of runs per benchmark.")
+    args = parser.parse_args()
+
+    load_tokeninzer()
+    load_model()
+
+    print(json.dumps(run_micro(args.comments, args.repeats), indent = 2))
+
+
+if __name__ == "__main__":
+    main()
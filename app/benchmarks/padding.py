@@ -0,0 +1,38 @@
+"""Compares inference time of fixed length (MAX_LEN) padding against length-bucketed dynamic padding."""
+
+import argparse
+import time
+
+from machine_learning import load_tokeninzer, load_model, predict
+
+from .corpus import synthetic_comments
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--comments", type = int, default = 1000, help = "No. of synthetic comments to classify.")
+    args = parser.parse_args()
+
+    load_tokeninzer()
+    load_model()
+
+    data = synthetic_comments(args.comments)
+
+    timings = {}
+    results = {}
+    for dynamic_padding in (False, True):
+        start = time.perf_counter()
+        results[dynamic_padding] = predict(data, dynamic_padding = dynamic_padding)
+        timings[dynamic_padding] = time.perf_counter() - start
+
+    mismatches = (results[False].labels != results[True].labels).any(axis = 1).sum()
+
+    print(f"comments:           {args.comments}")
+    print(f"fixed length:       {timings[False]:.2f}s")
+    print(f"dynamic padding:    {timings[True]:.2f}s")
+    print(f"speedup:            {timings[False] / timings[True]:.2f}x")
+    print(f"label mismatches:   {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
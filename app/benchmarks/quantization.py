@@ -0,0 +1,42 @@
+"""Measures speed and label agreement of the int8 quantized model against the fp32 model."""
+
+import argparse
+import json
+import time
+
+from machine_learning import load_tokeninzer, load_model, predict, label_agreement
+
+from .corpus import synthetic_comments
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--comments", type = int, default = 1000, help = "No. of synthetic comments to classify.")
+    parser.add_argument("--csv", help = "Optional csv file with id and comment_text columns to use instead of synthetic comments.")
+    args = parser.parse_args()
+
+    load_tokeninzer()
+
+    if args.csv:
+        import pandas as pd
+        data = pd.read_csv(args.csv, usecols = ["id", "comment_text"])
+    else:
+        data = synthetic_comments(args.comments)
+
+    timings = {}
+    results = {}
+    for mode in ("fp32", "int8"):
+        load_model(mode)
+        start = time.perf_counter()
+        results[mode] = predict(data)
+        timings[mode] = time.perf_counter() - start
+
+    report = label_agreement(results["fp32"], results["int8"])
+    report["seconds"] = timings
+    report["speedup"] = timings["fp32"] / timings["int8"]
+
+    print(json.dumps(report, indent = 4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Measures load_model time from the consolidated memory-mapped checkpoint against loading pretrained weights and the fine-tuned state dict. Every load runs in a fresh process, export the checkpoint first with `python -m machine_learning.checkpoint`."""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# loads model in a fresh interpreter and prints seconds taken by load_model
+LOAD_SCRIPT = """
+from machine_learning import make_predictions
+if {legacy}:
+    make_predictions.consolidated_path = "missing"
+make_predictions.load_model()
+print(make_predictions.load_seconds)
+"""
+
+
+def load_seconds(legacy: bool) -> float:
+    """Runs load_model in a subprocess.
+
+    Args:
+        legacy (bool): Load pretrained weights and the fine-tuned state dict instead of the consolidated checkpoint.
+
+    Returns:
+        float: Seconds taken by load_model.
+    """
+
+    output = subprocess.run([sys.executable, "-c", LOAD_SCRIPT.format(legacy = legacy)], capture_output = True, text = True, check = True).stdout
+    return float(output.split()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--repeats", type = int, default = 3, help = "No. of loads per approach.")
+    args = parser.parse_args()
+
+    results = {}
+    for name, legacy in (("pretrained + state dict", True), ("consolidated mmap", False)):
+        seconds = [load_seconds(legacy) for _ in range(args.repeats)]
+        results[name] = {"median_seconds": round(statistics.median(seconds), 3), "runs": [round(value, 3) for value in seconds]}
+
+    print(json.dumps(results, indent = 2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark suite: microbenchmarks and end-to-end timings against the simulated youtube api, written as one JSON document so that runs of different versions can be compared.
+
+    python -m benchmarks.suite --output after.json --baseline before.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import platform
+import subprocess
+
+from .end_to_end import run_end_to_end
+
+import torch
+
+from machine_learning import load_tokeninzer, load_model, make_predictions
+
+from .micro import run_micro
+
+# results slower than baseline by more than this factor are flagged
+REGRESSION_THRESHOLD = 1.1
+
+
+def git_commit() -> str:
+    """Commit of the benchmarked code, None outside a git checkout."""
+
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict) -> dict:
+    """Compares median times of every benchmark present in both results.
+
+    Args:
+        results (dict): Results of this run.
+        baseline (dict): Results of a previous run.
+
+    Returns:
+        dict: Per benchmark, baseline and current median seconds, their ratio and whether it's a regression.
+    """
+
+    comparison = {}
+    for layer in ("micro", "end_to_end"):
+        for name, result in results.get(layer, {}).items():
+            previous = baseline.get(layer, {}).get(name)
+            if not isinstance(result, dict) or "median_s" not in result or not previous or "median_s" not in previous:
+                continue
+
+            ratio = result["median_s"] / previous["median_s"] if previous["median_s"] else None
+            comparison[f"{layer}.{name}"] = {
+                "baseline_s": previous["median_s"],
+                "current_s": result["median_s"],
+                "ratio": round(ratio, 3) if ratio is not None else None,
+                "regression": ratio is not None and ratio > REGRESSION_THRESHOLD
+            }
+
+    return comparison
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--comments", type = int, default = 1000, help = "No. of comments per microbenchmark and per video.")
+    parser.add_argument("--latency", type = float, default = 0.02, help = "Seconds every simulated api request takes.")
+    parser.add_argument("--repeats", type = int, default = 3, help = "No. of runs per benchmark.")
+    parser.add_argument("--skip", nargs = "*", default = [], choices = ["micro", "end_to_end"], help = "Layers not to run.")
+    parser.add_argument("--output", help = "File to write results to, printed otherwise.")
+    parser.add_argument("--baseline", help = "Results of a previous run to compare against.")
+    args = parser.parse_args()
+
+    load_tokeninzer()
+    load_model()
+
+    results = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec = "seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "torch_threads": torch.get_num_threads(),
+            "model_version": make_predictions.model_version,
+            "parameters": {"comments": args.comments, "latency": args.latency, "repeats": args.repeats}
+        }
+    }
+
+    if "micro" not in args.skip:
+        results["micro"] = run_micro(args.comments, args.repeats)
+
+    if "end_to_end" not in args.skip:
+        results["end_to_end"] = asyncio.run(run_end_to_end(args.comments, args.latency, args.repeats))
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            results["comparison"] = compare(results, json.load(baseline_file))
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent = 2)
+    else:
+        print(json.dumps(results, indent = 2))
+
+
+if __name__ == "__main__":
+    main()
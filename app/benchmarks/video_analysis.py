@@ -0,0 +1,95 @@
+"""Measures time and peak memory of accumulating pages of comments in VideoAnalysis, against the previous pd.concat per page approach."""
+
+import argparse
+import time
+import tracemalloc
+
+import pandas as pd
+
+from library.video_analysis import VideoAnalysis
+
+from .corpus import synthetic_comments
+
+# comments per page returned by youtube api
+PAGE_SIZE = 100
+
+
+def pages(n: int) -> list:
+    """Splits synthetic comments into pages shaped like the output of fetchVideoComments.
+
+    Args:
+        n (int): No. of comments.
+
+    Returns:
+        list: Comment dicts of PAGE_SIZE comments each, newest first.
+    """
+
+    data = synthetic_comments(n)
+    ids = data.id.tolist()
+    texts = data.comment_text.tolist()
+    published_at = [f"2022-01-01T00:00:00.{n - i:07d}Z" for i in range(n)]
+
+    return [
+        {"id": ids[i:i + PAGE_SIZE], "comment_text": texts[i:i + PAGE_SIZE], "published_at": published_at[i:i + PAGE_SIZE]}
+        for i in range(0, n, PAGE_SIZE)
+    ]
+
+
+def concat_per_page(comment_pages: list) -> pd.DataFrame:
+    """Previous approach, concatenating every page to the whole DataFrame."""
+
+    comments_df = pd.DataFrame(columns = ["id", "comment_text", "published_at"])
+    for comment_dict in comment_pages:
+        comments_df = pd.concat([comments_df, pd.DataFrame(comment_dict)], ignore_index = True)
+
+    return comments_df
+
+
+def columnar(comment_pages: list) -> pd.DataFrame:
+    """Current approach, VideoAnalysis column buffers with a single DataFrame build."""
+
+    analysis_obj = VideoAnalysis()
+    for comment_dict in comment_pages:
+        analysis_obj.appendComments(comment_dict)
+
+    return analysis_obj.comments_df
+
+
+def measure(function, comment_pages: list) -> tuple:
+    """Runs function and measures its wall time and peak traced memory.
+
+    Returns:
+        tuple: Seconds taken and peak memory in MB.
+    """
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(comment_pages)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return seconds, peak / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--sizes", type = int, nargs = "+", default = [10_000, 100_000, 500_000], help = "No. of comments to accumulate.")
+    parser.add_argument("--baseline-max", type = int, default = 100_000, help = "Largest size for which the quadratic baseline is run.")
+    args = parser.parse_args()
+
+    print(f"{'comments':>10} {'approach':>16} {'seconds':>10} {'peak MB':>10}")
+    for size in args.sizes:
+        comment_pages = pages(size)
+
+        approaches = {"columnar": columnar}
+        if size <= args.baseline_max:
+            approaches["concat per page"] = concat_per_page
+
+        for name, function in approaches.items():
+            seconds, peak = measure(function, comment_pages)
+            print(f"{size:>10} {name:>16} {seconds:>10.2f} {peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Measures word cloud term counting and rendering, against the previous process_text over all comments and full size rendering. First pooled render includes starting the rendering processes."""
+
+import argparse
+import asyncio
+import time
+
+from wordcloud import WordCloud, STOPWORDS
+
+from library.word_cloud import countTerms, mergeTerms, renderWordCloud, WordCloudRenderer
+
+from .corpus import synthetic_comments
+
+# comments per page returned by youtube api
+PAGE_SIZE = 100
+
+
+def timed(function, *args) -> tuple:
+    """Runs function and returns its result and seconds taken."""
+
+    start = time.perf_counter()
+    result = function(*args)
+
+    return result, time.perf_counter() - start
+
+
+def count_per_page(texts: list) -> dict:
+    """Current approach, counting terms of every page and merging them into bounded frequencies."""
+
+    frequencies = {}
+    for i in range(0, len(texts), PAGE_SIZE):
+        frequencies = mergeTerms(frequencies, countTerms(texts[i:i + PAGE_SIZE]))
+
+    return frequencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument("--comments", type = int, default = 50_000, help = "No. of comments to count terms of.")
+    parser.add_argument("--processes", type = int, default = 2, help = "No. of rendering processes.")
+    args = parser.parse_args()
+
+    texts = synthetic_comments(args.comments).comment_text.tolist()
+
+    _, seconds = timed(lambda: WordCloud(stopwords = STOPWORDS, collocations = False).process_text(" ".join(texts)))
+    print(f"{'process_text, all comments':>32} {seconds:>8.3f}s")
+
+    frequencies, seconds = timed(count_per_page, texts)
+    print(f"{'countTerms per page':>32} {seconds:>8.3f}s")
+
+    _, seconds = timed(renderWordCloud, frequencies, 2500, 1800)
+    print(f"{'render 2500x1800':>32} {seconds:>8.3f}s")
+
+    renderer = WordCloudRenderer(processes = args.processes)
+
+    async def render() -> float:
+        start = time.perf_counter()
+        await renderer.render(frequencies)
+        return time.perf_counter() - start
+
+    try:
+        print(f"{f'render {renderer.width}x{renderer.height}':>32} {asyncio.run(render()):>8.3f}s")
+        print(f"{'render unchanged (cached)':>32} {asyncio.run(render()):>8.3f}s")
+    finally:
+        renderer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Measures memory of several inference worker processes, each having loaded the model and classified a batch of comments. Reports RSS and PSS per worker and summed over workers for every way of loading the model:
+
+- separate: every worker loads pretrained weights and the fine-tuned state dict, i.e. its own copy
+- mmap: every worker maps the consolidated checkpoint, weights are shared through the page cache
+- preload: model is loaded once and workers are forked afterwards, weights are shared copy-on-write
+"""
+
+import argparse
+import json
+import multiprocessing
+
+from library.process_memory import processMemory
+
+from .corpus import synthetic_comments
+
+
+def load(approach: str) -> None:
+    """Loads tokenizer and model the way an approach does."""
+
+    from machine_learning import make_predictions, load_tokeninzer
+
+    if approach in ("separate", "preload"):
+        make_predictions.consolidated_path = "missing"
+
+    load_tokeninzer()
+    make_predictions.load_model()
+
+
+def worker(approach: str, barrier, results) -> None:
+    """Loads the model unless preloaded, classifies comments and reports memory once every worker has done so, since PSS depends on which processes map a page at the same time."""
+
+    from machine_learning import predict
+
+    if approach != "preload":
+        load(approach)
+
+    predict(synthetic_comments(64))
+
+    barrier.wait()
+    results.put(processMemory())
+    barrier.wait()
+
+
+def measure(approach: str, workers: int) -> dict:
+    """Starts workers for an approach and collects their memory.
+
+    Args:
+        approach (str): 'separate', 'mmap' or 'preload'.
+        workers (int): No. of worker processes.
+
+    Returns:
+        dict: Memory of every worker and RSS and PSS summed over workers.
+    """
+
+    if approach == "preload":
+        load(approach)
+
+    context = multiprocessing.get_context("fork" if approach == "preload" else "spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+
+    processes = [context.Process(target = worker, args = (approach, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+
+    memory = [results.get() for _ in range(workers)]
+    for process in processes:
+        process.join()
+
+    return {
+        "workers": memory,
+        "total_rss_mb": round(sum(worker_memory.get("rss_mb", 0) for worker_memory in memory), 1),
+        "total_pss_mb": round(sum(worker_memory.get("pss_mb", 0) for worker_memory in memory), 1)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type = int, default = 4, help = "No. of worker processes.")
+    parser.add_argument("--approaches", nargs = "+", default = ["separate", "mmap", "preload"], help = "Ways of loading the model to measure, preload has to be last as it loads the model in this process.")
+    args = parser.parse_args()
+
+    print(json.dumps({approach: measure(approach, args.workers) for approach in args.approaches}, indent = 2))
+
+
+if __name__ == "__main__":
+    main()
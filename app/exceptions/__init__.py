@@ -2,6 +2,22 @@
 
 class QuotaExceededError(Exception):
     """Raised when request quota for the day is utilized."""
+    
+    def __init__(self, message: str, reason: str = "quotaExceeded") -> None:
+        """Constructor for the Error.
+
+        Args:
+            message (str): Error message.
+            reason (str): Why quota isn't available, reason reported by youtube (e.g. quotaExceeded, rateLimitExceeded) or 'reserved' if refused by quota admission control.
+        """
+        
+        self.reason = reason
+        self.message = message
+        super().__init__(self.message)
+
+
+class ForbiddenError(Exception):
+    """Raised when authorized account isn't permitted to perform a request, for reasons other than quota."""
     pass
 
 
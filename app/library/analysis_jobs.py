@@ -0,0 +1,352 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+
+from starlette.concurrency import run_in_threadpool
+
+from .youtube import fetchVideoComments
+from .video_analysis import VideoAnalysis
+from .analysis_state import analysis_state
+from .job_store import JobStore, job_store, ownerAlive
+from .profiler import analysis_profiler
+
+from exceptions import *
+from metrics import stage_seconds, analyses_in_flight
+
+# parameters for analysis jobs
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", 2))
+JOB_TTL = float(os.getenv("ANALYSIS_JOB_TTL", 600))
+JOB_PROGRESS_INTERVAL = float(os.getenv("ANALYSIS_JOB_PROGRESS_INTERVAL", 1))
+
+# fetch and classify pages of comments concurrently instead of one after another
+PIPELINE = os.getenv("ANALYSIS_PIPELINE", "1") == "1"
+
+
+class AnalysisJob:
+    """Analysis of a single video, run in background by AnalysisJobManager. Jobs run by other worker processes are represented by snapshots of their stored records."""
+
+    def __init__(self, video_id: str, credentials: dict, full: bool = False) -> None:
+        """Constructor for the job.
+
+        Args:
+            video_id (str): Video id corresponding to which analysis to be done.
+            credentials (dict): Authorization credentials for fetching comments.
+            full (bool): If True, discard previous analysis and analyze all comments again.
+        """
+
+        self.video_id = video_id
+        self.credentials = credentials
+        self.full = full
+
+        self.status = "queued"
+        self.error = None
+        self.has_comments = None
+        self.toxic_ids = []
+        self.stage_timings = {}
+        self.analysis_obj = None
+        self.recorded_counts = (0, 0)
+
+        self.owner = os.getpid()
+        self.created_at = time.time()
+        self.finished_at = None
+        self.done = asyncio.Event()
+
+    @classmethod
+    def fromRecord(cls, record: dict) -> "AnalysisJob":
+        """Creates a snapshot of a stored job. A job whose worker process exited before finishing it is reported as failed.
+
+        Args:
+            record (dict): Stored job.
+
+        Returns:
+            AnalysisJob: Snapshot of the job, not run by this process.
+        """
+
+        job = cls(record["video_id"], None)
+        job.status = record["status"]
+        job.error = record["error"]
+        job.has_comments = record["has_comments"]
+        job.toxic_ids = record["toxic_ids"]
+        job.stage_timings = record["stage_timings"]
+        job.recorded_counts = (record["pages_fetched"], record["comments_classified"])
+        job.owner = record["owner"]
+        job.created_at = record["created_at"]
+        job.finished_at = record["finished_at"]
+
+        if job.active and not ownerAlive(job.owner):
+            job.status = "failed"
+            job.error = "worker_exited"
+
+        if not job.active:
+            job.done.set()
+
+        return job
+
+    @contextmanager
+    def stage(self, name: str):
+        """Measures time taken by a stage of the job, for its progress and the stage histogram."""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stage_timings[name] = round(elapsed, 4)
+            stage_seconds.observe(elapsed, stage = name)
+
+    @property
+    def active(self) -> bool:
+        """True while job is queued or running."""
+
+        return self.status in ("queued", "running")
+
+    def progress(self) -> dict:
+        """Reports progress of the job.
+
+        Returns:
+            dict: Dictionary containing status, error, pages fetched, comments classified and stage timings in seconds.
+        """
+
+        pages_fetched, comments_classified = (self.analysis_obj.pages_fetched, self.analysis_obj.comments_classified) if self.analysis_obj else self.recorded_counts
+
+        return {
+            "video_id": self.video_id,
+            "status": self.status,
+            "error": self.error,
+            "pages_fetched": pages_fetched,
+            "comments_classified": comments_classified,
+            "stage_timings": self.stage_timings
+        }
+
+    def record(self) -> dict:
+        """Creates record of the job for the job store.
+
+        Returns:
+            dict: Progress of the job along with its result, owner process id and timestamps.
+        """
+
+        return {
+            **self.progress(),
+            "has_comments": self.has_comments,
+            "toxic_ids": self.toxic_ids,
+            "owner": self.owner,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+
+async def runAnalysis(job: AnalysisJob) -> None:
+    """Fetches and classifies new comments of the video, saves analysis state and creates graphs, recording results and failures on the job.
+
+    Args:
+        job (AnalysisJob): Job to be run.
+    """
+
+    video_id = job.video_id
+
+    with job.stage("load_state"):
+        if job.full:
+            await run_in_threadpool(analysis_state.delete, video_id)
+
+        job.analysis_obj = analysis_obj = VideoAnalysis(await run_in_threadpool(analysis_state.load, video_id))
+
+    try:
+        # analyses run in background and may fetch thousands of pages, they give way first as quota runs out so that pages and moderation keep working
+        comment_itr = fetchVideoComments(job.credentials, video_id, order = "time", priority = "low")
+
+        if PIPELINE:
+            # classify every batch of comments while next ones are being fetched
+            with job.stage("fetch_and_classify"):
+                await analysis_obj.analyzeStream(comment_itr)
+
+        else:
+            # get every batch of comments by iterating over async generator object and append to dataframe, until already analyzed comments are reached
+            with job.stage("fetch"):
+                async for comment_dict in comment_itr:
+                    if not analysis_obj.appendComments(comment_dict):
+                        break
+
+            # make predictions for new comments
+            with job.stage("classify"):
+                await analysis_obj.classifyComments()
+
+    except QuotaExceededError: # request quota is exceeded
+        job.error = "quota_exceeded"
+
+    except AccessTokenExpiredError: # session has to get fresh access token
+        job.error = "access_token_expired"
+
+    except (EntityNotFoundError, ForbiddenError): # no comments found or comments are disabled
+        job.has_comments = False
+
+    else:
+        job.has_comments = True
+
+        # save analysis and create necessary graphs, keeping cpu bound work off the event loop
+        with job.stage("save_state"):
+            await run_in_threadpool(analysis_state.save, video_id, analysis_obj.state)
+
+        with job.stage("word_cloud"):
+            await analysis_obj.createWordCloud(video_id)
+
+        with job.stage("classification_graph"):
+            await run_in_threadpool(analysis_obj.createClassificationGraph, video_id)
+
+        job.toxic_ids = analysis_obj.getToxicIds()
+
+
+class AnalysisJobManager:
+    """Runs analysis jobs on a pool of worker tasks. A video has at most one job queued or running across all worker processes of the web-app, later submissions join it. Jobs are recorded in the job store, so that any worker process can report their progress and results."""
+
+    def __init__(self, workers: int = ANALYSIS_WORKERS, job_ttl: float = JOB_TTL, store: JobStore = job_store, progress_interval: float = JOB_PROGRESS_INTERVAL) -> None:
+        """Constructor for the manager.
+
+        Args:
+            workers (int): No. of jobs run concurrently.
+            job_ttl (float): Seconds for which finished jobs are kept for rendering their results.
+            store (JobStore): Store shared with other worker processes.
+            progress_interval (float): Seconds between progress updates of running jobs in the store.
+        """
+
+        self.workers = workers
+        self.job_ttl = job_ttl
+        self.store = store
+        self.progress_interval = progress_interval
+        self.jobs = {}
+        self.queue = None
+        self.worker_tasks = []
+
+    async def start(self) -> None:
+        """Creates the job queue and worker tasks. Must be called from the running event loop."""
+
+        self.queue = asyncio.Queue()
+        self.worker_tasks = [asyncio.create_task(self.runWorker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancels worker tasks, running jobs are abandoned."""
+
+        for task in self.worker_tasks:
+            task.cancel()
+
+        await asyncio.gather(*self.worker_tasks, return_exceptions = True)
+        self.worker_tasks = []
+
+    async def submit(self, video_id: str, credentials: dict, full: bool = False) -> AnalysisJob:
+        """Enqueues analysis of a video unless one is already queued or running, in this or another worker process.
+
+        Args:
+            video_id (str): Video id corresponding to which analysis to be done.
+            credentials (dict): Authorization credentials for fetching comments.
+            full (bool): If True, discard previous analysis and analyze all comments again.
+
+        Returns:
+            AnalysisJob: New job, or the active job of the video (a snapshot if another worker process runs it).
+        """
+
+        self.purge()
+        await run_in_threadpool(self.store.purge, self.job_ttl)
+
+        job = self.jobs.get(video_id)
+        if job is not None and job.active:
+            return job
+
+        job = AnalysisJob(video_id, credentials, full)
+        record = await run_in_threadpool(self.store.claim, job.record())
+        if record is not None:
+            return AnalysisJob.fromRecord(record)
+
+        self.jobs[video_id] = job
+        self.queue.put_nowait(job)
+        analyses_in_flight.inc(state = "queued")
+
+        return job
+
+    async def get(self, video_id: str) -> AnalysisJob:
+        """Returns latest job of a video, a snapshot if another worker process ran it, None if there is none."""
+
+        job = self.jobs.get(video_id)
+        if job is not None and job.active:
+            return job
+
+        record = await run_in_threadpool(self.store.load, video_id)
+        if record is None or (job is not None and record["created_at"] <= job.created_at):
+            return job
+
+        return AnalysisJob.fromRecord(record)
+
+    async def wait(self, job: AnalysisJob, timeout: float) -> AnalysisJob:
+        """Waits until a job finishes or timeout seconds elapse. Jobs of other worker processes are polled from the store.
+
+        Args:
+            job (AnalysisJob): Job to be waited for.
+            timeout (float): Maximum seconds to wait.
+
+        Returns:
+            AnalysisJob: Latest state of the job.
+        """
+
+        if self.jobs.get(job.video_id) is job:
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+            return job
+
+        await asyncio.sleep(timeout)
+        return await self.get(job.video_id) or job
+
+    def purge(self) -> None:
+        """Forgets finished jobs older than job_ttl."""
+
+        now = time.time()
+        for video_id in [video_id for video_id, job in self.jobs.items() if job.finished_at and now - job.finished_at > self.job_ttl]:
+            del self.jobs[video_id]
+
+    async def recordProgress(self, job: AnalysisJob) -> None:
+        """Updates progress of a running job in the store every progress_interval seconds, until cancelled."""
+
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            await run_in_threadpool(self.store.save, job.record())
+
+    async def runWorker(self) -> None:
+        """Takes jobs from the queue and runs them one at a time."""
+
+        while True:
+            job = await self.queue.get()
+            job.status = "running"
+            analyses_in_flight.dec(state = "queued")
+            analyses_in_flight.inc(state = "running")
+
+            await run_in_threadpool(self.store.save, job.record())
+            progress_task = asyncio.create_task(self.recordProgress(job))
+
+            try:
+                async with analysis_profiler.profile("video_analysis", job.video_id) as capture:
+                    # error is recorded before the capture's metadata so that crashed analyses are identified in it
+                    try:
+                        await runAnalysis(job)
+                    except Exception as error:
+                        job.error = repr(error)
+                    finally:
+                        if capture is not None:
+                            capture.metadata.update({"full": job.full, "error": job.error, "stage_timings": job.stage_timings})
+            except Exception as error: # profiler failed to save the capture
+                job.error = job.error or repr(error)
+            finally:
+                job.status = "failed" if job.error else "done"
+                job.finished_at = time.time()
+
+                # an update of the cancelled progress task still in flight is ignored by the store once the result is saved, which happens before waiters wake up so that other worker processes see it as soon as this one
+                progress_task.cancel()
+                try:
+                    await run_in_threadpool(self.store.save, job.record())
+                finally:
+                    job.done.set()
+                    analyses_in_flight.dec(state = "running")
+
+
+# job manager shared by all requests of the web-app
+analysis_jobs = AnalysisJobManager()
\ No newline at end of file
@@ -0,0 +1,170 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# path of database storing analysis state of videos
+STATE_PATH = os.getenv("ANALYSIS_STATE_PATH", "analysis_state.sqlite3")
+
+
+def emptyState() -> dict:
+    """Creates analysis state for a video which hasn't been analyzed yet.
+
+    Returns:
+        dict: State containing newest_published (publish time of newest analyzed comment), boundary_ids (ids of analyzed comments published at newest_published), comment_count, toxic (toxic comment id to label bitmask), word_frequencies and toxic_terms (toxic comment id to its term counts, for taking them out of word_frequencies when the comment is discarded).
+    """
+
+    return {
+        "newest_published": "",
+        "boundary_ids": [],
+        "comment_count": 0,
+        "toxic": {},
+        "word_frequencies": {},
+        "toxic_terms": {}
+    }
+
+
+def discardComments(state: dict, comment_ids: list) -> list:
+    """Removes toxic comments from an analysis state in place, along with their share of comment count and word frequencies. States saved before toxic_terms was kept don't know terms of their comments, their frequencies keep counting them.
+
+    Args:
+        state (dict): Analysis state.
+        comment_ids (list): Ids of comments to be removed.
+
+    Returns:
+        list: Ids which were part of the state.
+    """
+
+    toxic_terms = state.setdefault("toxic_terms", {})
+    frequencies = state["word_frequencies"]
+
+    removed = []
+    for comment_id in comment_ids:
+        if state["toxic"].pop(comment_id, None) is None:
+            continue
+
+        removed.append(comment_id)
+
+        # terms pruned from frequencies meanwhile are simply absent
+        for term, count in toxic_terms.pop(comment_id, {}).items():
+            remaining = frequencies.get(term, 0) - count
+            if remaining > 0:
+                frequencies[term] = remaining
+            else:
+                frequencies.pop(term, None)
+
+    state["comment_count"] = max(state["comment_count"] - len(removed), 0)
+
+    return removed
+
+
+class AnalysisStateStore:
+    """Stores analysis state of every video in SQLite so that re-analysis only needs to fetch and classify new comments. Discarded comment ids are kept too, so that saving a state loaded before they were discarded (e.g. by an analysis running meanwhile) doesn't bring them back."""
+
+    def __init__(self, path: str = STATE_PATH) -> None:
+        """Constructor for the store.
+
+        Args:
+            path (str): Path of the SQLite database file.
+        """
+
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = None
+
+    def connect(self) -> sqlite3.Connection:
+        """Opens the SQLite database lazily and creates the table if needed.
+
+        Returns:
+            sqlite3 Connection: Connection to the state database.
+        """
+
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, check_same_thread = False)
+            self.connection.execute("CREATE TABLE IF NOT EXISTS analysis_state (video_id TEXT PRIMARY KEY, state TEXT NOT NULL)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS discarded (video_id TEXT NOT NULL, comment_id TEXT NOT NULL, PRIMARY KEY (video_id, comment_id))")
+            self.connection.commit()
+
+        return self.connection
+
+    @contextmanager
+    def transaction(self):
+        """Runs the block in a write transaction, taken at its start so that reads inside it aren't outdated by other writers (threads or processes). Caller must hold the lock.
+
+        Yields:
+            sqlite3 Connection: Connection to the state database.
+        """
+
+        connection = self.connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.rollback()
+            raise
+        else:
+            connection.commit()
+
+    def load(self, video_id: str) -> dict:
+        """Loads analysis state of a video.
+
+        Args:
+            video_id (str): Video id of a particular yt video.
+
+        Returns:
+            dict: Stored state, or empty state if video hasn't been analyzed.
+        """
+
+        with self.lock:
+            row = self.connect().execute("SELECT state FROM analysis_state WHERE video_id = ?", (video_id,)).fetchone()
+
+        return json.loads(row[0]) if row else emptyState()
+
+    def save(self, video_id: str, state: dict) -> None:
+        """Saves analysis state of a video. Comments discarded since the state was loaded are removed from it first, in place.
+
+        Args:
+            video_id (str): Video id of a particular yt video.
+            state (dict): State to be stored.
+        """
+
+        with self.lock, self.transaction() as connection:
+            discarded = [row[0] for row in connection.execute("SELECT comment_id FROM discarded WHERE video_id = ?", (video_id,))]
+            discardComments(state, discarded)
+
+            connection.execute("INSERT OR REPLACE INTO analysis_state (video_id, state) VALUES (?, ?)", (video_id, json.dumps(state)))
+
+    def discard(self, video_id: str, comment_ids: list) -> None:
+        """Removes comments (e.g. rejected ones) from the stored state of a video.
+
+        Args:
+            video_id (str): Video id of a particular yt video.
+            comment_ids (list): Ids of comments to be removed.
+        """
+
+        with self.lock, self.transaction() as connection:
+            connection.executemany("INSERT OR IGNORE INTO discarded (video_id, comment_id) VALUES (?, ?)", ((video_id, comment_id) for comment_id in comment_ids))
+
+            row = connection.execute("SELECT state FROM analysis_state WHERE video_id = ?", (video_id,)).fetchone()
+            if row is None:
+                return
+
+            state = json.loads(row[0])
+            discardComments(state, comment_ids)
+            connection.execute("UPDATE analysis_state SET state = ? WHERE video_id = ?", (json.dumps(state), video_id))
+
+    def delete(self, video_id: str) -> None:
+        """Deletes stored state and discarded ids of a video so that next analysis starts from scratch.
+
+        Args:
+            video_id (str): Video id of a particular yt video.
+        """
+
+        with self.lock, self.transaction() as connection:
+            connection.execute("DELETE FROM analysis_state WHERE video_id = ?", (video_id,))
+            connection.execute("DELETE FROM discarded WHERE video_id = ?", (video_id,))
+
+
+# store shared by all requests of the web-app
+analysis_state = AnalysisStateStore()
\ No newline at end of file
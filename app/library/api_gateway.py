@@ -0,0 +1,285 @@
+import datetime
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from zoneinfo import ZoneInfo
+
+import httpx
+from starlette.concurrency import run_in_threadpool
+
+from .http_client import getClient
+
+from exceptions import *
+from metrics import youtube_requests, youtube_quota_units
+
+# quota units charged per request of every endpoint (youtube data api v3)
+QUOTA_COSTS = {
+    "channels": 1,
+    "videos": 1,
+    "search": 100,
+    "commentThreads": 1,
+    "comments/setModerationStatus": 50
+}
+
+# error reasons of 403 responses which are quota failures, first two exhaust quota for the day
+EXHAUSTED_REASONS = {"quotaExceeded", "dailyLimitExceeded"}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+# endpoints whose responses are cached and revalidated with etags
+CACHEABLE = {"channels", "videos", "search"}
+
+# parameters for the gateway
+DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", 10_000))
+PROJECT = os.getenv("CLIENT_ID", "default")
+QUOTA_PATH = os.getenv("YOUTUBE_QUOTA_PATH", "youtube_quota.sqlite3")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 1000))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 60))
+
+# fraction of daily quota kept in reserve from requests of each priority
+PRIORITY_RESERVE = {
+    "high": 0.0,
+    "normal": float(os.getenv("QUOTA_RESERVE_NORMAL", 0.05)),
+    "low": float(os.getenv("QUOTA_RESERVE_LOW", 0.2))
+}
+
+# youtube quota resets at midnight pacific time
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+
+class YouTubeGateway:
+    """Gateway for youtube data api requests. Tracks quota spent per project per day in SQLite, so that it is shared by every worker process and survives restarts, refuses requests whose priority doesn't allow dipping into the reserve, and caches responses of rarely changing resources revalidating them with etags."""
+
+    def __init__(self, daily_quota: int = DAILY_QUOTA, project: str = PROJECT, cache_size: int = RESPONSE_CACHE_SIZE, cache_ttl: float = RESPONSE_CACHE_TTL, path: str = QUOTA_PATH) -> None:
+        """Constructor for the gateway.
+
+        Args:
+            daily_quota (int): Quota units available per day.
+            project (str): Google cloud project the quota belongs to.
+            cache_size (int): Maximum no. of cached responses.
+            cache_ttl (float): Seconds for which a cached response is served without revalidating it.
+            path (str): Path of the SQLite database file holding quota spent.
+        """
+
+        self.daily_quota = daily_quota
+        self.project = project
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = None
+        self.cache = OrderedDict()
+
+    def connect(self) -> sqlite3.Connection:
+        """Opens the SQLite database lazily and creates the table if needed.
+
+        Returns:
+            sqlite3 Connection: Connection to the quota database.
+        """
+
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, check_same_thread = False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS quota (project TEXT NOT NULL, day TEXT NOT NULL, spent INTEGER NOT NULL, PRIMARY KEY (project, day))")
+            self.connection.commit()
+
+        return self.connection
+
+    @staticmethod
+    def endpoint(request_uri: str) -> str:
+        """Extracts endpoint name from request uri, e.g. 'channels' or 'comments/setModerationStatus'."""
+
+        return request_uri.split("/youtube/v3/", 1)[-1]
+
+    def today(self) -> datetime.date:
+        """Current quota day."""
+
+        return datetime.datetime.now(QUOTA_TIMEZONE).date()
+
+    def spentToday(self) -> int:
+        """Quota units spent today by the project.
+
+        Returns:
+            int: Units spent.
+        """
+
+        with self.lock:
+            row = self.connect().execute("SELECT spent FROM quota WHERE project = ? AND day = ?", (self.project, self.today().isoformat())).fetchone()
+
+        return row[0] if row else 0
+
+    def reserve(self, endpoint: str, priority: str) -> None:
+        """Admits a request and charges its cost to quota spent today by the project, in one transaction so that concurrent requests of any worker can't all pass the check.
+
+        Args:
+            endpoint (str): Endpoint of the request.
+            priority (str): 'high', 'normal' or 'low'.
+
+        Raises:
+            QuotaExceededError: If the request would leave less quota than reserved for its priority.
+        """
+
+        day = self.today().isoformat()
+        cost = QUOTA_COSTS.get(endpoint, 1)
+
+        with self.lock:
+            connection = self.connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute("SELECT spent FROM quota WHERE project = ? AND day = ?", (self.project, day)).fetchone()
+                self.admit(endpoint, priority, row[0] if row else 0)
+
+                connection.execute("INSERT INTO quota (project, day, spent) VALUES (?, ?, ?) ON CONFLICT (project, day) DO UPDATE SET spent = spent + excluded.spent", (self.project, day, cost))
+            except BaseException:
+                connection.rollback()
+                raise
+            else:
+                connection.commit()
+
+    def exhaust(self) -> None:
+        """Marks quota of the project as spent for the rest of the day."""
+
+        with self.lock:
+            connection = self.connect()
+            connection.execute("INSERT INTO quota (project, day, spent) VALUES (?, ?, ?) ON CONFLICT (project, day) DO UPDATE SET spent = MAX(spent, excluded.spent)", (self.project, self.today().isoformat(), self.daily_quota))
+            connection.commit()
+
+    def usage(self) -> dict:
+        """Quota usage of the project.
+
+        Returns:
+            dict: Dictionary containing daily quota, units spent and units remaining today.
+        """
+
+        spent = self.spentToday()
+        return {"project": self.project, "daily_quota": self.daily_quota, "spent": spent, "remaining": max(self.daily_quota - spent, 0)}
+
+    def admit(self, endpoint: str, priority: str, spent: int) -> None:
+        """Checks whether a request may be sent.
+
+        Args:
+            endpoint (str): Endpoint of the request.
+            priority (str): 'high', 'normal' or 'low'.
+            spent (int): Quota units spent today.
+
+        Raises:
+            QuotaExceededError: If the request would leave less quota than reserved for its priority.
+        """
+
+        remaining = self.daily_quota - spent - QUOTA_COSTS.get(endpoint, 1)
+        if remaining < self.daily_quota * PRIORITY_RESERVE[priority]:
+            raise QuotaExceededError(f"Remaining quota is reserved, {priority} priority {endpoint} request refused.", reason = "reserved")
+
+    def cacheKey(self, endpoint: str, params: dict, headers: dict) -> tuple:
+        """Creates cache key for a request. Responses depend on the authorized user, hence authorization is part of the key."""
+
+        authorization = hashlib.sha256(headers.get("Authorization", "").encode()).hexdigest()
+        return (endpoint, authorization, tuple(sorted((name, str(value)) for name, value in params.items() if name != "key")))
+
+    async def get(self, request_uri: str, params: dict, headers: dict, priority: str = "normal") -> httpx.Response:
+        """Sends GET request through the gateway."""
+
+        return await self.send("GET", request_uri, params, headers, priority)
+
+    async def post(self, request_uri: str, params: dict, headers: dict, priority: str = "normal") -> httpx.Response:
+        """Sends POST request through the gateway."""
+
+        return await self.send("POST", request_uri, params, headers, priority)
+
+    async def send(self, method: str, request_uri: str, params: dict, headers: dict, priority: str = "normal") -> httpx.Response:
+        """Sends request to youtube data api, serving cacheable resources from cache when possible.
+
+        Args:
+            method (str): Http method.
+            request_uri (str): Uri of the endpoint.
+            params (dict): Query parameters.
+            headers (dict): Request headers.
+            priority (str): 'high', 'normal' or 'low', lower priorities are refused earlier as quota runs out.
+
+        Raises:
+            QuotaExceededError: If request is refused by admission control or youtube reports a quota failure.
+
+        Returns:
+            httpx Response: Response of the api, for a revalidated cached resource a 200 response with the cached body.
+        """
+
+        endpoint = self.endpoint(request_uri)
+        cacheable = method == "GET" and endpoint in CACHEABLE
+
+        cached = None
+        if cacheable:
+            key = self.cacheKey(endpoint, params, headers)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache.move_to_end(key)
+                etag, body, stored_at = cached
+
+                # fresh enough, no request needed
+                if time.monotonic() - stored_at < self.cache_ttl:
+                    return httpx.Response(200, json = body, headers = {"ETag": etag})
+
+                headers = {**headers, "If-None-Match": etag}
+
+        # a sent request costs quota whatever its outcome, including 304s
+        await run_in_threadpool(self.reserve, endpoint, priority)
+        youtube_quota_units.inc(QUOTA_COSTS.get(endpoint, 1), endpoint = endpoint)
+
+        try:
+            response = await getClient().request(method, request_uri, params = params, headers = headers)
+        except httpx.HTTPError:
+            youtube_requests.inc(endpoint = endpoint, status = "error")
+            raise
+
+        youtube_requests.inc(endpoint = endpoint, status = response.status_code)
+
+        if response.status_code == 403:
+            await run_in_threadpool(self.raiseForQuota, response)
+
+        if cacheable:
+            if response.status_code == 304 and cached is not None:
+                self.store(key, etag, body)
+                return httpx.Response(200, json = body, headers = {"ETag": etag})
+
+            if response.status_code == 200 and "ETag" in response.headers:
+                self.store(key, response.headers["ETag"], response.json())
+
+        return response
+
+    def store(self, key: tuple, etag: str, body: dict) -> None:
+        """Stores a response in cache, evicting least recently used ones."""
+
+        self.cache[key] = (etag, body, time.monotonic())
+        self.cache.move_to_end(key)
+
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last = False)
+
+    def raiseForQuota(self, response: httpx.Response) -> None:
+        """Raises QuotaExceededError if a 403 response is a quota failure. Quota is marked exhausted for the day if youtube says so.
+
+        Args:
+            response (httpx Response): 403 response.
+
+        Raises:
+            QuotaExceededError: If response is a quota failure.
+        """
+
+        try:
+            errors = response.json()["error"]["errors"]
+        except (ValueError, KeyError, TypeError):
+            return
+
+        reasons = {error.get("reason") for error in errors}
+
+        if reasons & EXHAUSTED_REASONS:
+            self.exhaust()
+            raise QuotaExceededError("Request quota exceeded for the day.", reason = (reasons & EXHAUSTED_REASONS).pop())
+
+        if reasons & RATE_LIMIT_REASONS:
+            raise QuotaExceededError("Request rate limit exceeded.", reason = (reasons & RATE_LIMIT_REASONS).pop())
+
+
+# gateway shared by all requests of the web-app
+gateway = YouTubeGateway()
\ No newline at end of file
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# parameters for the artifact store
+ARTIFACT_PATH = os.getenv("ARTIFACT_PATH", "artifacts.sqlite3")
+ARTIFACT_STORE_SIZE = int(os.getenv("ARTIFACT_STORE_SIZE", 256))
+ARTIFACT_TTL = float(os.getenv("ARTIFACT_TTL", 3600))
+
+
+class ArtifactStore:
+    """Keeps rendered analysis artifacts (word clouds, graphs) in SQLite for serving them to the analysis page, so that any worker process serves artifacts rendered by another one. Artifacts expire ttl seconds after being stored and least recently used ones are evicted beyond max_items."""
+
+    def __init__(self, path: str = ARTIFACT_PATH, max_items: int = ARTIFACT_STORE_SIZE, ttl: float = ARTIFACT_TTL) -> None:
+        """Constructor for the store.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            max_items (int): Maximum no. of stored artifacts.
+            ttl (float): Seconds after which an artifact expires.
+        """
+
+        self.path = path
+        self.max_items = max_items
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.connection = None
+
+    def connect(self) -> sqlite3.Connection:
+        """Opens the SQLite database lazily and creates the table if needed.
+
+        Returns:
+            sqlite3 Connection: Connection to the artifact database.
+        """
+
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, check_same_thread = False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS artifacts (video_id TEXT NOT NULL, name TEXT NOT NULL, content BLOB NOT NULL, media_type TEXT NOT NULL, etag TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (video_id, name))")
+            self.connection.commit()
+
+        return self.connection
+
+    def put(self, video_id: str, name: str, content: bytes, media_type: str) -> str:
+        """Stores an artifact, replacing previous one of the same name.
+
+        Args:
+            video_id (str): Video id the artifact belongs to.
+            name (str): Name of the artifact, e.g. 'word_cloud'.
+            content (bytes): Rendered artifact.
+            media_type (str): Media type of the content.
+
+        Returns:
+            str: ETag of the artifact.
+        """
+
+        etag = '"' + hashlib.blake2b(content, digest_size = 16).hexdigest() + '"'
+        now = time.time()
+
+        with self.lock:
+            connection = self.connect()
+            connection.execute("INSERT OR REPLACE INTO artifacts (video_id, name, content, media_type, etag, expires_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)", (video_id, name, content, media_type, etag, now + self.ttl, now))
+            connection.execute("DELETE FROM artifacts WHERE rowid IN (SELECT rowid FROM artifacts ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_items,))
+            connection.commit()
+
+        return etag
+
+    def get(self, video_id: str, name: str) -> tuple:
+        """Looks an artifact up.
+
+        Args:
+            video_id (str): Video id the artifact belongs to.
+            name (str): Name of the artifact.
+
+        Returns:
+            tuple: Content, media type and ETag, None if artifact doesn't exist or has expired.
+        """
+
+        now = time.time()
+
+        with self.lock:
+            connection = self.connect()
+            row = connection.execute("SELECT content, media_type, etag, expires_at FROM artifacts WHERE video_id = ? AND name = ?", (video_id, name)).fetchone()
+            if row is None:
+                return None
+
+            content, media_type, etag, expires_at = row
+            if expires_at < now:
+                connection.execute("DELETE FROM artifacts WHERE video_id = ? AND name = ?", (video_id, name))
+                connection.commit()
+                return None
+
+            connection.execute("UPDATE artifacts SET last_used = ? WHERE video_id = ? AND name = ?", (now, video_id, name))
+            connection.commit()
+
+            return content, media_type, etag
+
+
+# store shared by all requests of the web-app
+artifact_store = ArtifactStore()
@@ -0,0 +1,50 @@
+import asyncio
+
+
+class RequestCoalescer:
+    """Coalesces identical in-flight requests. The first caller for a key starts the request, callers arriving while it is in flight await the same result."""
+
+    def __init__(self) -> None:
+        """Constructor for the coalescer. Initializes map of in-flight requests."""
+
+        self.in_flight = {}
+
+    async def run(self, key, request_factory):
+        """Runs request for key, or joins the one already in flight.
+
+        Args:
+            key (hashable): Identifies identical requests.
+            request_factory (callable): Returns the coroutine performing the request, only called if no request for key is in flight.
+
+        Returns:
+            Any: Result of the request. Exceptions raised by it are raised for every caller.
+        """
+
+        task = self.in_flight.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(request_factory())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self.finish(key, done))
+
+        # a caller going away (e.g. client disconnect) mustn't cancel the request for others
+        return await asyncio.shield(task)
+
+    def finish(self, key, task: asyncio.Task) -> None:
+        """Forgets a completed request so that later calls start a fresh one.
+
+        Args:
+            key (hashable): Key of the request.
+            task (asyncio Task): Completed request.
+        """
+
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+
+        # mark exception as retrieved in case every caller has gone away
+        if not task.cancelled():
+            task.exception()
+
+
+# coalescer shared by all requests of the web-app
+coalescer = RequestCoalescer()
@@ -0,0 +1,63 @@
+import importlib.util
+import os
+
+import httpx
+
+# parameters for the shared http client
+HTTP2 = os.getenv("HTTP2", "0") == "1"
+TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 10))
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+
+client = None
+
+
+def createClient() -> httpx.AsyncClient:
+    """Creates an http client with connection pooling and keep-alive. HTTP/2 is used if enabled and the optional h2 package is installed.
+
+    Returns:
+        httpx AsyncClient: Client for sending requests to google apis.
+    """
+
+    return httpx.AsyncClient(
+        http2 = HTTP2 and importlib.util.find_spec("h2") is not None,
+        timeout = httpx.Timeout(TIMEOUT, connect = CONNECT_TIMEOUT),
+        limits = httpx.Limits(
+            max_connections = MAX_CONNECTIONS,
+            max_keepalive_connections = MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry = KEEPALIVE_EXPIRY
+        )
+    )
+
+
+async def startClient() -> None:
+    """Creates the application wide http client, called on app startup."""
+
+    global client
+    if client is None:
+        client = createClient()
+
+
+async def closeClient() -> None:
+    """Closes the application wide http client and its pooled connections, called on app shutdown."""
+
+    global client
+    if client is not None:
+        await client.aclose()
+        client = None
+
+
+def getClient() -> httpx.AsyncClient:
+    """Returns the application wide http client, creating it if app startup hasn't done so (e.g. in scripts).
+
+    Returns:
+        httpx AsyncClient: Shared client for sending requests to google apis.
+    """
+
+    global client
+    if client is None:
+        client = createClient()
+
+    return client
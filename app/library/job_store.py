@@ -0,0 +1,137 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# path of database storing analysis jobs of every worker process
+JOBS_PATH = os.getenv("ANALYSIS_JOBS_PATH", "analysis_jobs.sqlite3")
+
+
+def ownerAlive(pid: int) -> bool:
+    """Checks whether the worker process owning a job is still running. Worker processes of the web-app run on one host, sharing the database file.
+
+    Args:
+        pid (int): Process id of the owner.
+
+    Returns:
+        bool: True if the process exists.
+    """
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError: # exists, but belongs to another user
+        return True
+
+    return True
+
+
+def isActive(record: dict) -> bool:
+    """Checks whether a stored job is queued or running in a live worker process.
+
+    Args:
+        record (dict): Stored job.
+
+    Returns:
+        bool: True if the job is still going on.
+    """
+
+    return record["status"] in ("queued", "running") and ownerAlive(record["owner"])
+
+
+class JobStore:
+    """Stores the latest analysis job of every video in SQLite, so that any worker process can report progress and render results of a job run by another one, and a video isn't analyzed by two worker processes at once."""
+
+    def __init__(self, path: str = JOBS_PATH) -> None:
+        """Constructor for the store.
+
+        Args:
+            path (str): Path of the SQLite database file.
+        """
+
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = None
+
+    def connect(self) -> sqlite3.Connection:
+        """Opens the SQLite database lazily and creates the table if needed.
+
+        Returns:
+            sqlite3 Connection: Connection to the jobs database.
+        """
+
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, check_same_thread = False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS jobs (video_id TEXT PRIMARY KEY, record TEXT NOT NULL, created_at REAL NOT NULL, finished_at REAL)")
+            self.connection.commit()
+
+        return self.connection
+
+    def claim(self, record: dict) -> dict:
+        """Stores a new job unless the video's latest job is still going on in a live worker process, in one transaction so that concurrent submissions of any worker process don't both start.
+
+        Args:
+            record (dict): New job, containing video_id, status, owner (process id), created_at and finished_at.
+
+        Returns:
+            dict: Job going on, None if the new job was stored.
+        """
+
+        with self.lock:
+            connection = self.connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute("SELECT record FROM jobs WHERE video_id = ?", (record["video_id"],)).fetchone()
+                if row is not None and isActive(json.loads(row[0])):
+                    return json.loads(row[0])
+
+                connection.execute("INSERT OR REPLACE INTO jobs (video_id, record, created_at, finished_at) VALUES (?, ?, ?, ?)", (record["video_id"], json.dumps(record), record["created_at"], record["finished_at"]))
+                return None
+            finally:
+                connection.commit()
+
+    def save(self, record: dict) -> None:
+        """Updates progress or result of a claimed job. Finished jobs and jobs replaced by a newer one aren't updated, so a late progress update can't overwrite a result.
+
+        Args:
+            record (dict): Job, containing video_id, created_at and finished_at.
+        """
+
+        with self.lock:
+            connection = self.connect()
+            connection.execute("UPDATE jobs SET record = ?, finished_at = ? WHERE video_id = ? AND created_at = ? AND finished_at IS NULL", (json.dumps(record), record["finished_at"], record["video_id"], record["created_at"]))
+            connection.commit()
+
+    def load(self, video_id: str) -> dict:
+        """Loads the latest job of a video.
+
+        Args:
+            video_id (str): Video id of the job.
+
+        Returns:
+            dict: Stored job, None if there is none.
+        """
+
+        with self.lock:
+            row = self.connect().execute("SELECT record FROM jobs WHERE video_id = ?", (video_id,)).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+    def purge(self, ttl: float) -> None:
+        """Deletes jobs finished more than ttl seconds ago.
+
+        Args:
+            ttl (float): Seconds for which finished jobs are kept.
+        """
+
+        with self.lock:
+            connection = self.connect()
+            connection.execute("DELETE FROM jobs WHERE finished_at < ?", (time.time() - ttl,))
+            connection.commit()
+
+
+# store shared by all requests of the web-app
+job_store = JobStore()
@@ -0,0 +1,36 @@
+import os
+
+# fields of /proc/<pid>/smaps_rollup reported, in kB
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def processMemory(pid: int = None) -> dict:
+    """Reports memory of a process. PSS divides every shared page between the processes mapping it, so summing PSS over workers gives their real footprint while summing RSS counts shared model weights once per worker.
+
+    Args:
+        pid (int): Process id, defaults to current process.
+
+    Returns:
+        dict: Dictionary containing pid, rss_mb, pss_mb, shared_mb and private_mb. Only pid if smaps_rollup can't be read.
+    """
+
+    pid = pid or os.getpid()
+    memory = {"pid": pid}
+
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as smaps:
+            fields = {}
+            for line in smaps:
+                name, _, value = line.partition(":")
+                if name in SMAPS_FIELDS:
+                    fields[name] = int(value.split()[0]) / 1024
+
+    except OSError: # not linux, or kernel older than 4.14
+        return memory
+
+    memory["rss_mb"] = round(fields["Rss"], 1)
+    memory["pss_mb"] = round(fields["Pss"], 1)
+    memory["shared_mb"] = round(fields["Shared_Clean"] + fields["Shared_Dirty"], 1)
+    memory["private_mb"] = round(fields["Private_Clean"] + fields["Private_Dirty"], 1)
+
+    return memory
@@ -0,0 +1,357 @@
+import collections
+import datetime
+import io
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import zipfile
+from contextlib import asynccontextmanager
+
+from starlette.concurrency import run_in_threadpool
+
+from .job_store import ownerAlive
+
+# parameters for profiling slow analyses, off unless enabled
+PROFILE_ANALYSES = os.getenv("PROFILE_ANALYSES", "0") == "1"
+PROFILE_THRESHOLD = float(os.getenv("PROFILE_THRESHOLD", 10))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", 10)) / 1000
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_CAPTURES = int(os.getenv("PROFILE_CAPTURES", 20))
+PROFILE_TORCH_BATCHES = int(os.getenv("PROFILE_TORCH_BATCHES", 2))
+
+# no. of functions listed in the summary of a capture
+SUMMARY_FUNCTIONS = 30
+
+
+def foldStack(frame, thread_name: str) -> str:
+    """Collapses a stack into 'thread;outermost (file:line);...;innermost (file:line)', the folded format read by flamegraph.pl and speedscope."""
+
+    calls = []
+    while frame is not None:
+        code = frame.f_code
+        calls.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+
+    return ";".join([thread_name] + calls[::-1])
+
+
+def summarizeStacks(stacks: collections.Counter, samples: int) -> str:
+    """Lists functions taking most samples, by self (innermost frame) and total (anywhere on the stack) samples.
+
+    Args:
+        stacks (Counter): Samples per folded stack.
+        samples (int): No. of times threads were sampled.
+
+    Returns:
+        str: Text summary.
+    """
+
+    own = collections.Counter()
+    total = collections.Counter()
+    for stack, count in stacks.items():
+        calls = stack.split(";")[1:]
+        if calls:
+            own[calls[-1]] += count
+        for call in set(calls):
+            total[call] += count
+
+    lines = [f"{samples} samples of every thread\n", "self samples:"]
+    lines += [f"{count:8d}  {call}" for call, count in own.most_common(SUMMARY_FUNCTIONS)]
+    lines += ["", "total samples:"]
+    lines += [f"{count:8d}  {call}" for call, count in total.most_common(SUMMARY_FUNCTIONS)]
+
+    return "\n".join(lines) + "\n"
+
+
+class Capture:
+    """Profile data being recorded for one analysis. Its metadata holds the most analyses that ran alongside it ('concurrent') and whatever the profiled code adds."""
+
+    def __init__(self, kind: str, name: str, sampled: bool) -> None:
+        """Constructor for the capture.
+
+        Args:
+            kind (str): What is profiled, e.g. 'video_analysis'.
+            name (str): Identifies the profiled unit, e.g. video id.
+            sampled (bool): Chosen by sampling rate, i.e. kept whatever its duration.
+        """
+
+        self.kind = kind
+        self.name = name
+        self.sampled = sampled
+        self.armed = sampled
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.samples = 0
+        self.stacks = collections.Counter()
+        self.traces = []
+        self.metadata = {}
+
+    def elapsed(self) -> float:
+        """Seconds since the capture started."""
+
+        return time.perf_counter() - self.start
+
+
+class AnalysisProfiler:
+    """Opt-in profiler of analyses. While any analysis runs, a thread samples stacks of every thread of the process, which costs little enough to record every analysis. Analyses chosen by sampling rate, or running longer than the threshold, also trace the next few predict calls with torch.profiler, and are kept on disk in a bounded ring of zip archives; others are discarded.
+
+    Concurrent analyses share the event loop and inference thread, so stacks and traces of a capture include work of analyses running alongside it, their no. is recorded.
+    """
+
+    def __init__(self, enabled: bool = PROFILE_ANALYSES, threshold: float = PROFILE_THRESHOLD, sample_rate: float = PROFILE_SAMPLE_RATE, interval: float = PROFILE_INTERVAL, directory: str = PROFILE_DIR, max_captures: int = PROFILE_CAPTURES, torch_batches: int = PROFILE_TORCH_BATCHES) -> None:
+        """Constructor for the profiler.
+
+        Args:
+            enabled (bool): Profile analyses.
+            threshold (float): Seconds after which an analysis is captured.
+            sample_rate (float): Fraction of analyses captured whatever their duration.
+            interval (float): Seconds between stack samples.
+            directory (str): Directory of the capture ring.
+            max_captures (int): No. of captures kept, oldest are deleted first.
+            torch_batches (int): No. of predict calls traced per capture.
+        """
+
+        self.enabled = enabled
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.directory = directory
+        self.max_captures = max_captures
+        self.torch_batches = torch_batches
+
+        # reason why predict calls can't be traced in this process, e.g. they run in the inference server, recorded in every capture
+        self.torch_unavailable = None
+
+        self.active = []
+        self.lock = threading.Lock()
+        self.sampler = None
+        self.trace_count = 0
+
+        # traces of predict calls still running, which are written once the call finishes
+        self.pending = set()
+
+    @asynccontextmanager
+    async def profile(self, kind: str, name: str):
+        """Profiles the block, saving the capture if it was sampled or took longer than threshold.
+
+        Args:
+            kind (str): What is profiled, e.g. 'video_analysis'.
+            name (str): Identifies the profiled unit, e.g. video id.
+
+        Yields:
+            Capture: Capture whose metadata is saved with it, None if profiling is disabled.
+        """
+
+        if not self.enabled:
+            yield None
+            return
+
+        capture = Capture(kind, name, random.random() < self.sample_rate)
+        with self.lock:
+            capture.metadata["concurrent"] = len(self.active)
+            self.active.append(capture)
+            if self.sampler is None or not self.sampler.is_alive():
+                self.sampler = threading.Thread(target = self.runSampler, name = "profiler", daemon = True)
+                self.sampler.start()
+
+        try:
+            yield capture
+        finally:
+            with self.lock:
+                self.active.remove(capture)
+
+            duration = capture.elapsed()
+            if capture.sampled or duration >= self.threshold:
+                await run_in_threadpool(self.save, capture, duration)
+
+            await run_in_threadpool(self.removeTraces, capture)
+
+    def runSampler(self) -> None:
+        """Samples stacks of every other thread into active captures and arms captures crossing the threshold, until none is active."""
+
+        own = threading.get_ident()
+
+        while True:
+            time.sleep(self.interval)
+
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = [foldStack(frame, names.get(ident, str(ident))) for ident, frame in sys._current_frames().items() if ident != own]
+
+            with self.lock:
+                if not self.active:
+                    self.sampler = None
+                    return
+
+                for capture in self.active:
+                    capture.samples += 1
+                    capture.stacks.update(stacks)
+                    capture.metadata["concurrent"] = max(capture.metadata["concurrent"], len(self.active) - 1)
+
+                    if not capture.armed and capture.elapsed() >= self.threshold:
+                        capture.armed = True
+
+    def nextTrace(self) -> str:
+        """Asks whether the next predict call is to be traced, called by the inference service before every batch.
+
+        Returns:
+            str: Path to write the torch trace to, None if no armed capture needs one.
+        """
+
+        with self.lock:
+            captures = [capture for capture in self.active if capture.armed and len(capture.traces) < self.torch_batches]
+            if not captures:
+                return None
+
+            self.trace_count += 1
+            path = os.path.join(self.directory, ".traces", f"predict-{os.getpid()}-{self.trace_count}.json")
+            for capture in captures:
+                capture.traces.append(path)
+            self.pending.add(path)
+
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        return path
+
+    def traceDone(self, path: str) -> None:
+        """Called by the inference service once a traced predict call finished. Its trace is deleted if every capture it was taken for has finished meanwhile.
+
+        Args:
+            path (str): Path of the trace, as returned by nextTrace.
+        """
+
+        with self.lock:
+            self.pending.discard(path)
+            shared = {path for active in self.active for path in active.traces}
+
+        if path not in shared and os.path.exists(path):
+            os.remove(path)
+
+    def removeTraces(self, capture: Capture) -> None:
+        """Deletes torch traces of a finished capture which no active capture shares. Traces still being written are deleted by traceDone."""
+
+        with self.lock:
+            shared = {path for active in self.active for path in active.traces} | self.pending
+
+        for path in set(capture.traces) - shared:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def pruneTraces(self) -> None:
+        """Deletes traces of this process which neither an active capture nor a running predict call owns, and traces left behind by processes which exited while tracing. Other worker processes sharing the directory keep theirs."""
+
+        directory = os.path.join(self.directory, ".traces")
+        if not os.path.isdir(directory):
+            return
+
+        with self.lock:
+            owned = {path for active in self.active for path in active.traces} | self.pending
+
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            match = re.fullmatch(r"predict-(\d+)-\d+\.json", name)
+            if path in owned or (match and int(match.group(1)) != os.getpid() and ownerAlive(int(match.group(1)))):
+                continue
+
+            try:
+                os.remove(path)
+            except FileNotFoundError: # deleted meanwhile
+                pass
+
+    def save(self, capture: Capture, duration: float) -> None:
+        """Writes a capture to the ring as a zip archive of metadata, folded stacks, their summary and torch traces, and deletes the oldest captures beyond max_captures.
+
+        Args:
+            capture (Capture): Finished capture.
+            duration (float): Seconds the profiled block took.
+        """
+
+        started = datetime.datetime.fromtimestamp(capture.started_at, datetime.timezone.utc)
+        capture_id = f"{started:%Y%m%dT%H%M%S}-{capture.kind}-{re.sub(r'[^A-Za-z0-9_-]', '_', capture.name)}-{int(duration * 1000)}ms.zip"
+
+        metadata = {
+            "id": capture_id,
+            "kind": capture.kind,
+            "name": capture.name,
+            "started_at": started.isoformat(timespec = "seconds"),
+            "duration_s": round(duration, 3),
+            "reason": "sampled" if capture.sampled else "threshold",
+            "threshold_s": self.threshold,
+            "samples": capture.samples,
+            "interval_ms": self.interval * 1000,
+            "torch_traces": len([path for path in capture.traces if os.path.exists(path)]),
+            **capture.metadata
+        }
+        if self.torch_unavailable:
+            metadata["torch_traces_unavailable"] = self.torch_unavailable
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("metadata.json", json.dumps(metadata, indent = 2))
+            archive.writestr("stacks.folded", "".join(f"{stack} {count}\n" for stack, count in capture.stacks.most_common()))
+            archive.writestr("summary.txt", summarizeStacks(capture.stacks, capture.samples))
+            for index, path in enumerate(path for path in capture.traces if os.path.exists(path)):
+                archive.write(path, f"predict-{index}.json")
+
+        # written next to the ring and renamed so that listings never see a partial archive
+        os.makedirs(self.directory, exist_ok = True)
+        temporary = os.path.join(self.directory, f".{capture_id}.tmp")
+        with open(temporary, "wb") as archive_file:
+            archive_file.write(buffer.getvalue())
+        os.replace(temporary, os.path.join(self.directory, capture_id))
+
+        for expired in self.captureFiles()[self.max_captures:]:
+            os.remove(os.path.join(self.directory, expired))
+
+        self.pruneTraces()
+
+    def captureFiles(self) -> list:
+        """File names of captures in the ring, newest first."""
+
+        if not os.path.isdir(self.directory):
+            return []
+
+        names = [name for name in os.listdir(self.directory) if name.endswith(".zip")]
+        return sorted(names, key = lambda name: os.path.getmtime(os.path.join(self.directory, name)), reverse = True)
+
+    def listCaptures(self) -> list:
+        """Lists captures in the ring.
+
+        Returns:
+            list: Metadata of every capture, newest first.
+        """
+
+        captures = []
+        for name in self.captureFiles():
+            try:
+                with zipfile.ZipFile(os.path.join(self.directory, name)) as archive:
+                    metadata = json.loads(archive.read("metadata.json"))
+            except (OSError, KeyError, ValueError, zipfile.BadZipFile): # deleted or damaged meanwhile
+                continue
+
+            metadata["size_bytes"] = os.path.getsize(os.path.join(self.directory, name))
+            captures.append(metadata)
+
+        return captures
+
+    def path(self, capture_id: str) -> str:
+        """Path of a capture.
+
+        Args:
+            capture_id (str): File name of the capture, as listed.
+
+        Returns:
+            str: Path of the archive, None if no such capture is in the ring.
+        """
+
+        if capture_id not in self.captureFiles():
+            return None
+
+        return os.path.join(self.directory, capture_id)
+
+
+# profiler shared by all requests of the web-app
+analysis_profiler = AnalysisProfiler()
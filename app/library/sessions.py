@@ -0,0 +1,268 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+
+from metrics import stage_seconds
+
+# parameters for server-side sessions
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_PATH = os.getenv("SESSION_PATH", "sessions.sqlite3")
+SESSION_TTL = int(os.getenv("SESSION_TTL", 14 * 24 * 60 * 60))
+
+# expired sessions are purged once every these many saves
+PURGE_INTERVAL = 1000
+
+
+class MemorySessionStore:
+    """Keeps serialized sessions in process memory. Sessions expire after ttl seconds without use."""
+
+    def __init__(self, ttl: int = SESSION_TTL) -> None:
+        """Constructor for the store.
+
+        Args:
+            ttl (int): Seconds after last use at which a session expires.
+        """
+
+        self.ttl = ttl
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.saves = 0
+
+    def load(self, session_id: str) -> str:
+        """Loads a session and extends its expiry.
+
+        Args:
+            session_id (str): Session id from cookie.
+
+        Returns:
+            str: Serialized session, None if it doesn't exist or has expired.
+        """
+
+        with self.lock:
+            entry = self.sessions.get(session_id)
+            if entry is None:
+                return None
+
+            expires_at, data = entry
+            if expires_at < time.time():
+                del self.sessions[session_id]
+                return None
+
+            self.sessions[session_id] = (time.time() + self.ttl, data)
+            return data
+
+    def save(self, session_id: str, data: str) -> None:
+        """Saves a session.
+
+        Args:
+            session_id (str): Session id.
+            data (str): Serialized session.
+        """
+
+        with self.lock:
+            self.sessions[session_id] = (time.time() + self.ttl, data)
+
+            self.saves += 1
+            if self.saves % PURGE_INTERVAL == 0:
+                now = time.time()
+                for expired_id in [key for key, (expires_at, _) in self.sessions.items() if expires_at < now]:
+                    del self.sessions[expired_id]
+
+    def delete(self, session_id: str) -> None:
+        """Deletes a session.
+
+        Args:
+            session_id (str): Session id.
+        """
+
+        with self.lock:
+            self.sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore:
+    """Keeps serialized sessions in an SQLite file so that they survive restarts and are shared by worker processes. Sessions expire after ttl seconds without use."""
+
+    def __init__(self, path: str = SESSION_PATH, ttl: int = SESSION_TTL) -> None:
+        """Constructor for the store.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            ttl (int): Seconds after last use at which a session expires.
+        """
+
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.connection = None
+        self.saves = 0
+
+    def connect(self) -> sqlite3.Connection:
+        """Opens the SQLite database lazily and creates the table if needed.
+
+        Returns:
+            sqlite3 Connection: Connection to the session database.
+        """
+
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, check_same_thread = False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)")
+            self.connection.commit()
+
+        return self.connection
+
+    def load(self, session_id: str) -> str:
+        """Loads a session and extends its expiry.
+
+        Args:
+            session_id (str): Session id from cookie.
+
+        Returns:
+            str: Serialized session, None if it doesn't exist or has expired.
+        """
+
+        with self.lock:
+            connection = self.connect()
+            row = connection.execute("SELECT data FROM sessions WHERE id = ? AND expires_at >= ?", (session_id, time.time())).fetchone()
+            if row is None:
+                return None
+
+            connection.execute("UPDATE sessions SET expires_at = ? WHERE id = ?", (time.time() + self.ttl, session_id))
+            connection.commit()
+            return row[0]
+
+    def save(self, session_id: str, data: str) -> None:
+        """Saves a session.
+
+        Args:
+            session_id (str): Session id.
+            data (str): Serialized session.
+        """
+
+        with self.lock:
+            connection = self.connect()
+            connection.execute("INSERT OR REPLACE INTO sessions (id, data, expires_at) VALUES (?, ?, ?)", (session_id, data, time.time() + self.ttl))
+
+            self.saves += 1
+            if self.saves % PURGE_INTERVAL == 0:
+                connection.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),))
+
+            connection.commit()
+
+    def delete(self, session_id: str) -> None:
+        """Deletes a session.
+
+        Args:
+            session_id (str): Session id.
+        """
+
+        with self.lock:
+            connection = self.connect()
+            connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            connection.commit()
+
+
+def createSessionStore(backend: str = SESSION_BACKEND):
+    """Creates session store for configured backend.
+
+    Args:
+        backend (str): 'memory' or 'sqlite'.
+
+    Raises:
+        ValueError: If backend is not supported.
+
+    Returns:
+        MemorySessionStore | SQLiteSessionStore: Session store.
+    """
+
+    if backend == "memory":
+        return MemorySessionStore()
+
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+
+    raise ValueError(f"Unsupported session backend '{backend}', expected 'memory' or 'sqlite'.")
+
+
+def rotateSession(connection: HTTPConnection) -> None:
+    """Issues a fresh session id for the session when the response is sent, e.g. on login so that an id planted before it (session fixation) never becomes authenticated. Data of the session is kept under the new id.
+
+    Args:
+        connection (HTTPConnection): Request of the session.
+    """
+
+    connection.scope["session_rotate"] = True
+
+
+class ServerSideSessionMiddleware:
+    """ASGI middleware providing request.session from a server-side session store. The cookie only carries an opaque random session id."""
+
+    def __init__(self, app, store, session_cookie: str = "session", max_age: int = SESSION_TTL, same_site: str = "lax", https_only: bool = False) -> None:
+        """Constructor for the middleware.
+
+        Args:
+            app (ASGI app): Wrapped application.
+            store (MemorySessionStore | SQLiteSessionStore): Store holding session data.
+            session_cookie (str): Name of the cookie carrying session id.
+            max_age (int): Max age of the cookie in seconds.
+            same_site (str): SameSite attribute of the cookie.
+            https_only (bool): Sets Secure attribute of the cookie.
+        """
+
+        self.app = app
+        self.store = store
+        self.session_cookie = session_cookie
+        self.max_age = max_age
+        self.security_flags = f"httponly; samesite={same_site}" + ("; secure" if https_only else "")
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        connection = HTTPConnection(scope)
+        session_id = connection.cookies.get(self.session_cookie)
+
+        with stage_seconds.time(stage = "session_load"):
+            data = await run_in_threadpool(self.store.load, session_id) if session_id else None
+            if data is None:
+                session_id = None
+
+            scope["session"] = json.loads(data) if data else {}
+
+        async def send_wrapper(message) -> None:
+            nonlocal session_id
+
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope = message)
+
+                if scope["session"]:
+                    with stage_seconds.time(stage = "session_save"):
+                        new_data = json.dumps(scope["session"])
+
+                        rotate = scope.get("session_rotate", False)
+                        if rotate and session_id is not None:
+                            await run_in_threadpool(self.store.delete, session_id)
+
+                        if session_id is None or rotate:
+                            session_id = secrets.token_urlsafe(32)
+
+                        # session is only written back (and cookie expiry extended) if a view changed it or its id
+                        if new_data != data or rotate:
+                            await run_in_threadpool(self.store.save, session_id, new_data)
+                            headers.append("Set-Cookie", f"{self.session_cookie}={session_id}; path=/; Max-Age={self.max_age}; {self.security_flags}")
+
+                elif session_id is not None:
+                    await run_in_threadpool(self.store.delete, session_id)
+                    headers.append("Set-Cookie", f"{self.session_cookie}=null; path=/; expires=Thu, 01 Jan 1970 00:00:00 GMT; {self.security_flags}")
+
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
\ No newline at end of file
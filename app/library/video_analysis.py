@@ -1,33 +1,208 @@
+import asyncio
+import io
+import os
+
 import pandas as pd
-from wordcloud import WordCloud, STOPWORDS
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from starlette.concurrency import run_in_threadpool
+
+from machine_learning import inference_service, PredictionResult, LABELS
+from machine_learning.prediction_cache import encode_labels, decode_labels
 
-from machine_learning import predict
+from .analysis_state import emptyState
+from .word_cloud import countTerms, mergeTerms, word_cloud_renderer
+from .artifacts import artifact_store
+
+# no. of fetched pages which may wait for classification in streaming mode
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 4))
 
 class VideoAnalysis:
-    """Performs video analysis i.e. comments classification and generating respective plots."""
+    """Performs video analysis i.e. comments classification and generating respective plots. Builds upon the state of previous analysis so that only new comments are classified."""
+    
+    def __init__(self, state: dict = None) -> None:
+        """Constructor for the class. Initializes comment buffers and predictions
+
+        Args:
+            state (dict): Analysis state of previous analysis of the video, None to analyze from scratch.
+        """
+        
+        self.state = state or emptyState()
+        self.predictions = PredictionResult.empty()
+        
+        # comments are accumulated column wise, DataFrame is built only when needed
+        self.comment_ids = []
+        self.comment_texts = []
+        self.published_at = []
+        self._comments_df = None
+        
+        # comments up to this point were analyzed previously, state itself moves forward while merging
+        self.known_published = self.state["newest_published"]
+        self.known_ids = set(self.state["boundary_ids"])
+        
+        # progress counters, read by analysis jobs for status reporting
+        self.pages_fetched = 0
+        self.comments_classified = 0
+        
+    
+    @property
+    def comments_df(self) -> pd.DataFrame:
+        """DataFrame of appended comments, built from the column buffers once per change.
+
+        Returns:
+            pandas DataFrame: DataFrame containing comment id, comment text and published at.
+        """
+        
+        if self._comments_df is None:
+            self._comments_df = pd.DataFrame({
+                "id": pd.Series(self.comment_ids, dtype = object),
+                "comment_text": pd.Series(self.comment_texts, dtype = object),
+                "published_at": pd.Series(self.published_at, dtype = object)
+            })
+        
+        return self._comments_df
+        
+    
+    def countNew(self, comment_dict: dict) -> int:
+        """Counts comments at start of a page which weren't analyzed before.
+
+        Args:
+            comment_dict (dict): Dictionary containing comment id, comment text and published at, ordered newest first.
+
+        Returns:
+            int: No. of new comments, these come before any previously analyzed comment.
+        """
+        
+        # comments are ordered by time, everything from first known comment onwards is analyzed already
+        for i, (comment_id, published_at) in enumerate(zip(comment_dict["id"], comment_dict["published_at"])):
+            if published_at < self.known_published or (published_at == self.known_published and comment_id in self.known_ids):
+                return i
+        
+        return len(comment_dict["id"])
+    
     
-    def __init__(self) -> None:
-        """Constructor for the class. Initializes comments and predictions dataframes"""
+    def newComments(self, comment_dict: dict) -> tuple:
+        """Filters comments received from api call down to the ones which weren't analyzed before.
+
+        Args:
+            comment_dict (dict): Dictionary containing comment id, comment text and published at, ordered newest first.
+
+        Returns:
+            tuple: DataFrame of new comments and bool which is False if previously analyzed comments were reached i.e. no further pages need to be fetched.
+        """
         
-        self.comments_df = pd.DataFrame(columns = ["id", "comment_text"])
-        self.predictions = pd.DataFrame()
+        self.pages_fetched += 1
+        n_new = self.countNew(comment_dict)
+        new_comments = pd.DataFrame({key: values[:n_new] for key, values in comment_dict.items()})
         
+        return new_comments, n_new == len(comment_dict["id"])
+    
     
-    def appendComments(self, comment_dict: dict) -> None:
-        """Appends comments dict received from api call to the comments DataFrame.
+    def appendComments(self, comment_dict: dict) -> bool:
+        """Appends comments dict received from api call to the comment buffers, keeping only comments which weren't analyzed before.
 
         Args:
-            comment_dict (dict): Dictionary containing comment id and comment text.
+            comment_dict (dict): Dictionary containing comment id, comment text and published at, ordered newest first.
+
+        Returns:
+            bool: False if previously analyzed comments were reached i.e. no further pages need to be fetched.
         """
         
-        self.comments_df = pd.concat([self.comments_df, pd.DataFrame(comment_dict)], ignore_index = True)
+        new_comments, more = self.newComments(comment_dict)
+        
+        self.comment_ids.extend(new_comments["id"].tolist())
+        self.comment_texts.extend(new_comments["comment_text"].tolist())
+        self.published_at.extend(new_comments["published_at"].tolist())
+        self._comments_df = None
+        
+        return more
+    
+    
+    async def classifyComments(self) -> None:
+        """Classifies the new comments through the shared inference service and merges them into the analysis state."""
+        
+        if len(self.comment_ids) == 0:
+            return
+        
+        self.predictions = await inference_service.predict(self.comments_df)
+        await run_in_threadpool(self.updateState, self.comments_df, self.predictions)
+        self.comments_classified += len(self.predictions)
+        
     
+    async def analyzeStream(self, comment_itr, queue_size: int = PIPELINE_QUEUE_SIZE) -> None:
+        """Fetches and classifies pages of comments concurrently. While a page is classified the next ones are fetched, up to queue_size pages ahead. Pages are merged into the analysis state and not retained.
+
+        Args:
+            comment_itr (AsyncGenerator): Pages of comments as returned by fetchVideoComments.
+            queue_size (int): Maximum no. of fetched pages waiting for classification.
+
+        Raises:
+            Exceptions raised while fetching comments are re-raised once the pages fetched before have been classified.
+        """
+        
+        queue = asyncio.Queue(maxsize = queue_size)
+        
+        async def fetchPages():
+            try:
+                async for comment_dict in comment_itr:
+                    new_comments, more = self.newComments(comment_dict)
+                    if len(new_comments):
+                        await queue.put(new_comments)
+                    if not more:
+                        break
+            except Exception as error:
+                await queue.put(error)
+            else:
+                await queue.put(None)
+        
+        producer = asyncio.create_task(fetchPages())
+        
+        try:
+            while True:
+                page = await queue.get()
+                if page is None:
+                    break
+                if isinstance(page, Exception):
+                    raise page
+                
+                predictions = await inference_service.predict(page)
+                # merging counts terms of the page, kept off the event loop
+                await run_in_threadpool(self.updateState, page, predictions)
+                self.comments_classified += len(predictions)
+        finally:
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions = True)
+            # no further pages are requested once the known comments are reached or classification stops
+            await comment_itr.aclose()
+        
     
-    def classifyComments(self) -> None:
-        """Classifies the comments for comments DataFrame."""
-         
-        self.predictions = predict(self.comments_df)
+    def updateState(self, comments_df: pd.DataFrame, predictions: PredictionResult) -> None:
+        """Merges new comments and their predictions into the analysis state.
+
+        Args:
+            comments_df (pandas DataFrame): New comments.
+            predictions (PredictionResult): Predictions for the new comments.
+        """
+        
+        state = self.state
+        
+        toxic_mask = predictions.toxicMask()
+        toxic = predictions[toxic_mask]
+        state["toxic"].update(zip(toxic.ids.tolist(), encode_labels(toxic.labels)))
+        
+        # terms of toxic comments are kept apart too, for taking them out of the frequencies if the comment is rejected
+        toxic_terms = state.setdefault("toxic_terms", {})
+        for comment_id, text in zip(toxic.ids.tolist(), comments_df.comment_text.to_numpy()[toxic_mask]):
+            toxic_terms[comment_id] = dict(countTerms([text]))
+        
+        state["comment_count"] += len(comments_df)
+        
+        newest_published = comments_df["published_at"].max()
+        if newest_published > state["newest_published"]:
+            state["boundary_ids"] = []
+            state["newest_published"] = newest_published
+        state["boundary_ids"] += comments_df.loc[comments_df["published_at"] == state["newest_published"], "id"].to_list()
+        
+        state["word_frequencies"] = mergeTerms(state["word_frequencies"], countTerms(comments_df.comment_text.tolist()))
         
     
     def getToxicIds(self) -> list:
@@ -37,42 +212,37 @@ class VideoAnalysis:
             list: Comment Ids of toxic comments.
         """
         
-        toxic_ids = self.predictions[self.predictions.isin([1]).any(axis=1)]["id"].to_list()
+        toxic_ids = list(self.state["toxic"])
         return toxic_ids
     
     
-    def createWordCloud(self, video_id: str) -> None:
-        """Creates word cloud for comments DataFrame.
+    async def createWordCloud(self, video_id: str) -> None:
+        """Creates word cloud from word frequencies of all analyzed comments and stores it as the video's 'word_cloud' artifact. Rendering happens in the shared renderer's process pool and is skipped if frequencies are unchanged.
 
         Args:
-            video_id (str): Video id of a particular yt video for filenaming.
+            video_id (str): Video id of a particular yt video the artifact belongs to.
         """
         
-        text = self.comments_df.comment_text.values
-        
-        comments_cloud = WordCloud(
-                                font_path = 'arial',
-                                stopwords = STOPWORDS,
-                                background_color = 'white',
-                                collocations = False,
-                                width = 2500,
-                                height = 1800).generate(" ".join(text))
-        
-        comments_cloud.to_file(f"static/images/word_cloud_{video_id}.png")
+        image = await word_cloud_renderer.render(self.state["word_frequencies"])
+        await run_in_threadpool(artifact_store.put, video_id, "word_cloud", image, "image/png")
         
 
     def createClassificationGraph(self, video_id: str) -> None:
-        """Creates bar graph for count of each class predicted."
+        """Creates bar graph for count of each class predicted over all analyzed comments and stores it as the video's 'classification_graph' artifact. A figure of its own is used, so graphs may be created concurrently from worker threads.
 
         Args:
-            video_id (str): Video id of a particular yt video for filenaming.
+            video_id (str): Video id of a particular yt video the artifact belongs to.
         """
         
-        columns = self.predictions.columns[1:]
-        class_counts = [self.predictions[self.predictions[column] == 1].shape[0] for column in columns]
+        columns = LABELS
+        class_counts = decode_labels(list(self.state["toxic"].values()), len(LABELS)).sum(axis = 0).tolist()
+        
+        figure = Figure()
+        axes = figure.add_subplot()
+        axes.bar(columns, class_counts, color = "crimson", width = 0.8)
+        axes.set_xlabel("Class")
+        axes.set_ylabel("Comments count")
         
-        plt.bar(columns, class_counts, color = "crimson", width = 0.8)
-        plt.xlabel("Class")
-        plt.ylabel("Comments count")
-        plt.savefig(f"static/images/classification_graph_{video_id}.png", bbox_inches = 'tight', transparent = True)
-        plt.close()
\ No newline at end of file
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format = "svg", bbox_inches = 'tight', transparent = True)
+        artifact_store.put(video_id, "classification_graph", buffer.getvalue(), "image/svg+xml")
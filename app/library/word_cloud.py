@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from wordcloud import WordCloud, STOPWORDS
+
+# no. of most frequent terms kept per video, counters are pruned back to it once they grow past twice this size
+WORD_CLOUD_TERMS = int(os.getenv("WORD_CLOUD_TERMS", 5000))
+
+# size of rendered word cloud in pixels, large enough for the analysis page
+WORD_CLOUD_WIDTH = int(os.getenv("WORD_CLOUD_WIDTH", 1000))
+WORD_CLOUD_HEIGHT = int(os.getenv("WORD_CLOUD_HEIGHT", 720))
+WORD_CLOUD_FONT = os.getenv("WORD_CLOUD_FONT", "arial")
+
+# rendering runs in separate processes, 0 renders in the default thread pool instead
+WORD_CLOUD_PROCESSES = int(os.getenv("WORD_CLOUD_PROCESSES", 2))
+WORD_CLOUD_CACHE_SIZE = int(os.getenv("WORD_CLOUD_CACHE_SIZE", 64))
+
+# same tokens as WordCloud.process_text, lowercased instead of unifying case and plurals
+TERM_PATTERN = re.compile(r"\w[\w']*")
+STOPWORDS_LOWER = {word.lower() for word in STOPWORDS}
+
+
+def countTerms(texts: list) -> Counter:
+    """Counts terms of comments for the word cloud, ignoring stopwords and numbers.
+
+    Args:
+        texts (list): Comment texts.
+
+    Returns:
+        Counter: Term to no. of occurrences.
+    """
+
+    counts = Counter(TERM_PATTERN.findall(" ".join(texts).lower()))
+
+    # filtering distinct terms is much cheaper than filtering every token
+    for term in [term for term in counts if term in STOPWORDS_LOWER or term.isdigit()]:
+        del counts[term]
+
+    for term in [term for term in counts if term.endswith("'s")]:
+        counts[term[:-2]] += counts.pop(term)
+
+    return counts
+
+
+def mergeTerms(frequencies: dict, counts: Counter, max_terms: int = WORD_CLOUD_TERMS) -> dict:
+    """Adds term counts of new comments to the frequencies of a video in place, keeping it bounded.
+
+    Args:
+        frequencies (dict): Term frequencies of previously analyzed comments.
+        counts (Counter): Term counts of new comments.
+        max_terms (int): No. of most frequent terms kept when frequencies are pruned.
+
+    Returns:
+        dict: Merged term frequencies.
+    """
+
+    for term, count in counts.items():
+        frequencies[term] = frequencies.get(term, 0) + count
+
+    # pruning sorts all terms, hence it's done only once they have doubled in number
+    if len(frequencies) > 2 * max_terms:
+        frequencies = dict(Counter(frequencies).most_common(max_terms))
+
+    return frequencies
+
+
+def renderWordCloud(frequencies: dict, width: int, height: int) -> bytes:
+    """Renders word cloud of the most frequent terms. Module-level so that it can run in a worker process.
+
+    Args:
+        frequencies (dict): Term frequencies.
+        width (int): Width of the image in pixels.
+        height (int): Height of the image in pixels.
+
+    Returns:
+        bytes: PNG image.
+    """
+
+    comments_cloud = WordCloud(
+                            font_path = WORD_CLOUD_FONT,
+                            background_color = 'white',
+                            width = width,
+                            height = height).generate_from_frequencies(frequencies)
+
+    buffer = io.BytesIO()
+    comments_cloud.to_image().save(buffer, format = "PNG")
+
+    return buffer.getvalue()
+
+
+class WordCloudRenderer:
+    """Renders word clouds in a process pool and caches the images by a hash of their frequency table, so that videos without new terms skip rendering."""
+
+    def __init__(self, processes: int = WORD_CLOUD_PROCESSES, cache_size: int = WORD_CLOUD_CACHE_SIZE, width: int = WORD_CLOUD_WIDTH, height: int = WORD_CLOUD_HEIGHT) -> None:
+        """Constructor for the renderer.
+
+        Args:
+            processes (int): No. of rendering processes, 0 to render in the default thread pool.
+            cache_size (int): Maximum no. of cached images.
+            width (int): Width of rendered images in pixels.
+            height (int): Height of rendered images in pixels.
+        """
+
+        self.processes = processes
+        self.cache_size = cache_size
+        self.width = width
+        self.height = height
+        self.cache = OrderedDict()
+        self.executor = None
+
+    def cacheKey(self, frequencies: dict) -> str:
+        """Hashes frequency table and image size.
+
+        Args:
+            frequencies (dict): Term frequencies.
+
+        Returns:
+            str: Hex digest identifying the image.
+        """
+
+        table = json.dumps([self.width, self.height, sorted(frequencies.items())], separators = (",", ":"))
+        return hashlib.blake2b(table.encode(), digest_size = 16).hexdigest()
+
+    def getExecutor(self) -> ProcessPoolExecutor:
+        """Creates the process pool lazily. Processes are spawned rather than forked from the process holding the model and its threads."""
+
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.processes, mp_context = multiprocessing.get_context("spawn"))
+
+        return self.executor
+
+    async def render(self, frequencies: dict) -> bytes:
+        """Renders word cloud, or returns cached image for the same frequency table.
+
+        Args:
+            frequencies (dict): Term frequencies.
+
+        Returns:
+            bytes: PNG image.
+        """
+
+        key = self.cacheKey(frequencies)
+
+        image = self.cache.get(key)
+        if image is not None:
+            self.cache.move_to_end(key)
+            return image
+
+        executor = self.getExecutor() if self.processes > 0 else None
+        image = await asyncio.get_running_loop().run_in_executor(executor, renderWordCloud, frequencies, self.width, self.height)
+
+        self.cache[key] = image
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last = False)
+
+        return image
+
+    def close(self) -> None:
+        """Shuts the process pool down."""
+
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures = True)
+            self.executor = None
+
+
+# renderer shared by all requests of the web-app
+word_cloud_renderer = WordCloudRenderer()
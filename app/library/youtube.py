@@ -1,21 +1,34 @@
+import asyncio
 import os
+import random
 
 import httpx
 
+from .api_gateway import gateway, RATE_LIMIT_REASONS
+
 from exceptions import *
+from metrics import stage_seconds
 
 # clint secret key for sending requests to yt api
 KEY = os.getenv("CLIENT_SECRET")
 
+# parameters for bulk moderation
+MODERATION_CHUNK_SIZE = int(os.getenv("MODERATION_CHUNK_SIZE", 50))
+MODERATION_CONCURRENCY = int(os.getenv("MODERATION_CONCURRENCY", 4))
+MODERATION_RETRIES = int(os.getenv("MODERATION_RETRIES", 3))
+MODERATION_BACKOFF = float(os.getenv("MODERATION_BACKOFF", 0.5))
+
 
-async def fetchChannelData(credentials: dict) -> dict:
+async def fetchChannelData(credentials: dict, priority: str = "normal") -> dict:
     """Fetches youtube channel data for authorized google account.
 
     Args:
         credentials (dict): Authorization credentials for accessing channel data.
+        priority (str): Quota priority of the requests, 'high', 'normal' or 'low'.
 
     Raises:
         QuotaExceededError: If request quota is utilized.
+        ForbiddenError: If authorized account isn't permitted to make the request.
         AccessTokenExpiredError: If access token in authorization header has expired.
         EntityNotFoundError: If youtube channel for authorized account doesn't exist.
 
@@ -35,12 +48,11 @@ async def fetchChannelData(credentials: dict) -> dict:
         "part": "snippet,contentDetails,statistics",
         "key": KEY
     }
-    async with httpx.AsyncClient() as client:
-        response = await client.get(request_uri, params = params, headers = headers)
+    response = await gateway.get(request_uri, params = params, headers = headers, priority = priority)
     
-    # fails when quota exceeds or access token expires
+    # fails when permission is denied or access token expires, quota failures are raised by gateway
     if response.status_code == 403:
-        raise QuotaExceededError("Request quota exceeded for the day.")
+        raise ForbiddenError("Authorized account isn't permitted to make this request.")
     
     elif response.status_code == 401:
         raise AccessTokenExpiredError("Current access token expired, get a fresh one.")
@@ -61,14 +73,16 @@ async def fetchChannelData(credentials: dict) -> dict:
     return channel_details
 
 
-async def fetchVideoData(credentials: dict) -> dict:
+async def fetchVideoData(credentials: dict, priority: str = "normal") -> dict:
     """Fetches video data for logged in youtube channel.
 
     Args:
         credentials (dict): Authorization credentials for accessing channel data.
+        priority (str): Quota priority of the requests, 'high', 'normal' or 'low'.
 
     Raises:
         QuotaExceededError: If request quota is utilized.
+        ForbiddenError: If authorized account isn't permitted to make the request.
         AccessTokenExpiredError: If access token in authorization header has expired.
         EntityNotFoundError: If videos for logged in channel doesn't exist.
 
@@ -91,12 +105,11 @@ async def fetchVideoData(credentials: dict) -> dict:
         "type": "video",
         "key": KEY
     }
-    async with httpx.AsyncClient() as client:
-        response = await client.get(request_uri, params = params, headers = headers)
+    response = await gateway.get(request_uri, params = params, headers = headers, priority = priority)
     
-    # fails when quota exceeds or access token expires
+    # fails when permission is denied or access token expires, quota failures are raised by gateway
     if response.status_code == 403:
-        raise QuotaExceededError("Request quota exceeded for the day.")
+        raise ForbiddenError("Authorized account isn't permitted to make this request.")
     
     elif response.status_code == 401:
         raise AccessTokenExpiredError("Current access token expired, get a fresh one.")
@@ -119,12 +132,11 @@ async def fetchVideoData(credentials: dict) -> dict:
         "key": KEY
     }
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(request_uri, params = params, headers = headers)
+    response = await gateway.get(request_uri, params = params, headers = headers, priority = priority)
     
-    # fails when quota exceeds or access token expires
+    # fails when permission is denied or access token expires, quota failures are raised by gateway
     if response.status_code == 403:
-        raise QuotaExceededError("Request quota exceeded for the day.")
+        raise ForbiddenError("Authorized account isn't permitted to make this request.")
     
     elif response.status_code == 401:
         raise AccessTokenExpiredError("Current access token expired, get a fresh one.")
@@ -148,15 +160,18 @@ async def fetchVideoData(credentials: dict) -> dict:
     return video_data
 
 
-async def fetchVideoComments(credentials: dict, video_id: str):
+async def fetchVideoComments(credentials: dict, video_id: str, order: str = "time", priority: str = "normal"):
     """Generator function fetches comments for given youtube video id.
 
     Args:
         credentials (dict): Authorization credentials for accessing channel data.
         video_id (str): Video id corresponding to which fetch comments.
+        order (str): Order of comment threads, "time" (newest first) or "relevance".
+        priority (str): Quota priority of the requests, 'high', 'normal' or 'low'.
 
     Raises:
         QuotaExceededError: If request quota is utilized.
+        ForbiddenError: If authorized account isn't permitted to make the request.
         AccessTokenExpiredError: If access token in authorization header has expired.
         EntityNotFoundError: If comments for given video id doesn't exist.
 
@@ -179,16 +194,17 @@ async def fetchVideoComments(credentials: dict, video_id: str):
             "part": "snippet",
             "maxResults": 100,
             "pageToken": pageToken,
-            "video_id": video_id,
+            "order": order,
+            "videoId": video_id,
             "key": KEY
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(request_uri, params = params, headers = headers)
+        with stage_seconds.time(stage = "youtube_page"):
+            response = await gateway.get(request_uri, params = params, headers = headers, priority = priority)
         
-        # fails when quota exceeds or access token expires
+        # fails when permission is denied or access token expires, quota failures are raised by gateway
         if response.status_code == 403:
-            raise QuotaExceededError("Request quota exceeded for the day.")
+            raise ForbiddenError("Authorized account isn't permitted to make this request.")
         
         elif response.status_code == 401:
             raise AccessTokenExpiredError("Current access token expired, get a fresh one.")
@@ -199,10 +215,11 @@ async def fetchVideoComments(credentials: dict, video_id: str):
         if "items" not in comment_threads or len(comment_threads["items"]) == 0:
             raise EntityNotFoundError("comment_thread", "Selected video doesn't have any comments")
         
-        comment_dict = {"id": [], "comment_text": []}
+        comment_dict = {"id": [], "comment_text": [], "published_at": []}
         for comment in comment_threads["items"]:
             comment_dict["id"].append(comment['snippet']['topLevelComment']['id'])
             comment_dict["comment_text"].append(comment['snippet']['topLevelComment']['snippet']['textDisplay'])
+            comment_dict["published_at"].append(comment['snippet']['topLevelComment']['snippet']['publishedAt'])
         
         # send data to analysis view and go to next iteration if possible
         yield comment_dict
@@ -213,16 +230,21 @@ async def fetchVideoComments(credentials: dict, video_id: str):
             break
         
         
-async def rejectComments(credentials: dict, toxic_ids: list) -> None:
-    """Set moderation status of toxic comment ids provided as 'rejected'.
+async def rejectComments(credentials: dict, toxic_ids: list, outcomes: dict = None) -> dict:
+    """Set moderation status of toxic comment ids provided as 'rejected'. Ids are sent in chunks, several chunks at a time, retrying transient failures with exponential backoff.
 
     Args:
         credentials (dict): Authorization credentials for accessing channel data.
         toxic_ids (list): List of ids of comments which are identified as toxic.
+        outcomes (dict): Optional dict filled in place with outcome per id, so that it is available even if an exception is raised.
 
     Raises:
-        QuotaExceededError: If request quota is utilized.
-        AccessTokenExpiredError: If access token in authorization header has expired.
+        QuotaExceededError: If request quota is utilized. Chunks not sent yet are left 'pending'.
+        ForbiddenError: If authorized account isn't permitted to moderate the comments. Chunks not sent yet are left 'pending'.
+        AccessTokenExpiredError: If access token in authorization header has expired. Chunks not sent yet are left 'pending'.
+
+    Returns:
+        dict: Outcome per comment id, 'rejected', 'failed' (non transient error or retries exhausted) or 'pending' (not sent).
     """
     
     request_uri = "https://www.googleapis.com/youtube/v3/comments/setModerationStatus"
@@ -232,18 +254,69 @@ async def rejectComments(credentials: dict, toxic_ids: list) -> None:
         "Accept": "application/json"
     }
     
-    params = {
-        "id": ",".join(id for id in toxic_ids),
-        "moderationStatus": "rejected",
-        "key": KEY
-    }
+    outcomes = {} if outcomes is None else outcomes
+    outcomes.update((id, "pending") for id in toxic_ids)
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(request_uri, params = params, headers = headers)
+    chunks = [toxic_ids[i:i + MODERATION_CHUNK_SIZE] for i in range(0, len(toxic_ids), MODERATION_CHUNK_SIZE)]
+    semaphore = asyncio.Semaphore(MODERATION_CONCURRENCY)
     
-    # fails when quota exceeds or access token expires
-    if response.status_code == 403:
-        raise QuotaExceededError("Request quota exceeded for the day.")
+    # set by the first quota or authorization error, chunks waiting for the semaphore aren't sent afterwards
+    stopped = asyncio.Event()
     
-    elif response.status_code == 401:
-        raise AccessTokenExpiredError("Current access token expired, get a fresh one.")
\ No newline at end of file
+    async def rejectChunk(chunk: list) -> None:
+        params = {
+            "id": ",".join(id for id in chunk),
+            "moderationStatus": "rejected",
+            "key": KEY
+        }
+        
+        async with semaphore:
+            for attempt in range(MODERATION_RETRIES + 1):
+                if stopped.is_set():
+                    return
+                
+                try:
+                    response = await gateway.post(request_uri, params = params, headers = headers, priority = "high")
+                except httpx.TransportError: # network failure, try again
+                    status_code = None
+                except QuotaExceededError as error: # per second rate limits pass, daily quota doesn't
+                    if error.reason not in RATE_LIMIT_REASONS:
+                        stopped.set()
+                        raise
+                    status_code = 429
+                else:
+                    status_code = response.status_code
+                
+                # fails when permission is denied or access token expires, quota failures are raised by gateway
+                if status_code == 403:
+                    stopped.set()
+                    raise ForbiddenError("Authorized account isn't permitted to moderate these comments.")
+                
+                elif status_code == 401:
+                    stopped.set()
+                    raise AccessTokenExpiredError("Current access token expired, get a fresh one.")
+                
+                elif status_code is not None and status_code < 400:
+                    outcomes.update((id, "rejected") for id in chunk)
+                    return
+                
+                elif status_code is not None and status_code != 429 and status_code < 500:
+                    break
+                
+                if attempt < MODERATION_RETRIES:
+                    await asyncio.sleep(MODERATION_BACKOFF * 2 ** attempt * (1 + random.random()))
+            
+            outcomes.update((id, "failed") for id in chunk)
+    
+    tasks = [asyncio.ensure_future(rejectChunk(chunk)) for chunk in chunks]
+    
+    try:
+        # first quota or authorization error stops chunks which haven't been sent yet
+        for task in asyncio.as_completed(tasks):
+            await task
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions = True)
+    
+    return outcomes
\ No newline at end of file
@@ -1,9 +1,22 @@
 """Machine learning modules helping to predict classes."""
 
+import os
+
 # paths
 pretrained_path = "machine_learning/model_hub/pretrained/bert-base-uncased"
 fine_tuned_path = "machine_learning/model_hub/fine_tuned/toxic_model.pth"
+consolidated_path = "machine_learning/model_hub/fine_tuned/toxic_model.safetensors"
+cascade_path = "machine_learning/model_hub/fine_tuned/cascade_scorer.npz"
+
+# inference mode: "fp32" runs the full precision model, "int8" dynamically quantizes the linear layers (CPU only)
+inference_mode = os.getenv("INFERENCE_MODE", "fp32")
+
+# cascade: comments whose every class probability by the distilled first stage is below this threshold skip BERT, 0 classifies every comment with BERT
+cascade_threshold = float(os.getenv("CASCADE_THRESHOLD", 0))
 
 # useful functions for easy access
 from .data_loader import load_tokeninzer
-from .make_predictions import predict, load_model
\ No newline at end of file
+from .make_predictions import predict, load_model
+from .prediction_result import PredictionResult, LABELS
+from .agreement import label_agreement
+from .inference_service import inference_service
\ No newline at end of file
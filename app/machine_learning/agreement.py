@@ -0,0 +1,30 @@
+from .prediction_result import PredictionResult, LABELS
+
+
+def label_agreement(reference: PredictionResult, candidate: PredictionResult) -> dict:
+    """Compares predictions of a candidate model (e.g. quantized) against a reference model on the same comments.
+
+    Args:
+        reference (PredictionResult): Predictions of the reference model as returned by predict.
+        candidate (PredictionResult): Predictions of the candidate model for the same comments, in the same order.
+
+    Raises:
+        ValueError: If both predictions aren't made for the same comments.
+
+    Returns:
+        dict: Dictionary containing no. of comments, per label disagreement rate, rate of comments with any label differing and rate of comments whose toxic / clean verdict differs.
+    """
+
+    if reference.ids.tolist() != candidate.ids.tolist():
+        raise ValueError("Predictions to compare must be made for the same comments in the same order.")
+
+    differs = reference.labels != candidate.labels
+
+    n_comments = len(reference)
+
+    return {
+        "comments": n_comments,
+        "label_disagreement": {label: float(differs[:, i].mean()) if n_comments else 0.0 for i, label in enumerate(LABELS)},
+        "any_label_disagreement": float(differs.any(axis = 1).mean()) if n_comments else 0.0,
+        "verdict_disagreement": float((reference.toxicMask() != candidate.toxicMask()).mean()) if n_comments else 0.0
+    }
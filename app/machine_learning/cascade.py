@@ -0,0 +1,302 @@
+"""First stage of the cascade classifier: a hashed n-gram linear model distilled from DetoxClass, which clears comments it is confident are clean so that only the rest are classified by BERT.
+
+Distill it from the fine-tuned model on a csv of comments (comment_text column), from the app directory:
+
+    python -m machine_learning.cascade --csv comments.csv
+    CASCADE_THRESHOLD=0.02 uvicorn main:app
+"""
+
+import argparse
+import hashlib
+import re
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn.functional as F
+
+from .prediction_result import PredictionResult, LABELS, THRESHOLD
+from . import cascade_path
+
+from metrics import stage_seconds, cascade_comments
+
+# size of the hashed feature space
+N_FEATURES = 2 ** 18
+
+# words, as lowercase runs of letters, digits and apostrophes
+TOKEN = re.compile(r"[a-z0-9']+")
+
+# parameters for distillation
+EPOCHS = 10
+LEARNING_RATE = 0.05
+TRAIN_BATCH_SIZE = 256
+TOXIC_WEIGHT = 1.0
+
+
+def comment_features(text: str, n_features: int = N_FEATURES) -> list:
+    """Hashes word unigrams, word bigrams and character trigrams of words (catching misspelt and obfuscated words) of a comment into feature indices. crc32 keeps indices stable across processes.
+
+    Args:
+        text (str): Comment text.
+        n_features (int): Size of the feature space.
+
+    Returns:
+        list: Feature indices, a single 'empty' feature for comments without words (e.g. only emoji).
+    """
+
+    words = TOKEN.findall(text.lower())
+
+    grams = [f"w:{word}" for word in words]
+    grams += [f"b:{first} {second}" for first, second in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+
+    return [zlib.crc32(gram.encode()) % n_features for gram in grams or ["empty"]]
+
+
+def pack_features(features: list) -> tuple:
+    """Packs feature indices of comments into the flat indices and offsets taken by EmbeddingBag."""
+
+    offsets = np.cumsum([0] + [len(indices) for indices in features[:-1]])
+    indices = np.fromiter((index for comment in features for index in comment), dtype = np.int64)
+
+    return torch.from_numpy(indices), torch.from_numpy(offsets.astype(np.int64))
+
+
+class CascadeScorer(torch.nn.Module):
+    """Linear model over hashed n-gram features predicting the probability of every class, i.e. a logistic regression per class sharing the feature hashing."""
+
+    def __init__(self, n_features: int = N_FEATURES) -> None:
+        """Constructor for the scorer.
+
+        Args:
+            n_features (int): Size of the hashed feature space.
+        """
+
+        super().__init__()
+        self.n_features = n_features
+        self.weights = torch.nn.EmbeddingBag(n_features, len(LABELS), mode = "sum")
+        self.bias = torch.nn.Parameter(torch.zeros(len(LABELS)))
+        self.version = None
+        self.threshold = None
+
+        torch.nn.init.zeros_(self.weights.weight)
+
+    def forward(self, indices: torch.Tensor, offsets: torch.Tensor) -> torch.Tensor:
+        """Defines forward pass of the scorer.
+
+        Args:
+            indices (torch Tensor): Feature indices of all comments, one after another.
+            offsets (torch Tensor): Position of the first feature of every comment in indices.
+
+        Returns:
+            torch Tensor: Logits of shape (comments, classes).
+        """
+
+        return self.weights(indices, offsets) + self.bias
+
+    def predict_proba(self, texts: list) -> np.ndarray:
+        """Probabilities of every class for comments.
+
+        Args:
+            texts (list): Comment texts.
+
+        Returns:
+            numpy ndarray: Probability matrix of shape (comments, classes).
+        """
+
+        if not len(texts):
+            return np.zeros((0, len(LABELS)), dtype = np.float32)
+
+        with torch.inference_mode():
+            logits = self(*pack_features([comment_features(text, self.n_features) for text in texts]))
+
+        return torch.sigmoid(logits).numpy()
+
+
+def distill(texts: list, teacher_probabilities: np.ndarray, n_features: int = N_FEATURES, epochs: int = EPOCHS, learning_rate: float = LEARNING_RATE, batch_size: int = TRAIN_BATCH_SIZE, toxic_weight: float = TOXIC_WEIGHT, seed: int = 0) -> CascadeScorer:
+    """Trains a scorer to reproduce probabilities of the fine-tuned model.
+
+    Args:
+        texts (list): Comment texts.
+        teacher_probabilities (numpy ndarray): Probabilities predicted by DetoxClass for the comments, soft targets of the scorer.
+        n_features (int): Size of the hashed feature space.
+        epochs (int): Passes over the comments.
+        learning_rate (float): Learning rate of Adam.
+        batch_size (int): No. of comments per step.
+        toxic_weight (float): Extra loss weight of comments the teacher finds toxic, clearing them is the costly mistake.
+        seed (int): Seed for shuffling.
+
+    Returns:
+        CascadeScorer: Trained scorer in evaluation mode.
+    """
+
+    torch.manual_seed(seed)
+    scorer = CascadeScorer(n_features)
+    optimizer = torch.optim.Adam(scorer.parameters(), lr = learning_rate)
+
+    features = [comment_features(text, n_features) for text in texts]
+    targets = torch.tensor(np.asarray(teacher_probabilities, dtype = np.float32))
+    weights = 1 + toxic_weight * (targets.max(dim = 1).values >= THRESHOLD).float()
+
+    # start from the base rate of every class, weights only have to learn what sets a comment apart from it
+    with torch.no_grad():
+        scorer.bias.copy_(torch.logit(targets.mean(dim = 0).clamp(1e-4, 1 - 1e-4)))
+
+    scorer.train()
+    for _ in range(epochs):
+        for batch in torch.randperm(len(features)).split(batch_size):
+            logits = scorer(*pack_features([features[i] for i in batch]))
+            loss = (F.binary_cross_entropy_with_logits(logits, targets[batch], reduction = "none").mean(dim = 1) * weights[batch]).mean()
+
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+
+    return scorer.eval()
+
+
+def save_scorer(scorer: CascadeScorer, path: str, teacher_version: str) -> str:
+    """Saves a scorer as a numpy archive. Its version combines version of the teacher model and a hash of the weights.
+
+    Args:
+        scorer (CascadeScorer): Trained scorer.
+        path (str): Path of the .npz file.
+        teacher_version (str): Version of the model the scorer was distilled from.
+
+    Returns:
+        str: Version of the scorer.
+    """
+
+    weights = scorer.weights.weight.detach().numpy()
+    bias = scorer.bias.detach().numpy()
+
+    scorer.version = f"{teacher_version}-{hashlib.blake2b(weights.tobytes() + bias.tobytes(), digest_size = 4).hexdigest()}"
+
+    with open(path, "wb") as scorer_file:
+        np.savez(scorer_file, weights = weights, bias = bias, version = np.array(scorer.version))
+
+    return scorer.version
+
+
+def load_scorer(path: str) -> CascadeScorer:
+    """Loads a scorer saved by save_scorer.
+
+    Args:
+        path (str): Path of the .npz file.
+
+    Returns:
+        CascadeScorer: Scorer in evaluation mode.
+    """
+
+    with np.load(path, allow_pickle = False) as archive:
+        scorer = CascadeScorer(archive["weights"].shape[0])
+        scorer.weights.weight.data = torch.from_numpy(archive["weights"])
+        scorer.bias.data = torch.from_numpy(archive["bias"])
+        scorer.version = str(archive["version"])
+
+    return scorer.eval()
+
+
+def cascade_predict(data: pd.DataFrame, scorer: CascadeScorer, threshold: float, second_stage) -> PredictionResult:
+    """Predicts classes of the comments with the cascade: comments whose first stage probability of every class is below threshold are cleared, the rest are classified by second_stage.
+
+    Args:
+        data (pandas DataFrame): DataFrame containing comment id and comment text.
+        scorer (CascadeScorer): First stage.
+        threshold (float): Probability below which the first stage clears a comment, at most THRESHOLD.
+        second_stage (callable): Predicts classes of a DataFrame of comments, e.g. BERT predict.
+
+    Returns:
+        PredictionResult: Predicted classes and probabilities for comments, in the same order as data. Cleared comments have no class and the first stage probabilities.
+    """
+
+    with stage_seconds.time(stage = "cascade_first_stage"):
+        probabilities = scorer.predict_proba(data.comment_text.tolist())
+
+    cleared = probabilities.max(axis = 1, initial = 0) < min(threshold, THRESHOLD)
+    rest = np.flatnonzero(~cleared)
+
+    cascade_comments.inc(int(cleared.sum()), stage = "first")
+    cascade_comments.inc(len(rest), stage = "bert")
+
+    labels = np.zeros((len(data), len(LABELS)), dtype = np.uint8)
+    if len(rest):
+        predictions = second_stage(data.iloc[rest])
+        labels[rest] = predictions.labels
+        probabilities[rest] = predictions.probabilities
+
+    return PredictionResult(data.id.values, labels, probabilities)
+
+
+def threshold_report(first_stage: np.ndarray, reference: PredictionResult, thresholds: list) -> list:
+    """Skip rate and agreement with BERT alone at every threshold. BERT classifies a comment the same way whether or not others are cleared, so its predictions for all comments give cascade predictions at any threshold without running it again.
+
+    Args:
+        first_stage (numpy ndarray): First stage probabilities of the comments.
+        reference (PredictionResult): BERT predictions of the same comments.
+        thresholds (list): Thresholds to report.
+
+    Returns:
+        list: Per threshold, the rate of comments cleared, rate of comments BERT finds toxic which are cleared and label agreement.
+    """
+
+    from .agreement import label_agreement
+
+    report = []
+    for threshold in thresholds:
+        cleared = first_stage.max(axis = 1, initial = 0) < min(threshold, THRESHOLD)
+
+        labels = np.where(cleared[:, None], 0, reference.labels)
+        probabilities = np.where(cleared[:, None], first_stage, reference.probabilities)
+        candidate = PredictionResult(reference.ids, labels, probabilities)
+
+        toxic = reference.toxicMask()
+        report.append({
+            "threshold": threshold,
+            "skip_rate": float(cleared.mean()) if len(cleared) else 0.0,
+            "missed_toxic_rate": float(cleared[toxic].mean()) if toxic.any() else 0.0,
+            **label_agreement(reference, candidate)
+        })
+
+    return report
+
+
+def main() -> None:
+    from . import load_tokeninzer, load_model, make_predictions
+
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", required = True, help = "Csv file with a comment_text column, e.g. comments of your channels.")
+    parser.add_argument("--output", default = cascade_path, help = "Path of the scorer.")
+    parser.add_argument("--holdout", type = float, default = 0.1, help = "Fraction of comments held out for the threshold report.")
+    parser.add_argument("--epochs", type = int, default = EPOCHS, help = "Passes over the comments.")
+    parser.add_argument("--thresholds", type = float, nargs = "+", default = [0.005, 0.01, 0.02, 0.05, 0.1], help = "Thresholds to report.")
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.csv, usecols = ["comment_text"]).dropna().reset_index(drop = True)
+    data.insert(0, "id", data.index)
+
+    load_tokeninzer()
+    load_model(cascade_threshold = 0)
+
+    start = time.perf_counter()
+    teacher = make_predictions.predict(data, cascade = False)
+    print(f"Classified {len(data)} comments with the fine-tuned model in {time.perf_counter() - start:.1f}s")
+
+    holdout = np.random.default_rng(0).random(len(data)) < args.holdout
+
+    scorer = distill(data.comment_text[~holdout].tolist(), teacher.probabilities[~holdout].astype(np.float32), epochs = args.epochs)
+    version = save_scorer(scorer, args.output, make_predictions.model_version)
+    print(f"Saved scorer {version} to {args.output}")
+
+    if holdout.any():
+        first_stage = scorer.predict_proba(data.comment_text[holdout].tolist())
+        for row in threshold_report(first_stage, teacher[holdout], args.thresholds):
+            print(f"threshold {row['threshold']}: skip rate {row['skip_rate']:.3f}, missed toxic {row['missed_toxic_rate']:.3f}, any label disagreement {row['any_label_disagreement']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
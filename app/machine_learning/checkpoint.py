@@ -0,0 +1,172 @@
+"""Consolidated model checkpoint: the fine-tuned weights and the BERT config in one memory-mappable file, laid out like a safetensors file (8 byte header length, json header, raw tensor data).
+
+Build it once after fine-tuning, from the app directory:
+
+    python -m machine_learning.checkpoint
+"""
+
+import json
+import os
+import struct
+import time
+import warnings
+
+import numpy as np
+import torch
+from torch.nn import Parameter
+from torch.overrides import TorchFunctionMode
+from transformers import BertConfig
+
+from . import pretrained_path, fine_tuned_path, consolidated_path
+
+# safetensors dtype names
+DTYPES = {
+    "F64": np.float64,
+    "F32": np.float32,
+    "F16": np.float16,
+    "I64": np.int64,
+    "I32": np.int32,
+    "I16": np.int16,
+    "I8": np.int8,
+    "U8": np.uint8,
+    "BOOL": np.bool_
+}
+DTYPE_NAMES = {np.dtype(dtype): name for name, dtype in DTYPES.items()}
+
+# random weight initializers (torch.nn.init functions and tensor methods) skipped while building a model whose weights are about to be replaced
+INITIALIZERS = {"uniform_", "normal_", "trunc_normal_", "kaiming_uniform_", "kaiming_normal_", "xavier_uniform_", "xavier_normal_", "orthogonal_"}
+
+
+def save_checkpoint(state_dict: dict, path: str, metadata: dict = None) -> None:
+    """Writes tensors to a single consolidated checkpoint file.
+
+    Args:
+        state_dict (dict): Tensor name to tensor.
+        path (str): Path of the checkpoint file.
+        metadata (dict): String keys and values stored in the header, e.g. the model config.
+    """
+
+    # wider dtypes first so that every tensor stays aligned to its item size
+    tensors = sorted(((name, tensor.detach().cpu().contiguous().numpy()) for name, tensor in state_dict.items()), key = lambda item: -item[1].itemsize)
+
+    header = {"__metadata__": metadata or {}}
+    offset = 0
+    for name, array in tensors:
+        header[name] = {"dtype": DTYPE_NAMES[array.dtype], "shape": list(array.shape), "data_offsets": [offset, offset + array.nbytes]}
+        offset += array.nbytes
+
+    # header is padded to 8 bytes so that data starts aligned
+    header_bytes = json.dumps(header, separators = (",", ":")).encode()
+    header_bytes += b" " * (-len(header_bytes) % 8)
+
+    with open(path + ".tmp", "wb") as checkpoint_file:
+        checkpoint_file.write(struct.pack("<Q", len(header_bytes)))
+        checkpoint_file.write(header_bytes)
+        for _, array in tensors:
+            checkpoint_file.write(array.tobytes())
+
+    os.replace(path + ".tmp", path)
+
+
+def load_checkpoint(path: str) -> tuple:
+    """Maps tensors of a consolidated checkpoint file into memory without reading them. Tensors are read-only views of the file, pages are loaded on first use and shared through the page cache by every process mapping the file.
+
+    Args:
+        path (str): Path of the checkpoint file.
+
+    Returns:
+        tuple: Tensor name to tensor dict and metadata dict.
+    """
+
+    with open(path, "rb") as checkpoint_file:
+        header_size = struct.unpack("<Q", checkpoint_file.read(8))[0]
+        header = json.loads(checkpoint_file.read(header_size))
+
+    metadata = header.pop("__metadata__", {})
+    data = np.memmap(path, dtype = np.uint8, mode = "r", offset = 8 + header_size)
+
+    state_dict = {}
+    with warnings.catch_warnings():
+        # tensors are never written to, read-only memory is fine
+        warnings.simplefilter("ignore", UserWarning)
+
+        for name, info in header.items():
+            begin, end = info["data_offsets"]
+            array = data[begin:end].view(DTYPES[info["dtype"]]).reshape(info["shape"])
+            state_dict[name] = torch.from_numpy(array)
+
+    return state_dict, metadata
+
+
+class SkipInit(TorchFunctionMode):
+    """Skips random initialization of weights while building a model, its weights are replaced by checkpoint tensors afterwards. Torch function modes only apply to the thread entering them, so modules built by other threads meanwhile are initialized as usual. Buffers (e.g. position ids) are built as usual too, including non-persistent ones which aren't part of the checkpoint."""
+
+    def __torch_function__(self, func, types, args = (), kwargs = None):
+        kwargs = kwargs or {}
+
+        if getattr(func, "__name__", None) in INITIALIZERS:
+            return args[0] if args else kwargs["tensor"]
+
+        return func(*args, **kwargs)
+
+
+def assign_state_dict(model: torch.nn.Module, state_dict: dict) -> None:
+    """Makes checkpoint tensors the parameters and buffers of a model, without copying them.
+
+    Args:
+        model (torch Module): Model built with the architecture of the checkpoint.
+        state_dict (dict): Tensor name to tensor.
+
+    Raises:
+        KeyError: If model and checkpoint don't have the same tensors.
+    """
+
+    expected = set(model.state_dict())
+    if expected != set(state_dict):
+        raise KeyError(f"Checkpoint doesn't match model, missing {sorted(expected - set(state_dict))}, unexpected {sorted(set(state_dict) - expected)}.")
+
+    for name, tensor in state_dict.items():
+        module_name, _, tensor_name = name.rpartition(".")
+        module = model.get_submodule(module_name)
+
+        if tensor_name in module._parameters:
+            module._parameters[tensor_name] = Parameter(tensor, requires_grad = False)
+        else:
+            module._buffers[tensor_name] = tensor
+
+
+def source_version(source_path: str) -> str:
+    """Version of a fine-tuned state dict file, its size and modification time. Stored as version of the checkpoint exported from it, so that a checkpoint older than a replaced state dict is detected.
+
+    Args:
+        source_path (str): Path of the fine-tuned state dict.
+
+    Returns:
+        str: 'size-mtime' of the file.
+    """
+
+    source = os.stat(source_path)
+    return f"{source.st_size}-{int(source.st_mtime)}"
+
+
+def export_checkpoint(source_path: str = fine_tuned_path, config_path: str = pretrained_path, path: str = consolidated_path) -> None:
+    """Exports fine-tuned weights together with the BERT config as a consolidated checkpoint.
+
+    Args:
+        source_path (str): Path of the fine-tuned state dict saved by torch.save.
+        config_path (str): Directory of the pretrained model holding config.json.
+        path (str): Path of the consolidated checkpoint.
+    """
+
+    state_dict = torch.load(source_path, map_location = "cpu")
+    config = BertConfig.from_pretrained(config_path)
+
+    metadata = {"config": config.to_json_string(), "version": source_version(source_path)}
+
+    save_checkpoint(state_dict, path, metadata)
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    export_checkpoint()
+    print(f"Exported {fine_tuned_path} to {consolidated_path} in {time.perf_counter() - start:.2f}s")
@@ -1,61 +1,93 @@
+import numpy as np
+import pandas as pd
 import torch
 from torch.utils.data import Dataset
 
+
+def tokenize_comments(comment_text, tokenizer, max_len) -> dict:
+    """Tokenizes a whole page or batch of comments in a single call of the fast (rust) tokenizer.
+
+    Args:
+        comment_text (array-like): Comments to be tokenized.
+        tokenizer : BERT fast tokenizer object.
+        max_len (int): Maximum length for sentences.
+
+    Returns:
+        dict: Dictionary containing input_ids (every comment's token ids concatenated in one tensor), offsets (start of each comment in input_ids) and lengths (no. of tokens of each comment).
+    """
+
+    # collapse runs of whitespace for all comments at once
+    comment_text = pd.Series(comment_text, dtype = object).astype(str)
+    comment_text = comment_text.str.replace(r"\s+", " ", regex = True).str.strip().tolist()
+
+    encodings = tokenizer(
+        comment_text,
+        add_special_tokens=True,
+        max_length=max_len,
+        padding=False,
+        truncation=True,
+        return_attention_mask=False,
+        return_token_type_ids=False
+    )["input_ids"]
+
+    # one flat buffer of every comment's ids, no per comment tensors
+    arrays = [np.asarray(ids, dtype = np.int64) for ids in encodings]
+    input_ids = np.concatenate(arrays) if arrays else np.zeros(0, dtype = np.int64)
+
+    lengths = np.array([len(ids) for ids in arrays], dtype = np.int64)
+    offsets = np.zeros(len(arrays), dtype = np.int64)
+    np.cumsum(lengths[:-1], out = offsets[1:])
+
+    return {
+        'input_ids': torch.from_numpy(input_ids),
+        'offsets': torch.from_numpy(offsets),
+        'lengths': torch.from_numpy(lengths)
+    }
+
+
 class DetoxDataset(Dataset):
     """PyTorch dataset class."""
 
     def __init__(self, dataframe, tokenizer, max_len) -> None:
-        """Constructor for class.
+        """Constructor for class. Tokenizes all comments up front so that token lengths are known before batching.
 
         Args:
             dataframe (pandas DataFrame): DataFrame under consideration for prediction.
-            tokenizer : BERT tokenizer object.
+            tokenizer : BERT fast tokenizer object.
             max_len (int): Maximum length for sentences.
         """
         self.tokenizer = tokenizer
         self.data = dataframe
-        self.comment_id = dataframe.id
-        self.comment_text = self.data.comment_text
+        self.comment_id = dataframe.id.values
+        self.comment_text = self.data.comment_text.values
         self.max_len = max_len
 
+        encodings = tokenize_comments(self.comment_text, tokenizer, max_len)
+        self.input_ids = encodings['input_ids']
+        self.offsets = encodings['offsets'].tolist()
+        self.lengths = encodings['lengths'].tolist()
+
     def __len__(self) -> int:
         """Identifies no. of instances (rows) in dataset
         Returns:
             int: Length (instances) of current dataset.
         """
-        
+
         return len(self.comment_text)
 
     def __getitem__(self, index) -> dict:
-        """Returns instance from dataset that is ready to be passed to ml model.
+        """Returns instance from dataset that is ready to be collated into a batch.
         Args:
             index (int): Index of instance to be returned.
 
         Returns:
-            dict: Dictionary containing comment_id, ids(mappings between tokens and their respective IDs), mask(prevent the model from looking at padding tokens) and token type ids(represents sentence id).
+            dict: Dictionary containing comment_id, index (position in dataset) and ids (view of the token ids i.e. mappings between tokens and their respective IDs, unpadded).
         """
-        
-        comment_text = str(self.comment_text[index])
-        comment_text = " ".join(comment_text.split())
-
-        inputs = self.tokenizer.encode_plus(
-            comment_text,
-            None,
-            add_special_tokens=True,
-            max_length=self.max_len,
-            padding='max_length',
-            return_token_type_ids=True,
-            truncation=True
-        )
-        
-        ids = inputs['input_ids']
-        mask = inputs['attention_mask']
-        token_type_ids = inputs["token_type_ids"]
 
+        offset = self.offsets[index]
 
         return {
             'comment_id': self.comment_id[index],
-            'ids': torch.tensor(ids, dtype=torch.long),
-            'mask': torch.tensor(mask, dtype=torch.long),
-            'token_type_ids': torch.tensor(token_type_ids, dtype=torch.long)
+            'index': index,
+            'ids': self.input_ids[offset:offset + self.lengths[index]]
         }
\ No newline at end of file
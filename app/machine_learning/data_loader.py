@@ -1,5 +1,8 @@
-from transformers import BertTokenizer
-from torch.utils.data import DataLoader
+from functools import partial
+
+import torch
+from transformers import BertTokenizerFast
+from torch.utils.data import DataLoader, Sampler
 from .data_class import DetoxDataset
 from . import pretrained_path
 
@@ -9,27 +12,91 @@ BATCH_SIZE = 8
 
 
 def load_tokeninzer() -> None:
-    """Loads BERT Tokenizer."""
-    
+    """Loads BERT Tokenizer (rust backed fast tokenizer)."""
+
     global tokenizer
-    tokenizer = BertTokenizer.from_pretrained(pretrained_path)
+    tokenizer = BertTokenizerFast.from_pretrained(pretrained_path)
+
+
+class LengthBucketSampler(Sampler):
+    """Batch sampler which groups comments of similar token length together so that each batch needs minimal padding."""
+
+    def __init__(self, lengths: list, batch_size: int) -> None:
+        """Constructor for the sampler.
+
+        Args:
+            lengths (list): Token length of every comment in the dataset.
+            batch_size (int): No. of comments per batch.
+        """
+
+        self.batch_size = batch_size
+
+        # sort indices by token length, ties keep their original order
+        order = sorted(range(len(lengths)), key = lambda index: lengths[index])
+        self.batches = [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+    def __iter__(self):
+        return iter(self.batches)
+
+    def __len__(self) -> int:
+        return len(self.batches)
+
+
+def pad_collate(batch: list, pad_to: int = None) -> dict:
+    """Collates dataset instances into a batch padded only up to its longest comment.
 
+    Args:
+        batch (list): Instances returned by DetoxDataset.
+        pad_to (int): If given, pad every comment to this length instead of the longest one in batch.
+
+    Returns:
+        dict: Batch containing comment_id, index (original position of every comment, used to restore the input order), ids, mask and token_type_ids.
+    """
+
+    lengths = torch.tensor([len(item['ids']) for item in batch], dtype=torch.long)
+    max_len = pad_to or int(lengths.max())
+
+    # positions before the end of every comment, filled row by row from the concatenated ids
+    mask = (torch.arange(max_len) < lengths[:, None]).long()
+    ids = torch.zeros((len(batch), max_len), dtype=torch.long)
+    ids[mask.bool()] = torch.cat([item['ids'] for item in batch])
 
-def data_loader(data) -> DataLoader:
+    return {
+        'comment_id': [item['comment_id'] for item in batch],
+        'index': torch.tensor([item['index'] for item in batch], dtype=torch.long),
+        'ids': ids,
+        'mask': mask,
+        # single sentence inputs, every token belongs to sentence 0
+        'token_type_ids': torch.zeros_like(ids)
+    }
+
+
+def data_loader(data, dynamic_padding: bool = True) -> DataLoader:
     """Creates and returns a iterative data loader object for making predictions in batch.
 
     Args:
         data (pandas DataFrame): Dataset of which we need to create data loader.
+        dynamic_padding (bool): If True, comments are bucketed by token length and every batch is padded only to its longest member. If False, every comment is padded to MAX_LEN.
 
     Returns:
         PyTorch DataLoader: A python iterable over a dataset.
     """
-    
+
     inference_set = DetoxDataset(data, tokenizer, MAX_LEN)
 
+    if not dynamic_padding:
+        inference_params = {
+            'batch_size': BATCH_SIZE,
+            'shuffle': False,
+            'collate_fn': partial(pad_collate, pad_to = MAX_LEN),
+            'num_workers': 0
+        }
+
+        return DataLoader(inference_set, **inference_params)
+
     inference_params = {
-        'batch_size': BATCH_SIZE,
-        'shuffle': False,
+        'batch_sampler': LengthBucketSampler(inference_set.lengths, BATCH_SIZE),
+        'collate_fn': pad_collate,
         'num_workers': 0
     }
 
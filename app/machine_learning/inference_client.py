@@ -0,0 +1,108 @@
+import asyncio
+import json
+import os
+
+import pandas as pd
+
+from .prediction_result import PredictionResult
+from .inference_protocol import INFO, OK, frame, read_frame_async, encode_predict_request, decode_predict_response
+
+# socket of the out-of-process inference server, empty to classify comments in-process
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "")
+
+
+class InferenceClient:
+    """Client of the out-of-process inference server. Keeps a connection to every worker of the server and sends each request to the worker with fewest requests in flight."""
+
+    def __init__(self, socket_path: str = INFERENCE_SOCKET) -> None:
+        """Constructor for the client.
+
+        Args:
+            socket_path (str): Base path of the worker sockets.
+        """
+
+        self.socket_path = socket_path
+        self.connections = []
+        self.locks = []
+        self.in_flight = []
+        self.workers = 0
+        self.model_version = None
+
+    async def connect(self) -> None:
+        """Asks the first worker for the model version and no. of workers, then connects to every worker."""
+
+        reader, writer = await asyncio.open_unix_connection(f"{self.socket_path}.0")
+        info = json.loads(await self.exchange(reader, writer, bytes([INFO])))
+
+        self.model_version = info["model_version"]
+        self.workers = info["workers"]
+
+        self.connections = [(reader, writer)] + [await asyncio.open_unix_connection(f"{self.socket_path}.{index}") for index in range(1, self.workers)]
+        self.locks = [asyncio.Lock() for _ in range(self.workers)]
+        self.in_flight = [0] * self.workers
+
+    async def close(self) -> None:
+        """Closes connections to the workers."""
+
+        for connection in self.connections:
+            if connection is not None:
+                connection[1].close()
+
+        self.connections = []
+
+    @staticmethod
+    async def exchange(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, payload: bytes) -> bytes:
+        """Sends a request and reads its response.
+
+        Raises:
+            RuntimeError: If the worker failed to handle the request.
+
+        Returns:
+            bytes: Response body after the status byte.
+        """
+
+        writer.write(frame(payload))
+        await writer.drain()
+
+        response = await read_frame_async(reader)
+        if response[0] != OK:
+            raise RuntimeError(f"Inference server error: {response[1:].decode('utf-8')}")
+
+        return response[1:]
+
+    async def predict(self, data: pd.DataFrame) -> PredictionResult:
+        """Classifies comments on the least busy worker.
+
+        Args:
+            data (pandas DataFrame): DataFrame containing comment id and comment text.
+
+        Returns:
+            PredictionResult: Predicted classes and probabilities for comments, in the same order as data.
+        """
+
+        index = self.in_flight.index(min(self.in_flight))
+        self.in_flight[index] += 1
+
+        try:
+            # a connection carries one request at a time
+            async with self.locks[index]:
+                if self.connections[index] is None:
+                    self.connections[index] = await asyncio.open_unix_connection(f"{self.socket_path}.{index}")
+
+                try:
+                    body = await self.exchange(*self.connections[index], encode_predict_request(data.comment_text.tolist()))
+                except (OSError, asyncio.IncompleteReadError, asyncio.CancelledError):
+                    # connection may hold a half sent request or an unread response, it's reopened by the next request
+                    self.connections[index][1].close()
+                    self.connections[index] = None
+                    raise
+        finally:
+            self.in_flight[index] -= 1
+
+        labels, probabilities = decode_predict_response(body)
+
+        return PredictionResult(data.id.values, labels, probabilities)
+
+
+# client shared by all requests of the web-app, None if inference runs in-process
+inference_client = InferenceClient() if INFERENCE_SOCKET else None
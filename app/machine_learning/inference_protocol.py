@@ -0,0 +1,132 @@
+"""Binary protocol between the web-app and the inference server. Every message is a little endian uint32 payload length followed by the payload.
+
+Request payload: uint8 kind, then for PREDICT a uint32 comment count, uint32 utf-8 length of every comment and the concatenated utf-8 comments. INFO has no body.
+
+Response payload: uint8 status, then for a successful PREDICT a uint32 comment count, one uint8 label bitmask per comment and float16 probabilities of shape (comments, classes). INFO and errors carry a utf-8 (json for INFO) body.
+"""
+
+import asyncio
+import json
+import struct
+
+import numpy as np
+
+from .prediction_result import LABELS
+
+# request kinds
+PREDICT = 0
+INFO = 1
+
+# response statuses
+OK = 0
+ERROR = 1
+
+LENGTH = struct.Struct("<I")
+
+
+def encode_predict_request(texts: list) -> bytes:
+    """Encodes comments to be classified.
+
+    Args:
+        texts (list): Comment texts.
+
+    Returns:
+        bytes: Request payload.
+    """
+
+    encoded = [text.encode("utf-8") for text in texts]
+    lengths = np.fromiter((len(text) for text in encoded), dtype = "<u4", count = len(encoded))
+
+    return struct.pack("<BI", PREDICT, len(encoded)) + lengths.tobytes() + b"".join(encoded)
+
+
+def decode_predict_request(body: bytes) -> list:
+    """Decodes comments of a PREDICT request.
+
+    Args:
+        body (bytes): Request payload after the kind byte.
+
+    Returns:
+        list: Comment texts.
+    """
+
+    count = LENGTH.unpack_from(body)[0]
+    lengths = np.frombuffer(body, dtype = "<u4", count = count, offset = LENGTH.size)
+    ends = np.cumsum(lengths).tolist()
+
+    data = memoryview(body)[LENGTH.size + 4 * count:]
+    starts = [0] + ends[:-1]
+
+    return [str(data[start:end], "utf-8") for start, end in zip(starts, ends)]
+
+
+def encode_predict_response(labels: np.ndarray, probabilities: np.ndarray) -> bytes:
+    """Encodes predictions of a PREDICT request.
+
+    Args:
+        labels (numpy ndarray): 0/1 label matrix of shape (comments, classes).
+        probabilities (numpy ndarray): Probability matrix of shape (comments, classes).
+
+    Returns:
+        bytes: Response payload.
+    """
+
+    masks = np.packbits(labels.astype(np.uint8), axis = 1, bitorder = "little").reshape(-1)
+
+    return struct.pack("<BI", OK, len(masks)) + masks.tobytes() + probabilities.astype("<f2").tobytes()
+
+
+def decode_predict_response(body: bytes) -> tuple:
+    """Decodes predictions of a successful PREDICT response.
+
+    Args:
+        body (bytes): Response payload after the status byte.
+
+    Returns:
+        tuple: Label matrix and probability matrix, both of shape (comments, classes).
+    """
+
+    count = LENGTH.unpack_from(body)[0]
+    masks = np.frombuffer(body, dtype = np.uint8, count = count, offset = LENGTH.size)
+    labels = np.unpackbits(masks[:, None], axis = 1, count = len(LABELS), bitorder = "little")
+    probabilities = np.frombuffer(body, dtype = "<f2", count = count * len(LABELS), offset = LENGTH.size + count).reshape(-1, len(LABELS))
+
+    return labels, probabilities
+
+
+def encode_message(kind: int, body) -> bytes:
+    """Encodes an INFO request or response, or an error response.
+
+    Args:
+        kind (int): Request kind or response status.
+        body (dict or str): Json serializable body, or message of an error.
+
+    Returns:
+        bytes: Payload.
+    """
+
+    text = json.dumps(body) if isinstance(body, dict) else body
+    return struct.pack("<B", kind) + text.encode("utf-8")
+
+
+def frame(payload: bytes) -> bytes:
+    """Prefixes payload with its length."""
+
+    return LENGTH.pack(len(payload)) + payload
+
+
+def read_frame(stream) -> bytes:
+    """Reads a payload from a blocking socket file, None if the peer closed the connection."""
+
+    header = stream.read(LENGTH.size)
+    if len(header) < LENGTH.size:
+        return None
+
+    return stream.read(LENGTH.unpack(header)[0])
+
+
+async def read_frame_async(reader: asyncio.StreamReader) -> bytes:
+    """Reads a payload from an asyncio stream."""
+
+    header = await reader.readexactly(LENGTH.size)
+    return await reader.readexactly(LENGTH.unpack(header)[0])
@@ -0,0 +1,150 @@
+"""Out-of-process inference server. Runs worker processes which each load the model, are pinned to their own set of CPUs and serve the binary protocol of inference_protocol on a Unix socket of their own ('<socket>.<index>').
+
+Start it from the app directory and point the web-app at it:
+
+    python -m machine_learning.inference_server --socket /tmp/detox-inference.sock --workers 2
+    INFERENCE_SOCKET=/tmp/detox-inference.sock uvicorn main:app
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socketserver
+import threading
+
+import pandas as pd
+import torch
+
+from . import make_predictions, load_tokeninzer, load_model
+from .inference_protocol import PREDICT, INFO, OK, ERROR, read_frame, frame, decode_predict_request, encode_predict_response, encode_message
+
+# default socket path shared with the web-app
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "/tmp/detox-inference.sock")
+
+
+def cpu_sets(workers: int) -> list:
+    """Splits CPUs available to this process between workers.
+
+    Args:
+        workers (int): No. of worker processes.
+
+    Returns:
+        list: Set of CPUs for every worker, empty sets if CPU affinity isn't supported.
+    """
+
+    if not hasattr(os, "sched_getaffinity"):
+        return [set() for _ in range(workers)]
+
+    cpus = sorted(os.sched_getaffinity(0))
+
+    # more workers than CPUs share them round robin
+    if workers >= len(cpus):
+        return [{cpus[i % len(cpus)]} for i in range(workers)]
+
+    per_worker = len(cpus) // workers
+    return [set(cpus[i * per_worker:(i + 1) * per_worker]) for i in range(workers)]
+
+
+class InferenceHandler(socketserver.StreamRequestHandler):
+    """Serves requests of one connection until the client closes it. Connections of a worker share its model, requests are classified one at a time."""
+
+    def handle(self) -> None:
+        while True:
+            payload = read_frame(self.rfile)
+            if payload is None:
+                return
+
+            kind, body = payload[0], payload[1:]
+
+            try:
+                if kind == PREDICT:
+                    texts = decode_predict_request(body)
+                    data = pd.DataFrame({"id": range(len(texts)), "comment_text": texts})
+
+                    with self.server.model_lock:
+                        predictions = make_predictions.predict(data)
+
+                    response = encode_predict_response(predictions.labels, predictions.probabilities)
+
+                elif kind == INFO:
+                    response = encode_message(OK, {"model_version": make_predictions.model_version, "workers": self.server.workers, "pid": os.getpid()})
+
+                else:
+                    response = encode_message(ERROR, f"Unknown request kind {kind}.")
+
+            except Exception as error:
+                response = encode_message(ERROR, repr(error))
+
+            self.wfile.write(frame(response))
+            self.wfile.flush()
+
+
+def serve_worker(index: int, socket_path: str, workers: int, cpus: set, threads: int) -> None:
+    """Entry point of a worker process: pins it to its CPUs, loads the model and serves its socket.
+
+    Args:
+        index (int): Index of the worker.
+        socket_path (str): Base path of the sockets.
+        workers (int): No. of workers of the server, reported to clients.
+        cpus (set): CPUs the worker runs on, empty to not pin it.
+        threads (int): No. of torch intra-op threads, defaults to no. of CPUs of the worker.
+    """
+
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+
+    # one inter-op thread, batches of a worker are classified one after another anyway
+    torch.set_num_threads(threads or max(len(cpus), 1))
+    torch.set_num_interop_threads(1)
+
+    load_tokeninzer()
+    load_model()
+
+    path = f"{socket_path}.{index}"
+    if os.path.exists(path):
+        os.remove(path)
+
+    server = socketserver.ThreadingUnixStreamServer(path, InferenceHandler)
+    server.daemon_threads = True
+    server.model_lock = threading.Lock()
+    server.workers = workers
+
+    server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default = INFERENCE_SOCKET, help = "Base path of worker sockets.")
+    parser.add_argument("--workers", type = int, default = int(os.getenv("INFERENCE_WORKERS", 1)), help = "No. of worker processes.")
+    parser.add_argument("--threads", type = int, default = 0, help = "Torch threads per worker, defaults to its no. of CPUs.")
+    args = parser.parse_args()
+
+    # workers are spawned so that none inherits state of another
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target = serve_worker, args = (index, args.socket, args.workers, cpus, args.threads), name = f"inference-{index}")
+        for index, cpus in enumerate(cpu_sets(args.workers))
+    ]
+
+    for process in processes:
+        process.start()
+
+    # stop workers on SIGTERM as well as on Ctrl+C
+    def stop(signum, stack_frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
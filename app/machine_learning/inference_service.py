@@ -0,0 +1,233 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import make_predictions
+from .make_predictions import predict, trace_predict
+from .prediction_result import PredictionResult, LABELS
+from .prediction_cache import prediction_cache, decode_labels
+from .inference_client import inference_client
+
+from metrics import stage_seconds, comments_classified
+
+# parameters for micro-batching
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", 64))
+MAX_WAIT = float(os.getenv("INFERENCE_MAX_WAIT_MS", 10)) / 1000
+
+
+class InferenceService:
+    """Inference service. Comments submitted by concurrent requests are queued, combined into batches and classified on a dedicated thread so that the event loop stays free, or by the out-of-process inference server if a client is given."""
+
+    def __init__(self, max_batch_size: int = MAX_BATCH_SIZE, max_wait: float = MAX_WAIT, cache = prediction_cache, client = inference_client, tracer = None, trace_done = None) -> None:
+        """Constructor for the service.
+
+        Args:
+            max_batch_size (int): Maximum no. of comments classified in one call to predict.
+            max_wait (float): Seconds to wait for more comments before classifying a batch which isn't full.
+            cache (PredictionCache): Cache consulted before classifying comments, None to always classify.
+            client (InferenceClient): Client of the inference server, None to classify in-process.
+            tracer (callable): Called before every in-process batch, returns path to write a torch.profiler trace of its predict call to, or None not to trace it.
+            trace_done (callable): Called with the path once a traced predict call finished, i.e. its trace is written.
+        """
+
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.cache = cache
+        self.client = client
+        self.tracer = tracer
+        self.trace_done = trace_done
+        self.queue = None
+        self.executor = None
+        self.batcher = None
+        self.slots = None
+        self.batches = set()
+
+    @property
+    def model_version(self) -> str:
+        """Version of the model classifying comments, part of prediction cache keys."""
+
+        return make_predictions.model_version if self.client is None else self.client.model_version
+
+    async def start(self) -> None:
+        """Creates the queue, inference thread and the batching task, or connects to the inference server. Must be called from the running event loop."""
+
+        self.queue = asyncio.Queue()
+
+        if self.client is None:
+            self.executor = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = "inference")
+            self.slots = asyncio.Semaphore(1)
+        else:
+            # one batch in flight per server worker
+            await self.client.connect()
+            self.slots = asyncio.Semaphore(self.client.workers)
+
+        self.batcher = asyncio.create_task(self.runBatcher())
+
+    async def stop(self) -> None:
+        """Stops the batching task and inference thread. Pending callers receive a CancelledError."""
+
+        if self.batcher is None:
+            return
+
+        self.batcher.cancel()
+        for batch in self.batches:
+            batch.cancel()
+        await asyncio.gather(self.batcher, *self.batches, return_exceptions = True)
+
+        while not self.queue.empty():
+            _, future = self.queue.get_nowait()
+            future.cancel()
+
+        if self.executor is not None:
+            self.executor.shutdown(wait = True)
+        if self.client is not None:
+            await self.client.close()
+        self.batcher = None
+
+        if self.cache is not None:
+            self.cache.close()
+
+    async def predict(self, data: pd.DataFrame) -> PredictionResult:
+        """Classifies comments through the service. Cached predictions are reused and only cache misses are sent to the model.
+
+        Args:
+            data (pandas DataFrame): DataFrame containing comment id and comment text.
+
+        Returns:
+            PredictionResult: Predicted classes and probabilities for comments, in the same order as data.
+        """
+
+        if self.batcher is None:
+            raise RuntimeError("Inference service is not running, call start() first.")
+
+        if self.cache is None:
+            comments_classified.inc(len(data), source = "model")
+            return await self.classify(data)
+
+        loop = asyncio.get_running_loop()
+
+        keys = self.cache.keys(data.id.values, data.comment_text.values, self.model_version)
+        entries = await loop.run_in_executor(None, self.cache.get, keys)
+
+        hits = np.array([entry is not None for entry in entries], dtype = bool)
+        labels = np.zeros((len(data), len(LABELS)), dtype = np.uint8)
+        probabilities = np.zeros((len(data), len(LABELS)), dtype = np.float16)
+
+        if hits.any():
+            cached = [entry for entry in entries if entry is not None]
+            labels[hits] = decode_labels([mask for mask, _ in cached], len(LABELS))
+            probabilities[hits] = np.frombuffer(b"".join(blob for _, blob in cached), dtype = np.float16).reshape(-1, len(LABELS))
+
+        misses = np.flatnonzero(~hits)
+        comments_classified.inc(len(data) - len(misses), source = "cache")
+        comments_classified.inc(len(misses), source = "model")
+
+        if len(misses):
+            predictions = await self.classify(data.iloc[misses])
+            await loop.run_in_executor(None, self.cache.put, [keys[i] for i in misses], predictions.labels, predictions.probabilities)
+
+            labels[misses] = predictions.labels
+            probabilities[misses] = predictions.probabilities
+
+        return PredictionResult(data.id.values, labels, probabilities)
+
+    async def classify(self, data: pd.DataFrame) -> PredictionResult:
+        """Queues comments for the model in chunks of max_batch_size and waits for their predictions.
+
+        Args:
+            data (pandas DataFrame): DataFrame containing comment id and comment text.
+
+        Returns:
+            PredictionResult: Predicted classes and probabilities for comments, in the same order as data.
+        """
+
+        loop = asyncio.get_running_loop()
+
+        # split large submissions so that small requests can be interleaved with them
+        futures = []
+        for start in range(0, len(data), self.max_batch_size):
+            future = loop.create_future()
+            await self.queue.put((data.iloc[start:start + self.max_batch_size], future))
+            futures.append(future)
+
+        results = await asyncio.gather(*futures)
+
+        return PredictionResult.concat(results)
+
+    async def runBatcher(self) -> None:
+        """Collects queued chunks into batches of up to max_batch_size comments, waiting at most max_wait for a batch to fill, and classifies them once a slot is free, i.e. one at a time on the inference thread or one per server worker."""
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            jobs = [await self.queue.get()]
+            size = len(jobs[0][0])
+            deadline = loop.time() + self.max_wait
+
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    job = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                jobs.append(job)
+                size += len(job[0])
+
+            # comments keep queueing up into the next batch while all slots are busy
+            await self.slots.acquire()
+            batch = asyncio.create_task(self.runBatch(jobs))
+            self.batches.add(batch)
+            batch.add_done_callback(self.batches.discard)
+
+    async def runBatch(self, jobs: list) -> None:
+        """Classifies a batch and hands every caller its own slice of the predictions.
+
+        Args:
+            jobs (list): Tuples of comments chunk and future of its caller.
+        """
+
+        try:
+            batch = pd.concat([chunk for chunk, _ in jobs], ignore_index = True)
+
+            with stage_seconds.time(stage = "inference_batch"):
+                trace_path = self.tracer() if self.tracer is not None and self.client is None else None
+
+                if trace_path is not None:
+                    try:
+                        predictions = await asyncio.get_running_loop().run_in_executor(self.executor, trace_predict, batch, trace_path)
+                    finally:
+                        if self.trace_done is not None:
+                            self.trace_done(trace_path)
+                elif self.client is None:
+                    predictions = await asyncio.get_running_loop().run_in_executor(self.executor, predict, batch)
+                else:
+                    predictions = await self.client.predict(batch)
+
+        except asyncio.CancelledError:
+            for _, future in jobs:
+                future.cancel()
+            raise
+
+        except Exception as error:
+            for _, future in jobs:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        finally:
+            self.slots.release()
+
+        start = 0
+        for chunk, future in jobs:
+            if not future.done():
+                future.set_result(predictions[start:start + len(chunk)])
+            start += len(chunk)
+
+
+# service shared by all requests of the web-app
+inference_service = InferenceService()
\ No newline at end of file
@@ -1,71 +1,170 @@
+import json
+import os
+import time
+import warnings
+from functools import partial
+
 import torch
 import numpy as np
 import pandas as pd
+from transformers import BertConfig
 from .model_class import DetoxClass
+from .cascade import load_scorer, cascade_predict
+from .checkpoint import load_checkpoint, SkipInit, assign_state_dict, source_version
 from .data_loader import data_loader
-from . import fine_tuned_path
+from .prediction_result import PredictionResult, LABELS
+from . import fine_tuned_path, consolidated_path, cascade_path, inference_mode, cascade_threshold as default_cascade_threshold
+
+from metrics import stage_seconds
+
+# modes supported by load_model
+INFERENCE_MODES = ("fp32", "int8")
+
+# first stage of the cascade, None if every comment is classified by BERT
+cascade_scorer = None
+
 
+def load_model(mode: str = None, cascade_threshold: float = None) -> None:
+    """Loads fine-tuned model for prediction. The consolidated checkpoint is memory-mapped if it has been exported from the current fine-tuned state dict, otherwise pretrained BERT weights are loaded and overwritten by the fine-tuned state dict. The cascade first stage is loaded too if it's enabled and has been distilled. Time taken is kept in load_seconds.
 
-def load_model() -> None:
-    """Loads fine-tuned model for prediction."""
+    Args:
+        mode (str): Inference mode, "fp32" or "int8". Defaults to INFERENCE_MODE environment variable.
+        cascade_threshold (float): Probability below which the first stage clears comments, 0 disables the cascade. Defaults to CASCADE_THRESHOLD environment variable.
+
+    Raises:
+        ValueError: If mode is not supported.
+    """
     
-    global device, model
+    global device, model, model_version, load_seconds, cascade_scorer
     
-    model = DetoxClass()
+    mode = mode or inference_mode
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"Unsupported inference mode '{mode}', expected one of {INFERENCE_MODES}.")
+    
+    start = time.perf_counter()
     
     # loads model to GPU if available else on CPU
     device = 'cpu' 
-    if torch.cuda.is_available():
+    if torch.cuda.is_available() and mode == "fp32":
         device = 'cuda'
-        model.load_state_dict(torch.load(fine_tuned_path))
-        model.to(device)
+    
+    state_dict = None
+    if os.path.exists(consolidated_path):
+        state_dict, metadata = load_checkpoint(consolidated_path)
+        
+        # checkpoint exported before the state dict was replaced would serve the old weights
+        if os.path.exists(fine_tuned_path) and metadata["version"] != source_version(fine_tuned_path):
+            warnings.warn(f"{consolidated_path} wasn't exported from the current {fine_tuned_path}, loading {fine_tuned_path} instead. Export the checkpoint again with `python -m machine_learning.checkpoint`.")
+            state_dict = None
+    
+    if state_dict is not None:
+        # architecture comes from the stored config, weights are mapped in instead of being initialized and read
+        with SkipInit():
+            model = DetoxClass(BertConfig.from_dict(json.loads(metadata["config"])))
+        assign_state_dict(model, state_dict)
+        
+        version = metadata["version"]
+    
     else:
+        model = DetoxClass()
         model.load_state_dict(torch.load(fine_tuned_path, map_location=device))
+        
+        version = source_version(fine_tuned_path)
+    
+    model.to(device)
+    
+    # model is only used for inference, set it to evaluation mode once
+    model.eval()
+    
+    # int8 weights for linear layers, activations are quantized on the fly
+    if mode == "int8":
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype = torch.qint8)
+    
+    # identifies predictions made by this model, e.g. for caching them
+    model_version = os.getenv("MODEL_VERSION", version) + f"-{mode}"
+    
+    # cascade changes predictions of cleared comments, hence their version
+    cascade_scorer = None
+    cascade_threshold = default_cascade_threshold if cascade_threshold is None else cascade_threshold
+    if cascade_threshold > 0 and os.path.exists(cascade_path):
+        cascade_scorer = load_scorer(cascade_path)
+        cascade_scorer.threshold = cascade_threshold
+        model_version += f"-cascade{cascade_threshold}-{cascade_scorer.version}"
+    
+    load_seconds = time.perf_counter() - start
 
 
-def predict(data: pd.DataFrame) -> pd.DataFrame:
-    """Predics classes of the comments.
+def predict(data: pd.DataFrame, dynamic_padding: bool = True, cascade: bool = True) -> PredictionResult:
+    """Predics classes of the comments, with the cascade if it's loaded.
 
     Args:
-        inference_loader (PyTorch DataLoader): A python iterable over a dataset.
+        data (pandas DataFrame): DataFrame containing comment id and comment text.
+        dynamic_padding (bool): Pad every batch only to its longest comment instead of MAX_LEN.
+        cascade (bool): If False, classify every comment with BERT even if the cascade is loaded.
 
     Returns:
-        pandas DataFrame: DataFrame containing predicted class for comments.
+        PredictionResult: Predicted classes and probabilities for comments, in the same order as data.
     """
 
-    # get data loader
-    inference_loader = data_loader(data)
+    if cascade and cascade_scorer is not None:
+        return cascade_predict(data, cascade_scorer, cascade_scorer.threshold, partial(predict_bert, dynamic_padding = dynamic_padding))
+
+    return predict_bert(data, dynamic_padding)
+
+
+def predict_bert(data: pd.DataFrame, dynamic_padding: bool = True) -> PredictionResult:
+    """Predics classes of the comments with the fine-tuned BERT model.
+
+    Args:
+        data (pandas DataFrame): DataFrame containing comment id and comment text.
+        dynamic_padding (bool): Pad every batch only to its longest comment instead of MAX_LEN.
+
+    Returns:
+        PredictionResult: Predicted classes and probabilities for comments, in the same order as data.
+    """
+
+    # get data loader, comments are tokenized while creating it
+    with stage_seconds.time(stage = "data_loader"):
+        inference_loader = data_loader(data, dynamic_padding)
     
-    # set model to evaluation (inference) mode
-    model.eval()
-    comment_id = []
-    preds = []
+    # batches may come in length order, every batch writes its rows at their original position
+    probabilities = np.zeros((len(data), len(LABELS)), dtype = np.float32)
     
-    # iterate over every batch of dataset using data loader and make predictions
-    for _, data in enumerate(inference_loader, 0):
+    # iterate over every batch of dataset using data loader and make predictions, without tracking gradients
+    with torch.inference_mode():
+        for _, batch in enumerate(inference_loader, 0):
 
-        comment_id.extend(data['comment_id'])
+            ids = batch['ids'].to(device, dtype = torch.long)
+            mask = batch['mask'].to(device, dtype = torch.long)
+            token_type_ids = batch['token_type_ids'].to(device, dtype = torch.long)
 
-        ids = data['ids'].to(device, dtype = torch.long)
-        mask = data['mask'].to(device, dtype = torch.long)
-        token_type_ids = data['token_type_ids'].to(device, dtype = torch.long)
+            # copying probabilities to cpu waits for the forward pass on gpu
+            with stage_seconds.time(stage = "model_forward"):
+                outputs = model(ids, mask, token_type_ids)
+                probabilities[batch['index'].numpy()] = torch.sigmoid(outputs).cpu().numpy()
 
-        outputs = model(ids, mask, token_type_ids)
-        preds.extend(torch.sigmoid(outputs).cpu().detach().numpy().tolist())
+    # activate a class if probability crosses threshold
+    return PredictionResult.fromProbabilities(data.id.values, probabilities)
 
-    # activate a class if logit value crosses threshold
-    preds = np.array(preds) >= 0.5
-    
-    predictions = {
-        'id': comment_id,
-        'labels': [pred for pred in preds]
-    }
-
-    # convert dict to pandas DataFrame
-    predictions = pd.DataFrame.from_dict(predictions)
-    labels = ['Toxic', 'Severe Toxic', 'Obscene', 'Threat', 'Insult', 'Identity Hate']
-    predictions[labels] = pd.DataFrame(predictions.labels.tolist(), index = predictions.index)
-    predictions.drop(columns=['labels'], axis=1, inplace=True)
-    predictions.replace({False: 0, True: 1}, inplace=True)
+
+def trace_predict(data: pd.DataFrame, trace_path: str) -> PredictionResult:
+    """Predicts classes of the comments under torch.profiler and writes its trace, viewable in chrome://tracing or perfetto.
+
+    Args:
+        data (pandas DataFrame): DataFrame containing comment id and comment text.
+        trace_path (str): Path of the chrome trace file.
+
+    Returns:
+        PredictionResult: Predicted classes and probabilities for comments, in the same order as data.
+    """
+
+    activities = [torch.profiler.ProfilerActivity.CPU]
+    if device == 'cuda':
+        activities.append(torch.profiler.ProfilerActivity.CUDA)
+
+    with torch.profiler.profile(activities = activities, record_shapes = True) as profiler:
+        predictions = predict(data)
+
+    profiler.export_chrome_trace(trace_path)
 
     return predictions
\ No newline at end of file
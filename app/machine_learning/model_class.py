@@ -1,15 +1,19 @@
-from transformers import BertModel
+from transformers import BertModel, BertConfig
 from torch.nn import Module, Dropout, Linear
 from . import pretrained_path
 
 class DetoxClass(Module):
     """PyTorch Model Class."""
     
-    def __init__(self) -> None:
-        """Constructor. Defines layers of the model."""
+    def __init__(self, config: BertConfig = None) -> None:
+        """Constructor. Defines layers of the model.
+
+        Args:
+            config (BertConfig): Builds BERT layer from config without loading pretrained weights, e.g. for loading a consolidated checkpoint. Loads pretrained weights if None.
+        """
         
         super(DetoxClass, self).__init__()
-        self.l1 = BertModel.from_pretrained(pretrained_path)
+        self.l1 = BertModel.from_pretrained(pretrained_path) if config is None else BertModel(config)
         self.l2 = Dropout(0.3)
         self.l3 = Linear(768, 6)
     
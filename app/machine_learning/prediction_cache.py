@@ -0,0 +1,198 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# parameters for prediction cache
+CACHE_ENABLED = os.getenv("PREDICTION_CACHE", "1") == "1"
+CACHE_PATH = os.getenv("PREDICTION_CACHE_PATH", "prediction_cache.sqlite3")
+MEMORY_SIZE = int(os.getenv("PREDICTION_CACHE_MEMORY_SIZE", 100_000))
+DISK_SIZE = int(os.getenv("PREDICTION_CACHE_DISK_SIZE", 2_000_000))
+
+# sqlite limits no. of host parameters per statement
+QUERY_CHUNK = 500
+
+# version of the table layout, stored as user_version of the database. Caches of other versions are dropped, not migrated
+SCHEMA_VERSION = 2
+
+
+def encode_labels(labels: np.ndarray) -> list:
+    """Packs every row of a 0/1 label matrix into an integer bitmask.
+
+    Args:
+        labels (numpy ndarray): Label matrix of shape (comments, classes).
+
+    Returns:
+        list: Bitmask per comment.
+    """
+
+    weights = 1 << np.arange(labels.shape[1], dtype = np.int64)
+    return (labels.astype(np.int64) @ weights).tolist()
+
+
+def decode_labels(masks: list, n_classes: int) -> np.ndarray:
+    """Unpacks bitmasks created by encode_labels into a 0/1 label matrix.
+
+    Args:
+        masks (list): Bitmask per comment.
+        n_classes (int): No. of classes.
+
+    Returns:
+        numpy ndarray: Label matrix of shape (comments, classes).
+    """
+
+    masks = np.asarray(masks, dtype = np.int64).reshape(-1, 1)
+    return ((masks >> np.arange(n_classes, dtype = np.int64)) & 1).astype(np.uint8)
+
+
+class PredictionCache:
+    """Two tier cache of predicted labels and probabilities keyed by (comment id, comment text hash, model version). An in-memory LRU tier sits in front of an on-disk SQLite tier which survives restarts."""
+
+    def __init__(self, path: str = CACHE_PATH, memory_size: int = MEMORY_SIZE, disk_size: int = DISK_SIZE) -> None:
+        """Constructor for the cache.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            memory_size (int): Maximum no. of entries kept in memory.
+            disk_size (int): Maximum no. of entries kept on disk, least recently used entries are evicted beyond it.
+        """
+
+        self.path = path
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.connection = None
+        self.disk_count = 0
+
+    def connect(self) -> sqlite3.Connection:
+        """Opens the SQLite database lazily and creates the table if needed. A table of another schema version is dropped, its entries would only be recomputed.
+
+        Returns:
+            sqlite3 Connection: Connection to the cache database.
+        """
+
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, check_same_thread = False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            if self.connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                self.connection.execute("DROP TABLE IF EXISTS predictions")
+                self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS predictions (key BLOB PRIMARY KEY, labels INTEGER NOT NULL, probabilities BLOB NOT NULL, last_used REAL NOT NULL)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS predictions_last_used ON predictions (last_used)")
+            self.connection.commit()
+            self.disk_count = self.connection.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+        return self.connection
+
+    @staticmethod
+    def keys(comment_ids, comment_texts, model_version: str) -> list:
+        """Creates cache keys for comments.
+
+        Args:
+            comment_ids (array-like): Comment ids.
+            comment_texts (array-like): Comment texts.
+            model_version (str): Version of the model making predictions, entries of other versions are never returned.
+
+        Returns:
+            list: Cache key (16 byte digest) per comment.
+        """
+
+        return [
+            hashlib.blake2b(f"{comment_id}\0{comment_text}\0{model_version}".encode(), digest_size = 16).digest()
+            for comment_id, comment_text in zip(comment_ids, comment_texts)
+        ]
+
+    def get(self, keys: list) -> list:
+        """Looks up keys, first in memory then on disk. Disk hits are promoted to memory.
+
+        Args:
+            keys (list): Cache keys.
+
+        Returns:
+            list: Tuple of label bitmask and float16 probabilities bytes per key, or None if key isn't cached.
+        """
+
+        with self.lock:
+            results = [self.memory.get(key) for key in keys]
+            for key, result in zip(keys, results):
+                if result is not None:
+                    self.memory.move_to_end(key)
+
+            missing = [key for key, result in zip(keys, results) if result is None]
+            if not missing:
+                return results
+
+            connection = self.connect()
+            found = {}
+            for i in range(0, len(missing), QUERY_CHUNK):
+                chunk = missing[i:i + QUERY_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                found.update((key, (labels, probabilities)) for key, labels, probabilities in connection.execute(f"SELECT key, labels, probabilities FROM predictions WHERE key IN ({placeholders})", chunk))
+
+            if found:
+                now = time.time()
+                connection.executemany("UPDATE predictions SET last_used = ? WHERE key = ?", ((now, key) for key in found))
+                connection.commit()
+                self.remember(found.items())
+
+            return [result if result is not None else found.get(key) for key, result in zip(keys, results)]
+
+    def put(self, keys: list, labels: np.ndarray, probabilities: np.ndarray) -> None:
+        """Stores predictions in both tiers and evicts least recently used entries beyond the size limits.
+
+        Args:
+            keys (list): Cache keys.
+            labels (numpy ndarray): Label matrix, one row per key.
+            probabilities (numpy ndarray): Probability matrix, one row per key.
+        """
+
+        entries = list(zip(encode_labels(labels), (row.tobytes() for row in np.asarray(probabilities, dtype = np.float16))))
+
+        with self.lock:
+            self.remember(zip(keys, entries))
+
+            connection = self.connect()
+            now = time.time()
+            connection.executemany("INSERT OR REPLACE INTO predictions (key, labels, probabilities, last_used) VALUES (?, ?, ?, ?)", ((key, mask, probabilities, now) for key, (mask, probabilities) in zip(keys, entries)))
+
+            # replaced keys make this an overestimate, exact count is only taken when limit seems crossed
+            self.disk_count += len(keys)
+            if self.disk_count > self.disk_size:
+                self.disk_count = connection.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+                excess = self.disk_count - self.disk_size
+                if excess > 0:
+                    connection.execute("DELETE FROM predictions WHERE key IN (SELECT key FROM predictions ORDER BY last_used LIMIT ?)", (excess,))
+                    self.disk_count -= excess
+
+            connection.commit()
+
+    def remember(self, items) -> None:
+        """Adds entries to the memory tier, evicting least recently used ones. Caller must hold the lock.
+
+        Args:
+            items (iterable): (key, (bitmask, probabilities bytes)) pairs.
+        """
+
+        for key, entry in items:
+            self.memory[key] = entry
+            self.memory.move_to_end(key)
+
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last = False)
+
+    def close(self) -> None:
+        """Closes the SQLite connection."""
+
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+# cache shared by all requests of the web-app
+prediction_cache = PredictionCache() if CACHE_ENABLED else None
\ No newline at end of file
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+# classes predicted by the model, in order of its outputs
+LABELS = ['Toxic', 'Severe Toxic', 'Obscene', 'Threat', 'Insult', 'Identity Hate']
+
+# probability above which a class is activated
+THRESHOLD = 0.5
+
+
+class PredictionResult:
+    """Compact predictions for a set of comments: an id array, a 0/1 label matrix and a probability matrix, one row per comment."""
+
+    def __init__(self, ids, labels: np.ndarray, probabilities: np.ndarray) -> None:
+        """Constructor for the result.
+
+        Args:
+            ids (array-like): Comment ids.
+            labels (numpy ndarray): Label matrix of shape (comments, classes), 1 if class is predicted.
+            probabilities (numpy ndarray): Probability matrix of shape (comments, classes).
+        """
+
+        self.ids = np.asarray(ids, dtype = object)
+        self.labels = np.asarray(labels, dtype = np.uint8).reshape(-1, len(LABELS))
+        self.probabilities = np.asarray(probabilities, dtype = np.float16).reshape(-1, len(LABELS))
+
+    @classmethod
+    def fromProbabilities(cls, ids, probabilities: np.ndarray) -> "PredictionResult":
+        """Creates result from model probabilities by activating every class crossing THRESHOLD.
+
+        Args:
+            ids (array-like): Comment ids.
+            probabilities (numpy ndarray): Probability matrix of shape (comments, classes).
+
+        Returns:
+            PredictionResult: Predictions for the comments.
+        """
+
+        probabilities = np.asarray(probabilities, dtype = np.float32).reshape(-1, len(LABELS))
+        return cls(ids, probabilities >= THRESHOLD, probabilities)
+
+    @classmethod
+    def empty(cls) -> "PredictionResult":
+        """Creates result without any comments.
+
+        Returns:
+            PredictionResult: Empty predictions.
+        """
+
+        return cls([], np.zeros((0, len(LABELS))), np.zeros((0, len(LABELS))))
+
+    @classmethod
+    def concat(cls, results: list) -> "PredictionResult":
+        """Joins results one after another.
+
+        Args:
+            results (list): PredictionResult objects.
+
+        Returns:
+            PredictionResult: Predictions for comments of all results, in the given order.
+        """
+
+        if not results:
+            return cls.empty()
+
+        return cls(
+            np.concatenate([result.ids for result in results]),
+            np.concatenate([result.labels for result in results]),
+            np.concatenate([result.probabilities for result in results])
+        )
+
+    def __len__(self) -> int:
+        """No. of comments in the result."""
+
+        return len(self.ids)
+
+    def __getitem__(self, index) -> "PredictionResult":
+        """Selects comments by slice, index array or boolean mask.
+
+        Returns:
+            PredictionResult: Predictions for selected comments.
+        """
+
+        return PredictionResult(self.ids[index], self.labels[index], self.probabilities[index])
+
+    def toxicMask(self) -> np.ndarray:
+        """Boolean mask of comments having at least one class predicted.
+
+        Returns:
+            numpy ndarray: True for toxic comments.
+        """
+
+        return self.labels.any(axis = 1)
+
+    def toxicIds(self) -> list:
+        """Ids of comments having at least one class predicted.
+
+        Returns:
+            list: Comment ids of toxic comments.
+        """
+
+        return self.ids[self.toxicMask()].tolist()
+
+    def classCounts(self) -> dict:
+        """No. of comments predicted for every class.
+
+        Returns:
+            dict: Class name to no. of comments.
+        """
+
+        return dict(zip(LABELS, self.labels.sum(axis = 0, dtype = np.int64).tolist()))
+
+    def toDataFrame(self) -> pd.DataFrame:
+        """Converts result to a DataFrame with an id column and a 0/1 column per class.
+
+        Returns:
+            pandas DataFrame: Predictions for the comments.
+        """
+
+        predictions = pd.DataFrame(self.labels, columns = LABELS)
+        predictions.insert(0, "id", self.ids)
+
+        return predictions
\ No newline at end of file
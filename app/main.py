@@ -1,35 +1,79 @@
+import logging
 import os
 from dotenv import load_dotenv
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 from fastapi.staticfiles import StaticFiles
-from starlette.middleware.sessions import SessionMiddleware
 
 from config import templates
 from auth import auth_router
-from views import home_view, analysis_view
+from views import home_view, analysis_view, admin_view
+from views.admin import authorized
 
-from machine_learning import load_tokeninzer, load_model
+from machine_learning import load_tokeninzer, load_model, inference_service, make_predictions
+from machine_learning.inference_client import inference_client
+from library.http_client import startClient, closeClient
+from library.sessions import ServerSideSessionMiddleware, createSessionStore, SESSION_BACKEND
+from library.analysis_jobs import analysis_jobs
+from library.word_cloud import word_cloud_renderer
+from library.profiler import analysis_profiler
+from metrics import registry, CONTENT_TYPE
 
 
 # allowing http urls for testing TO BE REMOVED WHILE DEPLOYING
 load_dotenv() # for loading variables from .env file
 os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
 
-# initializing fastapi app, adding static files directory and session middelware for session management
+# load model while importing the app, i.e. before a pre-forking server forks its workers (e.g. gunicorn main:app --preload -k uvicorn.workers.UvicornWorker -w 4), so that workers share its pages copy-on-write
+PRELOAD_MODEL = os.getenv("PRELOAD_MODEL", "0") == "1"
+
+# requests of a user land on any worker, so sessions have to be shared by them like analysis jobs, artifacts and quota spent are
+if PRELOAD_MODEL and SESSION_BACKEND == "memory":
+    raise RuntimeError("PRELOAD_MODEL is meant for running several workers, which don't share in-memory sessions. Set SESSION_BACKEND=sqlite.")
+
+# initializing fastapi app, adding static files directory and session middelware for session management, session data is kept server-side
 app = FastAPI()
 app.mount("/static", StaticFiles(directory="static"), name="static")
-app.add_middleware(SessionMiddleware, secret_key = os.getenv("SESSION_SECRET"))
+app.add_middleware(ServerSideSessionMiddleware, store = createSessionStore())
 
+# model is only loaded by the web-app if comments aren't classified by the out-of-process inference server
+LOAD_MODEL = inference_client is None
 
-@app.on_event("startup")
-def startup_event():
-    """Load machine learning model on startup to reduce time in making first request."""
-    
+if LOAD_MODEL and PRELOAD_MODEL:
     load_tokeninzer()
     load_model()
 
 
+@app.on_event("startup")
+async def startup_event():
+    """Load machine learning model on startup (unless the inference server classifies comments) to reduce time in making first request, start the inference service (tracing predict calls for the profiler if it is enabled and the model runs in this process) and analysis job workers and open the shared http client."""
+    
+    if LOAD_MODEL and not PRELOAD_MODEL:
+        load_tokeninzer()
+        load_model()
+    if LOAD_MODEL:
+        logging.getLogger("uvicorn.error").info(f"Model {make_predictions.model_version} loaded in {make_predictions.load_seconds:.2f}s")
+    if analysis_profiler.enabled and LOAD_MODEL:
+        inference_service.tracer = analysis_profiler.nextTrace
+        inference_service.trace_done = analysis_profiler.traceDone
+    elif analysis_profiler.enabled:
+        analysis_profiler.torch_unavailable = "predict calls run in the out-of-process inference server"
+        logging.getLogger("uvicorn.error").warning(f"Profiling analyses without torch traces, {analysis_profiler.torch_unavailable}")
+    await inference_service.start()
+    await analysis_jobs.start()
+    await startClient()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop analysis job workers, the inference service and word cloud rendering processes and close the shared http client."""
+    
+    await analysis_jobs.stop()
+    await inference_service.stop()
+    word_cloud_renderer.close()
+    await closeClient()
+
+
 @app.get("/", tags=["Landing Page"])
 def landing(request: Request):
     """Landing Page of the web-app.
@@ -44,7 +88,25 @@ def landing(request: Request):
     return templates.TemplateResponse("landing.html", {"request": request})
 
 
+@app.get("/metrics", tags=["Monitoring"])
+def metrics(request: Request):
+    """Metrics of the worker process serving the request in Prometheus text format: latency histograms per analysis stage, comments classified, youtube requests by status code, quota units charged and analyses in flight. Like admin endpoints, scrapers have to send the admin bearer token.
+
+    Args:
+        request (Request): A Request object containing request data sent from client side.
+
+    Returns:
+        Response: Metrics in exposition format, 404 if not authorized.
+    """
+    
+    if not authorized(request):
+        return Response(status_code = 404)
+    
+    return Response(registry.render(), media_type = CONTENT_TYPE)
+
+
 # adding various routes to the app
 app.include_router(auth_router, tags=["Google OAuth 2.0"], prefix="/auth")
 app.include_router(home_view, tags=["Home"], prefix="/home")
-app.include_router(analysis_view, tags=["Video Analysis"], prefix="/video-analysis")
\ No newline at end of file
+app.include_router(analysis_view, tags=["Video Analysis"], prefix="/video-analysis")
+app.include_router(admin_view, tags=["Admin"], prefix="/admin")
\ No newline at end of file
@@ -0,0 +1,5 @@
+"""Metrics of the web-app in Prometheus text exposition format, served by /metrics. Every process keeps its own metrics, so with several server workers each one is scraped (or reports) separately."""
+
+# objects for easy access in different modules
+from .prometheus import Counter, Gauge, Histogram, MetricsRegistry, CONTENT_TYPE
+from .web_app import registry, stage_seconds, comments_classified, youtube_requests, youtube_quota_units, cascade_comments, analyses_in_flight
@@ -0,0 +1,226 @@
+"""Counters, gauges and histograms rendered in Prometheus text exposition format."""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# histogram buckets in seconds, from a single page request to a cold analysis of a large video
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def escapeLabel(value: str) -> str:
+    """Escapes backslashes, double quotes and newlines of a label value."""
+
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def formatLabels(labels: dict) -> str:
+    """Formats labels as '{name="value",...}'."""
+
+    if not labels:
+        return ""
+
+    return "{" + ",".join(f'{name}="{escapeLabel(value)}"' for name, value in labels.items()) + "}"
+
+
+def formatValue(value: float) -> str:
+    """Formats a sample value, integers without a fractional part."""
+
+    if value == float("inf"):
+        return "+Inf"
+
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    """Base of metrics. Values are kept per combination of label values and may be updated from any thread."""
+
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()) -> None:
+        """Constructor for the metric.
+
+        Args:
+            name (str): Metric name.
+            documentation (str): Help text.
+            labelnames (tuple): Names of labels every update has to provide.
+        """
+
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels: dict) -> tuple:
+        """Label values of an update in the order of labelnames.
+
+        Raises:
+            ValueError: If labels don't match labelnames.
+        """
+
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}.")
+
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> list:
+        """Samples of the metric as (suffix, labels, value) tuples."""
+
+        with self.lock:
+            return [("", dict(zip(self.labelnames, key)), value) for key, value in sorted(self.values.items())]
+
+    def render(self) -> str:
+        """Renders the metric in exposition format."""
+
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{self.name}{suffix}{formatLabels(labels)} {formatValue(value)}" for suffix, labels, value in self.samples()]
+
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Increases the counter by amount."""
+
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value which goes up and down."""
+
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Increases the gauge by amount."""
+
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        """Decreases the gauge by amount."""
+
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        """Sets the gauge to value."""
+
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> None:
+        """Constructor for the histogram.
+
+        Args:
+            name (str): Metric name.
+            documentation (str): Help text.
+            labelnames (tuple): Names of labels every observation has to provide.
+            buckets (tuple): Upper bounds of the buckets, +Inf is added.
+        """
+
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels) -> None:
+        """Records an observation."""
+
+        key = self.key(labels)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes seconds taken by the block, also if it raises."""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> list:
+        """Samples of every bucket, sum and count as (suffix, labels, value) tuples."""
+
+        with self.lock:
+            values = [(key, list(counts), total) for key, (counts, total) in sorted(self.values.items())]
+
+        samples = []
+        for key, counts, total in values:
+            labels = dict(zip(self.labelnames, key))
+
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append(("_bucket", {**labels, "le": formatValue(bound)}, cumulative))
+
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, cumulative))
+
+        return samples
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self) -> None:
+        """Constructor for the registry."""
+
+        self.metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """Adds a metric to the registry.
+
+        Raises:
+            ValueError: If a metric of the same name is registered.
+        """
+
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered.")
+
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        """Creates and registers a counter."""
+
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        """Creates and registers a gauge."""
+
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        """Creates and registers a histogram."""
+
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Renders every metric in exposition format.
+
+        Returns:
+            str: Text to be served with content type CONTENT_TYPE.
+        """
+
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+# content type of the exposition format, starlette appends the charset to text types
+CONTENT_TYPE = "text/plain; version=0.0.4"
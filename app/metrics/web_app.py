@@ -0,0 +1,14 @@
+"""Metrics of the web-app, recorded by its modules and served by /metrics."""
+
+from .prometheus import MetricsRegistry
+
+# registry shared by all requests of the web-app
+registry = MetricsRegistry()
+
+# metrics of the web-app, shared by all requests
+stage_seconds = registry.histogram("detox_stage_seconds", "Seconds taken by a stage of the analysis pipeline or request handling.", ("stage",))
+comments_classified = registry.counter("detox_comments_classified_total", "Comments classified, by the model or from the prediction cache.", ("source",))
+youtube_requests = registry.counter("detox_youtube_requests_total", "Requests sent to the youtube data api, by endpoint and response status code ('error' if no response was received).", ("endpoint", "status"))
+youtube_quota_units = registry.counter("detox_youtube_quota_units_total", "Youtube data api quota units charged, by endpoint.", ("endpoint",))
+cascade_comments = registry.counter("detox_cascade_comments_total", "Comments resolved by each stage of the cascade classifier, 'first' if cleared without BERT.", ("stage",))
+analyses_in_flight = registry.gauge("detox_analyses_in_flight", "Video analysis jobs queued or running.", ("state",))
@@ -0,0 +1,72 @@
+from library.analysis_state import AnalysisStateStore, emptyState, discardComments
+
+
+def analyzed_state() -> dict:
+    """State of a video with toxic comments 'a' and 'b' among 3 analyzed comments."""
+
+    state = emptyState()
+    state["comment_count"] = 3
+    state["toxic"] = {"a": 1, "b": 5}
+    state["toxic_terms"] = {"a": {"stupid": 2, "video": 1}, "b": {"idiot": 1, "video": 1}}
+    state["word_frequencies"] = {"stupid": 2, "idiot": 1, "video": 3}
+    return state
+
+
+def test_discard_comments_removes_their_terms_and_count():
+    state = analyzed_state()
+
+    removed = discardComments(state, ["a", "unknown"])
+
+    assert removed == ["a"]
+    assert state["toxic"] == {"b": 5}
+    assert state["comment_count"] == 2
+    assert state["word_frequencies"] == {"idiot": 1, "video": 2}
+    assert "a" not in state["toxic_terms"]
+
+
+def test_discard_updates_stored_state(tmp_path):
+    store = AnalysisStateStore(str(tmp_path / "state.sqlite3"))
+    store.save("v", analyzed_state())
+
+    store.discard("v", ["a"])
+
+    state = store.load("v")
+    assert state["toxic"] == {"b": 5}
+    assert state["comment_count"] == 2
+    assert "stupid" not in state["word_frequencies"]
+
+
+def test_saving_state_loaded_before_discard_keeps_comments_discarded(tmp_path):
+    store = AnalysisStateStore(str(tmp_path / "state.sqlite3"))
+    store.save("v", analyzed_state())
+
+    # an analysis loads the state, comments are rejected meanwhile, then the analysis saves
+    stale = store.load("v")
+    store.discard("v", ["a"])
+    store.save("v", stale)
+
+    state = store.load("v")
+    assert state["toxic"] == {"b": 5}
+    assert state["comment_count"] == 2
+    assert state["word_frequencies"] == {"idiot": 1, "video": 2}
+
+
+def test_discard_before_first_save_applies_to_it(tmp_path):
+    store = AnalysisStateStore(str(tmp_path / "state.sqlite3"))
+
+    store.discard("v", ["a"])
+    store.save("v", analyzed_state())
+
+    assert store.load("v")["toxic"] == {"b": 5}
+
+
+def test_delete_forgets_state_and_discarded_ids(tmp_path):
+    store = AnalysisStateStore(str(tmp_path / "state.sqlite3"))
+    store.save("v", analyzed_state())
+    store.discard("v", ["a"])
+
+    store.delete("v")
+
+    assert store.load("v") == emptyState()
+    store.save("v", analyzed_state())
+    assert store.load("v")["toxic"] == {"a": 1, "b": 5}
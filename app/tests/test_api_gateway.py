@@ -0,0 +1,102 @@
+import asyncio
+
+import httpx
+import pytest
+
+from library import http_client
+from library.api_gateway import YouTubeGateway
+from exceptions import QuotaExceededError
+
+API = "https://www.googleapis.com/youtube/v3/"
+HEADERS = {"Authorization": "Bearer token"}
+
+
+@pytest.fixture
+def youtube(monkeypatch):
+    """Routes the shared http client to a handler answering like youtube, returns the requests it received."""
+
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        endpoint = request.url.path.rsplit("/v3/", 1)[-1]
+        requests.append((endpoint, request.headers.get("If-None-Match")))
+
+        if endpoint == "commentThreads":
+            return httpx.Response(403, json = {"error": {"errors": [{"reason": "quotaExceeded"}]}})
+
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers = {"ETag": '"v1"'})
+
+        return httpx.Response(200, json = {"items": [endpoint]}, headers = {"ETag": '"v1"'})
+
+    monkeypatch.setattr(http_client, "client", httpx.AsyncClient(transport = httpx.MockTransport(handler)))
+    return requests
+
+
+def test_cached_response_is_revalidated_with_its_etag(youtube, tmp_path):
+    gateway = YouTubeGateway(cache_ttl = 0, path = str(tmp_path / "quota.sqlite3"))
+
+    async def main():
+        return [await gateway.get(API + "videos", {"id": "v", "key": "secret"}, HEADERS) for _ in range(2)]
+
+    first, second = asyncio.run(main())
+
+    assert youtube == [("videos", None), ("videos", '"v1"')]
+    assert first.status_code == second.status_code == 200
+    assert second.json() == {"items": ["videos"]}
+    # a 304 costs quota too
+    assert gateway.spentToday() == 2
+
+
+def test_fresh_response_is_served_without_request(youtube, tmp_path):
+    gateway = YouTubeGateway(cache_ttl = 60, path = str(tmp_path / "quota.sqlite3"))
+
+    async def main():
+        for headers in (HEADERS, HEADERS, {"Authorization": "Bearer other"}):
+            await gateway.get(API + "channels", {"mine": "true"}, headers)
+
+    asyncio.run(main())
+
+    # cached per authorized user
+    assert youtube == [("channels", None), ("channels", None)]
+
+
+def test_lower_priorities_are_refused_first(youtube, tmp_path):
+    gateway = YouTubeGateway(daily_quota = 1000, path = str(tmp_path / "quota.sqlite3"))
+
+    async def search(query: int, priority: str):
+        await gateway.get(API + "search", {"q": query}, HEADERS, priority)
+
+    # after 800 units, a 100 unit request would leave less than the 20% kept from low priority
+    for query in range(8):
+        asyncio.run(search(query, "high"))
+
+    with pytest.raises(QuotaExceededError) as refused:
+        asyncio.run(search(8, "low"))
+
+    assert refused.value.reason == "reserved"
+    asyncio.run(search(9, "normal"))
+    assert gateway.usage() == {"project": "default", "daily_quota": 1000, "spent": 900, "remaining": 100}
+
+
+def test_spend_is_shared_through_the_database(youtube, tmp_path):
+    path = str(tmp_path / "quota.sqlite3")
+    worker, other_worker = YouTubeGateway(daily_quota = 200, path = path), YouTubeGateway(daily_quota = 200, path = path)
+
+    asyncio.run(worker.get(API + "search", {"q": 1}, HEADERS, "high"))
+
+    assert other_worker.spentToday() == 100
+    with pytest.raises(QuotaExceededError):
+        asyncio.run(other_worker.get(API + "search", {"q": 2}, HEADERS, "normal"))
+
+
+def test_exhausted_quota_is_recorded_for_the_day(youtube, tmp_path):
+    gateway = YouTubeGateway(daily_quota = 1000, path = str(tmp_path / "quota.sqlite3"))
+
+    with pytest.raises(QuotaExceededError) as exhausted:
+        asyncio.run(gateway.get(API + "commentThreads", {"videoId": "v"}, HEADERS, "high"))
+
+    assert exhausted.value.reason == "quotaExceeded"
+    assert gateway.usage()["remaining"] == 0
+    with pytest.raises(QuotaExceededError):
+        asyncio.run(gateway.get(API + "videos", {"id": "v"}, HEADERS, "high"))
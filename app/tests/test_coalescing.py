@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from library.coalescing import RequestCoalescer
+
+
+def test_concurrent_calls_share_one_request():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"items": [1]}
+
+    async def main():
+        coalescer = RequestCoalescer()
+        results = await asyncio.gather(*(coalescer.run("channel", fetch) for _ in range(5)))
+        return coalescer, results
+
+    coalescer, results = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert coalescer.in_flight == {}
+
+
+def test_later_calls_start_a_fresh_request():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        coalescer = RequestCoalescer()
+        return [await coalescer.run("channel", fetch), await coalescer.run("channel", fetch)]
+
+    assert asyncio.run(main()) == [1, 2]
+
+
+def test_different_keys_are_not_coalesced():
+    async def main():
+        coalescer = RequestCoalescer()
+
+        async def fetch(key):
+            await asyncio.sleep(0.01)
+            return key
+
+        return await asyncio.gather(coalescer.run("a", lambda: fetch("a")), coalescer.run("b", lambda: fetch("b")))
+
+    assert asyncio.run(main()) == ["a", "b"]
+
+
+def test_exception_is_raised_for_every_caller():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("quota")
+
+    async def main():
+        coalescer = RequestCoalescer()
+        return await asyncio.gather(*(coalescer.run("channel", fail) for _ in range(3)), return_exceptions = True)
+
+    results = asyncio.run(main())
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_caller_does_not_cancel_request_of_others():
+    async def main():
+        coalescer = RequestCoalescer()
+        finished = asyncio.Event()
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            finished.set()
+            return "data"
+
+        leaving = asyncio.create_task(coalescer.run("channel", fetch))
+        staying = asyncio.create_task(coalescer.run("channel", fetch))
+        await asyncio.sleep(0.01)
+        leaving.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+
+        return await staying, finished.is_set()
+
+    assert asyncio.run(main()) == ("data", True)
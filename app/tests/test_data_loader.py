@@ -0,0 +1,61 @@
+import numpy as np
+import torch
+
+from machine_learning.data_loader import LengthBucketSampler, pad_collate
+
+
+def instances(lengths: list) -> list:
+    """Dataset instances of comments with given token lengths, token ids are distinct and never 0 (padding)."""
+
+    return [{"comment_id": f"c{index}", "index": index, "ids": torch.arange(1, length + 1) + 100 * index} for index, length in enumerate(lengths)]
+
+
+def test_pad_collate_matches_fixed_padding_up_to_longest_comment():
+    batch = instances([3, 7, 1, 5])
+
+    dynamic = pad_collate(batch)
+    fixed = pad_collate(batch, pad_to = 12)
+
+    assert dynamic["ids"].shape == (4, 7)
+    assert fixed["ids"].shape == (4, 12)
+    assert torch.equal(dynamic["ids"], fixed["ids"][:, :7])
+    assert torch.equal(dynamic["mask"], fixed["mask"][:, :7])
+    assert not fixed["ids"][:, 7:].any() and not fixed["mask"][:, 7:].any()
+
+
+def test_pad_collate_masks_exactly_the_tokens_of_every_comment():
+    batch = instances([3, 7, 1])
+
+    collated = pad_collate(batch)
+
+    assert collated["mask"].sum(dim = 1).tolist() == [3, 7, 1]
+    for row, item in enumerate(batch):
+        assert torch.equal(collated["ids"][row, :len(item["ids"])], item["ids"])
+    assert not collated["token_type_ids"].any()
+    assert collated["comment_id"] == ["c0", "c1", "c2"]
+    assert collated["index"].tolist() == [0, 1, 2]
+
+
+def test_length_bucket_sampler_groups_similar_lengths():
+    lengths = [9, 2, 7, 2, 5, 1, 8]
+
+    batches = list(LengthBucketSampler(lengths, batch_size = 3))
+
+    assert [[lengths[index] for index in batch] for batch in batches] == [[1, 2, 2], [5, 7, 8], [9]]
+    assert len(LengthBucketSampler(lengths, batch_size = 3)) == 3
+
+
+def test_length_bucket_sampler_order_is_restored_by_index():
+    lengths = [9, 2, 7, 2, 5, 1, 8, 3]
+    dataset = instances(lengths)
+
+    # as make_predictions does, outputs of every batch are scattered back to the original positions of its comments
+    restored = np.zeros(len(lengths), dtype = np.int64)
+    seen = []
+    for batch in LengthBucketSampler(lengths, batch_size = 3):
+        collated = pad_collate([dataset[index] for index in batch])
+        restored[collated["index"].numpy()] = collated["mask"].sum(dim = 1).numpy()
+        seen.extend(collated["index"].tolist())
+
+    assert sorted(seen) == list(range(len(lengths)))
+    assert restored.tolist() == lengths
@@ -0,0 +1,66 @@
+import asyncio
+import io
+import json
+
+import numpy as np
+
+from machine_learning import inference_protocol as protocol
+from machine_learning.prediction_result import LABELS
+
+
+def test_predict_request_round_trip():
+    texts = ["first comment", "", "emoji 👍 and ünïcode", "line\nbreak"]
+
+    payload = protocol.encode_predict_request(texts)
+
+    assert payload[0] == protocol.PREDICT
+    assert protocol.decode_predict_request(payload[1:]) == texts
+
+
+def test_empty_predict_request_round_trip():
+    payload = protocol.encode_predict_request([])
+
+    assert protocol.decode_predict_request(payload[1:]) == []
+
+
+def test_predict_response_round_trip():
+    labels = np.array([[1, 0, 1, 0, 0, 1], [0, 0, 0, 0, 0, 0], [1, 1, 1, 1, 1, 1]], dtype = np.uint8)
+    probabilities = np.array([[0.9, 0.1, 0.6, 0.0, 0.2, 0.75], [0.0] * len(LABELS), [0.99] * len(LABELS)])
+
+    payload = protocol.encode_predict_response(labels, probabilities)
+    decoded_labels, decoded_probabilities = protocol.decode_predict_response(payload[1:])
+
+    assert payload[0] == protocol.OK
+    # one bitmask byte and 6 float16 per comment after status and count
+    assert len(payload) == 1 + 4 + 3 * (1 + 2 * len(LABELS))
+    assert np.array_equal(decoded_labels, labels)
+    assert np.array_equal(decoded_probabilities, probabilities.astype(np.float16))
+
+
+def test_info_and_error_messages():
+    info = protocol.encode_message(protocol.INFO, {"model": "bert"})
+    error = protocol.encode_message(protocol.ERROR, "out of memory")
+
+    assert info[0] == protocol.INFO
+    assert json.loads(info[1:].decode("utf-8")) == {"model": "bert"}
+    assert error[1:].decode("utf-8") == "out of memory"
+
+
+def test_frames_are_read_back_from_stream():
+    payloads = [protocol.encode_predict_request(["a", "bc"]), b"", protocol.encode_message(protocol.INFO, "")]
+    stream = io.BytesIO(b"".join(protocol.frame(payload) for payload in payloads))
+
+    assert [protocol.read_frame(stream) for _ in payloads] == payloads
+    assert protocol.read_frame(stream) is None
+
+
+def test_frames_are_read_back_from_async_stream():
+    payloads = [protocol.encode_predict_request(["comment"] * 3), b"\x01"]
+
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"".join(protocol.frame(payload) for payload in payloads))
+        reader.feed_eof()
+        return [await protocol.read_frame_async(reader) for _ in payloads]
+
+    assert asyncio.run(main()) == payloads
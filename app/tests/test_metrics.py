@@ -0,0 +1,79 @@
+import pytest
+
+from metrics import MetricsRegistry
+
+
+def test_counter_exposition():
+    registry = MetricsRegistry()
+    requests = registry.counter("youtube_requests_total", "Requests sent to youtube.", ("endpoint", "status"))
+
+    requests.inc(endpoint = "videos", status = 200)
+    requests.inc(2, endpoint = "search", status = 200)
+    requests.inc(endpoint = "videos", status = 200)
+
+    assert registry.render() == (
+        "# HELP youtube_requests_total Requests sent to youtube.\n"
+        "# TYPE youtube_requests_total counter\n"
+        'youtube_requests_total{endpoint="search",status="200"} 2\n'
+        'youtube_requests_total{endpoint="videos",status="200"} 2\n'
+    )
+
+
+def test_gauge_without_labels():
+    registry = MetricsRegistry()
+    in_flight = registry.gauge("analyses_in_flight", "Running analyses.")
+
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+    assert registry.render().splitlines()[-1] == "analyses_in_flight 1"
+
+    in_flight.set(0.5)
+    assert registry.render().splitlines()[-1] == "analyses_in_flight 0.5"
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    errors = registry.counter("errors_total", "Errors.", ("message",))
+
+    errors.inc(message = 'say "hi"\\\nbye')
+
+    assert registry.render().splitlines()[-1] == 'errors_total{message="say \\"hi\\"\\\\\\nbye"} 1'
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    stages = registry.histogram("stage_seconds", "Seconds per stage.", ("stage",), buckets = (1, 0.1))
+
+    for seconds in (0.05, 0.1, 0.5, 3):
+        stages.observe(seconds, stage = "classify")
+
+    assert registry.render().splitlines()[2:] == [
+        'stage_seconds_bucket{stage="classify",le="0.1"} 2',
+        'stage_seconds_bucket{stage="classify",le="1"} 3',
+        'stage_seconds_bucket{stage="classify",le="+Inf"} 4',
+        'stage_seconds_sum{stage="classify"} 3.65',
+        'stage_seconds_count{stage="classify"} 4'
+    ]
+
+
+def test_histogram_times_blocks_which_raise():
+    registry = MetricsRegistry()
+    stages = registry.histogram("stage_seconds", "Seconds per stage.", ("stage",))
+
+    with pytest.raises(RuntimeError):
+        with stages.time(stage = "fetch"):
+            raise RuntimeError("failed")
+
+    assert 'stage_seconds_count{stage="fetch"} 1' in registry.render()
+
+
+def test_labels_must_match_and_names_be_unique():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ("endpoint",))
+
+    with pytest.raises(ValueError):
+        requests.inc(status = 200)
+
+    with pytest.raises(ValueError):
+        registry.gauge("requests_total", "Requests.")
@@ -0,0 +1,42 @@
+import numpy as np
+
+from machine_learning.prediction_cache import PredictionCache, encode_labels, decode_labels
+
+
+def test_labels_round_trip_through_bitmasks():
+    labels = np.array([[0, 0, 0, 0, 0, 0], [1, 0, 1, 0, 0, 1], [1, 1, 1, 1, 1, 1], [0, 1, 0, 0, 1, 0]], dtype = np.uint8)
+
+    masks = encode_labels(labels)
+
+    assert masks == [0, 0b100101, 0b111111, 0b010010]
+    assert np.array_equal(decode_labels(masks, 6), labels)
+
+
+def test_decode_labels_of_no_comments():
+    assert decode_labels([], 6).shape == (0, 6)
+
+
+def test_cache_returns_stored_predictions_from_disk(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    keys = PredictionCache.keys(["a", "b"], ["first", "second"], "v1")
+    labels = np.array([[1, 0, 0, 0, 0, 0], [0, 0, 0, 0, 0, 0]], dtype = np.uint8)
+    probabilities = np.array([[0.9, 0.1, 0.1, 0.1, 0.1, 0.1], [0.2] * 6], dtype = np.float32)
+
+    cache = PredictionCache(path)
+    cache.put(keys, labels, probabilities)
+    cache.close()
+
+    # a fresh cache has nothing in memory, entries come from the database
+    results = PredictionCache(path).get(keys + PredictionCache.keys(["a"], ["edited"], "v1"))
+
+    assert [mask for mask, _ in results[:2]] == encode_labels(labels)
+    assert np.array_equal(np.frombuffer(results[0][1], dtype = np.float16), probabilities[0].astype(np.float16))
+    assert results[2] is None
+
+
+def test_keys_depend_on_text_and_model_version():
+    key, = PredictionCache.keys(["a"], ["text"], "v1")
+
+    assert PredictionCache.keys(["a"], ["text"], "v1") == [key]
+    assert PredictionCache.keys(["a"], ["text!"], "v1") != [key]
+    assert PredictionCache.keys(["a"], ["text"], "v2") != [key]
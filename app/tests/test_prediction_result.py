@@ -0,0 +1,57 @@
+import numpy as np
+
+from machine_learning.prediction_result import PredictionResult, LABELS
+
+
+def result() -> PredictionResult:
+    probabilities = np.array([
+        [0.9, 0.1, 0.6, 0.0, 0.2, 0.0],
+        [0.1, 0.1, 0.1, 0.1, 0.1, 0.1],
+        [0.5, 0.0, 0.0, 0.0, 0.7, 0.0]
+    ])
+    return PredictionResult.fromProbabilities(["a", "b", "c"], probabilities)
+
+
+def test_classes_are_activated_from_threshold():
+    predictions = result()
+
+    assert predictions.labels.tolist() == [[1, 0, 1, 0, 0, 0], [0, 0, 0, 0, 0, 0], [1, 0, 0, 0, 1, 0]]
+    assert predictions.labels.dtype == np.uint8
+    assert predictions.probabilities.dtype == np.float16
+
+
+def test_toxic_ids_and_class_counts():
+    predictions = result()
+
+    assert predictions.toxicMask().tolist() == [True, False, True]
+    assert predictions.toxicIds() == ["a", "c"]
+    assert predictions.classCounts() == {"Toxic": 2, "Severe Toxic": 0, "Obscene": 1, "Threat": 0, "Insult": 1, "Identity Hate": 0}
+
+
+def test_selection_and_concatenation_keep_rows_together():
+    predictions = result()
+
+    selected = predictions[np.array([2, 0])]
+    joined = PredictionResult.concat([predictions[1:], predictions[:1]])
+
+    assert selected.ids.tolist() == ["c", "a"]
+    assert np.array_equal(selected.labels, predictions.labels[[2, 0]])
+    assert joined.ids.tolist() == ["b", "c", "a"]
+    assert np.array_equal(joined.probabilities, predictions.probabilities[[1, 2, 0]])
+
+
+def test_empty_results():
+    empty = PredictionResult.concat([])
+
+    assert len(empty) == 0
+    assert empty.labels.shape == (0, len(LABELS))
+    assert empty.toxicIds() == []
+    assert len(PredictionResult.concat([empty, result()])) == 3
+
+
+def test_data_frame_has_id_and_class_columns():
+    frame = result().toDataFrame()
+
+    assert list(frame.columns) == ["id"] + LABELS
+    assert frame.id.tolist() == ["a", "b", "c"]
+    assert frame.Toxic.tolist() == [1, 0, 1]
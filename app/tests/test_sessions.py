@@ -0,0 +1,132 @@
+import json
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from library.sessions import MemorySessionStore, SQLiteSessionStore, ServerSideSessionMiddleware, rotateSession
+
+
+class CountingStore(MemorySessionStore):
+    """Memory store counting the saves it receives."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.saved = 0
+
+    def save(self, session_id: str, data: str) -> None:
+        self.saved += 1
+        super().save(session_id, data)
+
+
+async def login(request):
+    request.session["user"] = request.query_params.get("user", "alice")
+    rotateSession(request)
+    return PlainTextResponse("logged in")
+
+
+async def visit(request):
+    request.session["visits"] = request.session.get("visits", 0) + 1
+    return PlainTextResponse("visited")
+
+
+async def read(request):
+    return PlainTextResponse(request.session.get("user", ""))
+
+
+async def logout(request):
+    request.session.clear()
+    return PlainTextResponse("logged out")
+
+
+@pytest.fixture
+def store():
+    return CountingStore()
+
+
+@pytest.fixture
+def client(store):
+    app = Starlette(routes = [Route("/login", login), Route("/visit", visit), Route("/read", read), Route("/logout", logout)])
+    app.add_middleware(ServerSideSessionMiddleware, store = store)
+    return TestClient(app)
+
+
+def test_cookie_carries_only_session_id(client, store):
+    client.get("/login")
+
+    session_id = client.cookies["session"]
+    assert "alice" not in session_id
+    assert json.loads(store.load(session_id)) == {"user": "alice"}
+
+
+def test_unchanged_session_is_not_saved(client, store):
+    client.get("/login")
+    saved = store.saved
+
+    response = client.get("/read")
+
+    assert response.text == "alice"
+    assert store.saved == saved
+    assert "set-cookie" not in response.headers
+
+
+def test_changed_session_is_saved_under_same_id(client, store):
+    client.get("/visit")
+    session_id = client.cookies["session"]
+
+    client.get("/visit")
+
+    assert client.cookies["session"] == session_id
+    assert json.loads(store.load(session_id)) == {"visits": 2}
+    assert store.saved == 2
+
+
+def test_rotation_issues_new_id_and_forgets_old_one(client, store):
+    client.get("/visit")
+    planted_id = client.cookies["session"]
+
+    client.get("/login")
+
+    session_id = client.cookies["session"]
+    assert session_id != planted_id
+    assert store.load(planted_id) is None
+    assert json.loads(store.load(session_id)) == {"visits": 1, "user": "alice"}
+
+
+def test_rotation_saves_even_if_data_is_unchanged(client, store):
+    client.get("/login")
+    first_id = client.cookies["session"]
+
+    client.get("/login")
+
+    assert client.cookies["session"] != first_id
+    assert store.saved == 2
+
+
+def test_cleared_session_is_deleted(client, store):
+    client.get("/login")
+    session_id = client.cookies["session"]
+
+    response = client.get("/logout")
+
+    assert store.load(session_id) is None
+    assert "expires=Thu, 01 Jan 1970" in response.headers["set-cookie"]
+
+
+def test_unknown_session_id_starts_empty_session(client):
+    client.cookies.set("session", "forged")
+
+    response = client.get("/read")
+
+    assert response.text == ""
+    assert "set-cookie" not in response.headers
+
+
+def test_sqlite_sessions_expire(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), ttl = -1)
+
+    store.save("id", "{}")
+
+    assert store.load("id") is None
@@ -0,0 +1,48 @@
+from collections import Counter
+
+from library.word_cloud import WordCloudRenderer, countTerms, mergeTerms
+
+
+def test_terms_are_lowercased_without_stopwords_and_numbers():
+    counts = countTerms(["The VIDEO was great", "this video, 2023 video!"])
+
+    assert counts == Counter({"video": 3, "great": 1})
+
+
+def test_possessives_are_counted_with_their_term():
+    counts = countTerms(["the channel's best video", "best channel"])
+
+    assert counts["channel"] == 2
+    assert "channel's" not in counts
+
+
+def test_merge_adds_counts_in_place():
+    frequencies = {"video": 2, "great": 1}
+
+    merged = mergeTerms(frequencies, Counter({"video": 1, "song": 4}), max_terms = 10)
+
+    assert merged is frequencies
+    assert merged == {"video": 3, "great": 1, "song": 4}
+
+
+def test_merge_keeps_up_to_twice_max_terms_unpruned():
+    frequencies = {f"term{index}": index for index in range(1, 6)}
+
+    merged = mergeTerms(frequencies, Counter({"term6": 6}), max_terms = 3)
+
+    assert len(merged) == 6
+
+
+def test_merge_prunes_to_most_frequent_terms():
+    frequencies = {f"term{index}": index for index in range(1, 7)}
+
+    merged = mergeTerms(frequencies, Counter({"term1": 10, "term7": 7}), max_terms = 3)
+
+    assert merged == {"term1": 11, "term7": 7, "term6": 6}
+
+
+def test_cache_key_ignores_term_order_but_not_counts():
+    renderer = WordCloudRenderer(processes = 0)
+
+    assert renderer.cacheKey({"a": 1, "b": 2}) == renderer.cacheKey({"b": 2, "a": 1})
+    assert renderer.cacheKey({"a": 1, "b": 2}) != renderer.cacheKey({"a": 1, "b": 3})
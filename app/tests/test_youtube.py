@@ -0,0 +1,92 @@
+import asyncio
+
+import httpx
+import pytest
+
+from library import youtube
+from exceptions import QuotaExceededError, ForbiddenError
+
+CREDENTIALS = {"access_token": "token"}
+
+
+class FakeGateway:
+    """Answers moderation requests from a script of responses per chunk of ids, an exception in the script is raised."""
+
+    def __init__(self, script: dict = None) -> None:
+        self.script = script or {}
+        self.requests = []
+
+    async def post(self, request_uri: str, params: dict, headers: dict, priority: str = "normal") -> httpx.Response:
+        self.requests.append(params["id"])
+        await asyncio.sleep(0)
+
+        responses = self.script.get(params["id"], [204])
+        outcome = responses.pop(0) if len(responses) > 1 else responses[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+
+        return httpx.Response(outcome)
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    def install(script: dict = None) -> FakeGateway:
+        fake = FakeGateway(script)
+        monkeypatch.setattr(youtube, "gateway", fake)
+        return fake
+
+    monkeypatch.setattr(youtube, "MODERATION_CHUNK_SIZE", 2)
+    monkeypatch.setattr(youtube, "MODERATION_RETRIES", 2)
+    monkeypatch.setattr(youtube, "MODERATION_BACKOFF", 0)
+    return install
+
+
+def test_ids_are_rejected_in_chunks(gateway):
+    fake = gateway()
+
+    outcomes = asyncio.run(youtube.rejectComments(CREDENTIALS, ["a", "b", "c", "d", "e"]))
+
+    assert sorted(fake.requests) == ["a,b", "c,d", "e"]
+    assert outcomes == {id: "rejected" for id in "abcde"}
+
+
+def test_transient_failures_are_retried(gateway):
+    fake = gateway({
+        "a,b": [503, 204],
+        "c,d": [httpx.ConnectError("reset"), 204],
+        "e": [QuotaExceededError("slow down", reason = "rateLimitExceeded"), 204]
+    })
+
+    outcomes = asyncio.run(youtube.rejectComments(CREDENTIALS, ["a", "b", "c", "d", "e"]))
+
+    assert outcomes == {id: "rejected" for id in "abcde"}
+    assert len(fake.requests) == 6
+
+
+def test_chunks_fail_on_client_errors_and_exhausted_retries(gateway):
+    fake = gateway({"a,b": [400], "c,d": [500]})
+
+    outcomes = asyncio.run(youtube.rejectComments(CREDENTIALS, ["a", "b", "c", "d", "e"]))
+
+    assert outcomes == {"a": "failed", "b": "failed", "c": "failed", "d": "failed", "e": "rejected"}
+    # client errors aren't retried, server errors are retried MODERATION_RETRIES times
+    assert fake.requests.count("a,b") == 1
+    assert fake.requests.count("c,d") == 3
+
+
+def test_quota_exhaustion_leaves_unsent_chunks_pending(gateway, monkeypatch):
+    monkeypatch.setattr(youtube, "MODERATION_CONCURRENCY", 1)
+    gateway({"c,d": [QuotaExceededError("quota", reason = "quotaExceeded")]})
+    outcomes = {}
+
+    with pytest.raises(QuotaExceededError):
+        asyncio.run(youtube.rejectComments(CREDENTIALS, ["a", "b", "c", "d", "e"], outcomes))
+
+    assert outcomes == {"a": "rejected", "b": "rejected", "c": "pending", "d": "pending", "e": "pending"}
+
+
+def test_forbidden_is_raised(gateway):
+    gateway({"a,b": [403]})
+
+    with pytest.raises(ForbiddenError):
+        asyncio.run(youtube.rejectComments(CREDENTIALS, ["a", "b"]))
@@ -2,4 +2,5 @@
 
 # objects for easy access in different modules 
 from .home import home_view
-from .video_analysis import analysis_view
\ No newline at end of file
+from .video_analysis import analysis_view
+from .admin import admin_view
\ No newline at end of file
@@ -0,0 +1,81 @@
+import os
+import secrets
+
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import FileResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from library.profiler import analysis_profiler
+from library.process_memory import processMemory
+
+# bearer token of admin endpoints, which are disabled if it isn't set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+admin_view = APIRouter()
+
+def authorized(request: Request) -> bool:
+    """Checks bearer token of an admin request.
+
+    Args:
+        request (Request): A Request object containing request data sent from client side.
+
+    Returns:
+        bool: True if admin endpoints are enabled and request carries the admin token.
+    """
+
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    return bool(ADMIN_TOKEN) and scheme.lower() == "bearer" and secrets.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+@admin_view.get("/profiles")
+async def list_profiles(request: Request):
+    """Lists captures of slow or sampled analyses kept by the profiler.
+
+    Args:
+        request (Request): A Request object containing request data sent from client side.
+
+    Returns:
+        JSONResponse: Metadata of every capture (id, video, duration, reason, stage timings, ...), newest first. 404 if not authorized.
+    """
+
+    if not authorized(request):
+        return Response(status_code = 404)
+
+    return JSONResponse({"enabled": analysis_profiler.enabled, "captures": await run_in_threadpool(analysis_profiler.listCaptures)})
+
+
+@admin_view.get("/profiles/{capture_id}")
+async def download_profile(request: Request, capture_id: str):
+    """Downloads a capture: zip archive of metadata.json, stacks.folded (flamegraph.pl or speedscope), summary.txt and predict-<n>.json torch traces (chrome://tracing or perfetto).
+
+    Args:
+        request (Request): A Request object containing request data sent from client side.
+        capture_id (str): Id of the capture, as listed.
+
+    Returns:
+        FileResponse: The archive, 404 if not authorized or capture doesn't exist.
+    """
+
+    path = analysis_profiler.path(capture_id) if authorized(request) else None
+    if path is None:
+        return Response(status_code = 404)
+
+    return FileResponse(path, media_type = "application/zip", filename = capture_id)
+
+
+@admin_view.get("/memory")
+async def memory(request: Request):
+    """Memory of the worker process serving the request, for measuring how much of the model weights workers share.
+
+    Args:
+        request (Request): A Request object containing request data sent from client side.
+
+    Returns:
+        JSONResponse: Dictionary containing pid, rss_mb, pss_mb, shared_mb and private_mb of the worker. 404 if not authorized.
+    """
+
+    if not authorized(request):
+        return Response(status_code = 404)
+
+    return JSONResponse(await run_in_threadpool(processMemory))
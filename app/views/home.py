@@ -2,12 +2,14 @@ from fastapi import APIRouter, Request
 from fastapi.responses import RedirectResponse, HTMLResponse
 
 from library.youtube import fetchChannelData, fetchVideoData
+from library.coalescing import coalescer
 
 from exceptions import *
 
 from config import templates
 
 import asyncio
+import hashlib
 
 home_view = APIRouter()
 
@@ -31,28 +33,44 @@ async def home(request: Request):
     # check if required data is already loaded in session if yes, get it from there else fetch from YT
     if "channel_data" not in request.session:
         credentials = request.session["credentials"]
-        request.session["channel_data"] = {}
+        
+        # identical fetches in flight for same credentials (e.g. several tabs) share one upstream request
+        key = hashlib.sha256(credentials["access_token"].encode()).hexdigest()
+        
         try:
-            # fetch channel details &  video data and store it in session storage
-            channel_details = await fetchChannelData(credentials)
-            request.session["channel_data"]["channel_details"] = channel_details
-
-            video_data = await fetchVideoData(credentials)
-            request.session["channel_data"]["video_data"] = video_data
+            # fetch channel details & video data concurrently
+            channel_details, video_data = await asyncio.gather(
+                coalescer.run(("channel_details", key), lambda: fetchChannelData(credentials)),
+                coalescer.run(("video_data", key), lambda: fetchVideoData(credentials)),
+                return_exceptions = True
+            )
+            
+            # no videos uploaded yet isn't an error for home page
+            if isinstance(video_data, EntityNotFoundError) and video_data.entity == "video":
+                video_data = {}
+            
+            for result in (channel_details, video_data):
+                if isinstance(result, BaseException):
+                    raise result
             
         except QuotaExceededError: # request quota is exceeded
             return HTMLResponse("Cannot connect to youtube right now. Please comeback in a while.")
         
+        except ForbiddenError: # account isn't permitted to access its channel data
+            return HTMLResponse(f"Your account isn't permitted to access this channel's data. <a href={request.url_for('revoke')}>Revoke access</a> and authorize with a different account.")
+        
         except AccessTokenExpiredError: # get fresh access token using refresh token
             request.session["redirect_url"] = str(request.url)
             return RedirectResponse(request.url_for("refresh_access_token"))
         
-        except EntityNotFoundError as entity_error: # no channel or videos not found
-            if entity_error.entity == "channel":
-                return HTMLResponse(f"<a href={request.url_for('revoke')}>Revoke access</a> for this account and authorize with a valid youtube channel.")
-            
-            elif entity_error.entity == "video":
-                request.session["channel_data"]["video_data"] = {}
+        except EntityNotFoundError: # no channel found
+            return HTMLResponse(f"<a href={request.url_for('revoke')}>Revoke access</a> for this account and authorize with a valid youtube channel.")
+        
+        # store channel details & video data in session storage
+        request.session["channel_data"] = {
+            "channel_details": channel_details,
+            "video_data": video_data
+        }
     
     channel_details = request.session["channel_data"]["channel_details"]
     video_data = request.session["channel_data"]["video_data"]
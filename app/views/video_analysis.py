@@ -1,29 +1,133 @@
+import json
 import os
 
 from fastapi import APIRouter, Request, Response
-from fastapi.responses import RedirectResponse, HTMLResponse
+from fastapi.responses import RedirectResponse, HTMLResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
-from library.youtube import fetchVideoComments, rejectComments
-from library.video_analysis import VideoAnalysis
+from library.youtube import rejectComments
+from library.analysis_state import analysis_state
+from library.analysis_jobs import analysis_jobs
+from library.artifacts import artifact_store
 
 from exceptions import *
 
 from config import templates
 
+# seconds between progress events sent to the analysis page
+PROGRESS_INTERVAL = float(os.getenv("ANALYSIS_PROGRESS_INTERVAL", 0.5))
+
 
 analysis_view = APIRouter()
 
+
+def ownsVideo(request: Request, video_id: str) -> bool:
+    """Checks whether video is one of the videos of the channel logged in with this session, analyses are shared between sessions by video id.
+
+    Args:
+        request (Request): A Request object containing request data sent from client side.
+        video_id (str): Video id to be checked.
+
+    Returns:
+        bool: True if video belongs to the session's channel.
+    """
+    
+    return "channel_data" in request.session and video_id in request.session["channel_data"]["video_data"]
+
+
 @analysis_view.get("/{video_id}")
-async def video_analysis(request: Request, video_id: str):
-    """Video Analysis page of the web-app.
+async def video_analysis(request: Request, video_id: str, full: bool = False):
+    """Video Analysis page of the web-app. Enqueues analysis of the video (or joins the one already running) and returns a progress page at once, which moves to the result page when the job finishes.
 
     Args:
         request (Request): A Request object containing request data sent from client side.
         video_id (str): Video id corresponding to which analysis to be done.
+        full (bool): If True, discard previous analysis and analyze all comments again.
 
     Returns:
         RedirectResponse: Redirects to home page where user authorizes first if not authorized.
-        HTMLResponse: If an exception occurs, generic page stating the exception is displayed.
+        HTMLResponse: 404 if video isn't one of the channel's videos.
+        TemplateResponse: Progress page with context-dict containing necessary data.
+    """
+    
+    # check if required data is present in session or someone has hit this url directly
+    if "channel_data" not in request.session:
+        return RedirectResponse(request.url_for("home"))
+    
+    if not ownsVideo(request, video_id):
+        return HTMLResponse("Video not found in your channel.", status_code = 404)
+    
+    await analysis_jobs.submit(video_id, request.session["credentials"], full)
+    
+    context_dict = {
+        "request": request,
+        "channel_details": request.session["channel_data"]["channel_details"],
+        "video": request.session["channel_data"]["video_data"][video_id],
+        "video_id": video_id
+    }
+    
+    return templates.TemplateResponse("analysis_progress.html", context = context_dict)
+
+
+@analysis_view.get("/{video_id}/status")
+async def analysis_status(request: Request, video_id: str):
+    """Reports progress of the latest analysis job of a video, for polling.
+
+    Args:
+        request (Request): A Request object containing request data sent from client side.
+        video_id (str): Video id of the analysis.
+
+    Returns:
+        JSONResponse: Job status, error, pages fetched, comments classified and stage timings, 404 if there is no job or video isn't one of the channel's videos.
+    """
+    
+    job = await analysis_jobs.get(video_id)
+    if not ownsVideo(request, video_id) or job is None:
+        return JSONResponse({"detail": "No analysis found for this video."}, status_code = 404)
+    
+    return JSONResponse(job.progress())
+
+
+@analysis_view.get("/{video_id}/events")
+async def analysis_events(request: Request, video_id: str):
+    """Streams progress of the latest analysis job of a video as Server-Sent Events, until the job finishes.
+
+    Args:
+        request (Request): A Request object containing request data sent from client side.
+        video_id (str): Video id of the analysis.
+
+    Returns:
+        StreamingResponse: 'text/event-stream' of progress dictionaries, 404 if there is no job or video isn't one of the channel's videos.
+    """
+    
+    job = await analysis_jobs.get(video_id)
+    if not ownsVideo(request, video_id) or job is None:
+        return JSONResponse({"detail": "No analysis found for this video."}, status_code = 404)
+    
+    async def progressEvents():
+        nonlocal job
+        while True:
+            yield f"data: {json.dumps(job.progress())}\n\n"
+            if not job.active or await request.is_disconnected():
+                break
+            
+            # wakes up early when job finishes so that the final event isn't delayed, jobs of other worker processes are polled
+            job = await analysis_jobs.wait(job, PROGRESS_INTERVAL)
+    
+    return StreamingResponse(progressEvents(), media_type = "text/event-stream", headers = {"Cache-Control": "no-cache"})
+
+
+@analysis_view.get("/{video_id}/result")
+async def analysis_result(request: Request, video_id: str):
+    """Renders the result of the finished analysis job of a video.
+
+    Args:
+        request (Request): A Request object containing request data sent from client side.
+        video_id (str): Video id of the analysis.
+
+    Returns:
+        RedirectResponse: Redirects to home page if not authorized, to analysis view if no finished job exists, or to refresh access token if it had expired.
+        HTMLResponse: If an exception occurs, generic page stating the exception is displayed, 404 if video isn't one of the channel's videos.
         TemplateResponse: Analysis page with context-dict containing necessary data.
     """
     
@@ -31,64 +135,62 @@ async def video_analysis(request: Request, video_id: str):
     if "channel_data" not in request.session:
         return RedirectResponse(request.url_for("home"))
     
-    # fetch comments for given video id and form pandas dataframe
-    analysis_obj = VideoAnalysis()
+    if not ownsVideo(request, video_id):
+        return HTMLResponse("Video not found in your channel.", status_code = 404)
     
-    try:
-        comment_itr = fetchVideoComments(request.session["credentials"], video_id)
-        
-        # get every batch of comments by iterating over async generator object and append to dataframe
-        async for comment_dict in comment_itr:
-            analysis_obj.appendComments(comment_dict)
-        
-    except QuotaExceededError: # request quota is exceeded
+    job = await analysis_jobs.get(video_id)
+    if job is None or job.active:
+        return RedirectResponse(request.url_for("video_analysis", video_id = video_id))
+    
+    if job.error == "quota_exceeded": # request quota is exceeded
         return HTMLResponse("Cannot connect to youtube right now. Please comeback in a while.")
     
-    except AccessTokenExpiredError: # get fresh access token using refresh token
-        request.session["redirect_url"] = str(request.url)
+    if job.error == "access_token_expired": # get fresh access token using refresh token, analysis is run again afterwards
+        request.session["redirect_url"] = str(request.url_for("video_analysis", video_id = video_id))
         return RedirectResponse(request.url_for("refresh_access_token"))
     
-    except EntityNotFoundError: # no comments found
-        has_comments = False
+    if job.error:
+        return HTMLResponse("Something went wrong while analyzing the video. Please try again.", status_code = 500)
     
-    else:
-        has_comments = True
-
-        # make predictions and necessary graphs
-        analysis_obj.classifyComments()
-        analysis_obj.createWordCloud(video_id)
-        analysis_obj.createClassificationGraph(video_id)
-        
-        # get toxic comment ids and store in session for accessing if user chooses to reject them
-        toxic_ids = analysis_obj.getToxicIds()
-        request.session["channel_data"]["video_data"][video_id]["toxic_ids"] = toxic_ids
+    # store toxic comment ids in session for accessing if user chooses to reject them
+    if job.has_comments:
+        request.session["channel_data"]["video_data"][video_id]["toxic_ids"] = job.toxic_ids
     
     context_dict = {
         "request": request,
         "channel_details": request.session["channel_data"]["channel_details"],
         "video": request.session["channel_data"]["video_data"][video_id],
         "video_id": video_id,
-        "has_comments": has_comments
+        "has_comments": job.has_comments
     }
     
     return templates.TemplateResponse("video_analysis.html", context = context_dict)
 
 
-@analysis_view.delete("/delete-graphs/{video_id}")
-async def delete_graphs(video_id: str):
-    """Deletes created graphs when user exits the analysis page.
+@analysis_view.get("/artifacts/{video_id}/{artifact_name}")
+async def analysis_artifact(request: Request, video_id: str, artifact_name: str):
+    """Serves a rendered artifact (word cloud or classification graph) of the analysis from the artifact store. Browsers revalidate it with its ETag, so an unchanged artifact isn't sent again.
 
     Args:
-        video_id (str): Video id corressponding to which we need to delete the graphs.
+        request (Request): A Request object containing request data sent from client side.
+        video_id (str): Video id of the analysis.
+        artifact_name (str): Name of the artifact, 'word_cloud' or 'classification_graph'.
+
+    Returns:
+        Response: Artifact content, 304 if client's copy is current, 404 if artifact doesn't exist, has expired or video isn't one of the channel's videos.
     """
     
-    if os.path.exists(f"static/images/word_cloud_{video_id}.png"):
-        os.remove(f"static/images/word_cloud_{video_id}.png")
-        
-    if os.path.exists(f"static/images/classification_graph_{video_id}.png"):
-        os.remove(f"static/images/classification_graph_{video_id}.png")
-        
-    return Response(status_code = 200)
+    artifact = await run_in_threadpool(artifact_store.get, video_id, artifact_name)
+    if not ownsVideo(request, video_id) or artifact is None:
+        return Response(status_code = 404)
+    
+    content, media_type, etag = artifact
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code = 304, headers = headers)
+    
+    return Response(content, media_type = media_type, headers = headers)
         
 
 @analysis_view.get("/reject-comments/{video_id}")
@@ -101,25 +203,44 @@ async def reject_comments(request: Request, video_id: str):
 
     Returns:
         RedirectResponse: Redirects to analysis view where updated comments summary and classification graph will be displayed post toxic comment deletion.
+        HTMLResponse: If quota is exceeded, ids which weren't rejected are kept for the next attempt. 404 if video isn't one of the channel's videos.
     """
     
+    if not ownsVideo(request, video_id):
+        return HTMLResponse("Video not found in your channel.", status_code = 404)
+    
     # check if required data is present in session or someone has hit this url directly
     if "toxic_ids" not in request.session["channel_data"]["video_data"][video_id]:
         return RedirectResponse(request.url_for("video_analysis", video_id = video_id))
     
     toxic_ids = request.session["channel_data"]["video_data"][video_id]["toxic_ids"]
+    outcomes = {}
     
     try:
-        await rejectComments(request.session["credentials"], toxic_ids)
+        await rejectComments(request.session["credentials"], toxic_ids, outcomes)
     
     except QuotaExceededError: # request quota is exceeded
-        return HTMLResponse("Cannot connect to youtube right now. Please comeback in a while..")
+        response = HTMLResponse("Cannot connect to youtube right now. Please comeback in a while..")
+    
+    except ForbiddenError: # account isn't permitted to moderate comments
+        response = HTMLResponse("Your account isn't permitted to moderate comments of this video.")
     
     except AccessTokenExpiredError: # get fresh access token using refresh token
         request.session["redirect_url"] = str(request.url)
-        return RedirectResponse(request.url_for("refresh_access_token"))
+        response = RedirectResponse(request.url_for("refresh_access_token"))
     
-    # delete toxic ids from session to prevent not found error if url hit directly
-    del request.session["channel_data"]["video_data"][video_id]["toxic_ids"]
+    else:
+        response = RedirectResponse(request.url_for("video_analysis", video_id = video_id))
+    
+    # rejected comments are no longer part of the video
+    rejected_ids = [id for id in toxic_ids if outcomes.get(id) == "rejected"]
+    await run_in_threadpool(analysis_state.discard, video_id, rejected_ids)
+    
+    # keep ids which weren't rejected so that the next attempt resumes with them, delete toxic ids from session otherwise to prevent not found error if url hit directly
+    remaining_ids = [id for id in toxic_ids if outcomes.get(id) != "rejected"]
+    if remaining_ids:
+        request.session["channel_data"]["video_data"][video_id]["toxic_ids"] = remaining_ids
+    else:
+        del request.session["channel_data"]["video_data"][video_id]["toxic_ids"]
     
-    return RedirectResponse(request.url_for("video_analysis", video_id = video_id))
\ No newline at end of file
+    return response
\ No newline at end of file